@@ -0,0 +1,26 @@
+"""add_building_coordinates_index
+
+Revision ID: 3f6c1d2a9b7e
+Revises: 08a533357f44
+Create Date: 2026-10-17 10:02:41.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f6c1d2a9b7e'
+down_revision: Union[str, None] = '08a533357f44'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_buildings_lat_lon', 'buildings', ['latitude', 'longitude'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_buildings_lat_lon', table_name='buildings')
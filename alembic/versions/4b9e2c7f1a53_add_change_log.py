@@ -0,0 +1,64 @@
+"""add_change_log
+
+Revision ID: 4b9e2c7f1a53
+Revises: e2d8b3a61f05
+Create Date: 2026-10-17 18:22:40.318904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b9e2c7f1a53'
+down_revision: Union[str, None] = 'e2d8b3a61f05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, logged entity, column holding the entity id)
+SOURCES = [
+    ('buildings', 'building', 'id'),
+    ('activities', 'activity', 'id'),
+    ('organizations', 'organization', 'id'),
+    ('phones', 'organization', 'organization_id'),
+    ('organization_activities', 'organization', 'organization_id'),
+]
+OPERATIONS = ('INSERT', 'UPDATE', 'DELETE')
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.create_table(
+        'change_log',
+        sa.Column('seq', sa.Integer(), nullable=False),
+        sa.Column('entity', sa.String(), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('seq'),
+        sqlite_autoincrement=True,
+    )
+
+    for table, entity, column in SOURCES:
+        for operation in OPERATIONS:
+            rows = {'INSERT': ['NEW'], 'UPDATE': ['NEW'] if column == 'id' else ['OLD', 'NEW'], 'DELETE': ['OLD']}[operation]
+            inserts = ''.join(f"    INSERT INTO change_log (entity, entity_id) VALUES ('{entity}', {row}.{column});\n" for row in rows)
+            op.execute(f"""
+    CREATE TRIGGER change_log_{table}_{operation.lower()}
+    AFTER {operation} ON {table}
+    FOR EACH ROW
+    BEGIN
+    {inserts}END;
+    """)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    for table, _, _ in SOURCES:
+        for operation in OPERATIONS:
+            op.execute(f"DROP TRIGGER IF EXISTS change_log_{table}_{operation.lower()}")
+    op.drop_table('change_log')
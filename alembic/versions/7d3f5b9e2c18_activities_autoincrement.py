@@ -0,0 +1,40 @@
+"""activities_autoincrement
+
+Revision ID: 7d3f5b9e2c18
+Revises: 4b9e2c7f1a53
+Create Date: 2026-10-18 09:14:05.512377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d3f5b9e2c18'
+down_revision: Union[str, None] = '4b9e2c7f1a53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _rebuild_activities(autoincrement: bool) -> None:
+    # SQLite cannot add AUTOINCREMENT in place: the table is copied, which drops
+    # its triggers (depth checks, closure and change_log), so they are re-created
+    bind = op.get_bind()
+    triggers = bind.execute(sa.text("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'activities'")).scalars().all()
+    with op.batch_alter_table('activities', recreate='always', table_kwargs={'sqlite_autoincrement': autoincrement}):
+        pass
+    for sql in triggers:
+        op.execute(sql)
+
+
+def upgrade() -> None:
+    # Other backends never reuse sequence values
+    if op.get_bind().dialect.name == 'sqlite':
+        _rebuild_activities(True)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'sqlite':
+        _rebuild_activities(False)
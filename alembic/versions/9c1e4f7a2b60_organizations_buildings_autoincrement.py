@@ -0,0 +1,43 @@
+"""organizations_buildings_autoincrement
+
+Revision ID: 9c1e4f7a2b60
+Revises: 7d3f5b9e2c18
+Create Date: 2026-10-19 10:02:41.208113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c1e4f7a2b60'
+down_revision: Union[str, None] = '7d3f5b9e2c18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('buildings', 'organizations')
+
+
+def _rebuild(table: str, autoincrement: bool) -> None:
+    # Same as for activities: the copy drops the table's triggers (versions,
+    # full-text index and change_log), so they are re-created
+    bind = op.get_bind()
+    triggers = bind.execute(sa.text("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = :table"), {'table': table}).scalars().all()
+    with op.batch_alter_table(table, recreate='always', table_kwargs={'sqlite_autoincrement': autoincrement}):
+        pass
+    for sql in triggers:
+        op.execute(sql)
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'sqlite':
+        for table in TABLES:
+            _rebuild(table, True)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'sqlite':
+        for table in TABLES:
+            _rebuild(table, False)
@@ -0,0 +1,90 @@
+"""add_activity_closure_table
+
+Revision ID: b51e0c7d4a92
+Revises: 3f6c1d2a9b7e
+Create Date: 2026-10-17 11:24:05.430917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b51e0c7d4a92'
+down_revision: Union[str, None] = '3f6c1d2a9b7e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('activity_closure',
+    sa.Column('ancestor_id', sa.Integer(), nullable=False),
+    sa.Column('descendant_id', sa.Integer(), nullable=False),
+    sa.Column('depth', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['ancestor_id'], ['activities.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['descendant_id'], ['activities.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+    )
+    op.create_index('ix_activity_closure_descendant_id', 'activity_closure', ['descendant_id'], unique=False)
+    op.create_index('ix_organization_activities_activity_id', 'organization_activities', ['activity_id'], unique=False)
+
+    # Backfill from the existing parent links
+    op.execute("""
+    WITH RECURSIVE paths(ancestor_id, descendant_id, depth) AS (
+        SELECT id, id, 0 FROM activities
+        UNION ALL
+        SELECT p.ancestor_id, a.id, p.depth + 1
+        FROM paths p JOIN activities a ON a.parent_id = p.descendant_id
+    )
+    INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+    SELECT ancestor_id, descendant_id, depth FROM paths;
+    """)
+
+    op.execute("""
+    CREATE TRIGGER activity_closure_insert
+    AFTER INSERT ON activities
+    FOR EACH ROW
+    BEGIN
+        INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+        SELECT NEW.id, NEW.id, 0;
+        INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+        SELECT ancestor_id, NEW.id, depth + 1
+        FROM activity_closure WHERE descendant_id = NEW.parent_id;
+    END;
+    """)
+
+    op.execute("""
+    CREATE TRIGGER activity_closure_update
+    AFTER UPDATE OF parent_id ON activities
+    FOR EACH ROW
+    WHEN OLD.parent_id IS NOT NEW.parent_id
+    BEGIN
+        DELETE FROM activity_closure
+        WHERE descendant_id IN (SELECT descendant_id FROM activity_closure WHERE ancestor_id = NEW.id)
+          AND ancestor_id NOT IN (SELECT descendant_id FROM activity_closure WHERE ancestor_id = NEW.id);
+        INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+        SELECT super.ancestor_id, sub.descendant_id, super.depth + sub.depth + 1
+        FROM activity_closure AS super, activity_closure AS sub
+        WHERE super.descendant_id = NEW.parent_id AND sub.ancestor_id = NEW.id;
+    END;
+    """)
+
+    op.execute("""
+    CREATE TRIGGER activity_closure_delete
+    AFTER DELETE ON activities
+    FOR EACH ROW
+    BEGIN
+        DELETE FROM activity_closure WHERE descendant_id = OLD.id OR ancestor_id = OLD.id;
+    END;
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS activity_closure_delete")
+    op.execute("DROP TRIGGER IF EXISTS activity_closure_update")
+    op.execute("DROP TRIGGER IF EXISTS activity_closure_insert")
+    op.drop_index('ix_organization_activities_activity_id', table_name='organization_activities')
+    op.drop_index('ix_activity_closure_descendant_id', table_name='activity_closure')
+    op.drop_table('activity_closure')
@@ -0,0 +1,66 @@
+"""add_organization_name_fts
+
+Revision ID: c7a4e9f1d386
+Revises: b51e0c7d4a92
+Create Date: 2026-10-17 12:41:57.902113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7a4e9f1d386'
+down_revision: Union[str, None] = 'b51e0c7d4a92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("""
+    CREATE VIRTUAL TABLE organizations_fts USING fts5(
+        name, content='organizations', content_rowid='id', tokenize='trigram'
+    );
+    """)
+    # Index the organizations that already exist
+    op.execute("INSERT INTO organizations_fts (organizations_fts) VALUES ('rebuild')")
+
+    op.execute("""
+    CREATE TRIGGER organizations_fts_insert
+    AFTER INSERT ON organizations
+    BEGIN
+        INSERT INTO organizations_fts (rowid, name) VALUES (NEW.id, NEW.name);
+    END;
+    """)
+
+    op.execute("""
+    CREATE TRIGGER organizations_fts_update
+    AFTER UPDATE OF name ON organizations
+    BEGIN
+        INSERT INTO organizations_fts (organizations_fts, rowid, name) VALUES ('delete', OLD.id, OLD.name);
+        INSERT INTO organizations_fts (rowid, name) VALUES (NEW.id, NEW.name);
+    END;
+    """)
+
+    op.execute("""
+    CREATE TRIGGER organizations_fts_delete
+    AFTER DELETE ON organizations
+    BEGIN
+        INSERT INTO organizations_fts (organizations_fts, rowid, name) VALUES ('delete', OLD.id, OLD.name);
+    END;
+    """)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("DROP TRIGGER IF EXISTS organizations_fts_delete")
+    op.execute("DROP TRIGGER IF EXISTS organizations_fts_update")
+    op.execute("DROP TRIGGER IF EXISTS organizations_fts_insert")
+    op.execute("DROP TABLE IF EXISTS organizations_fts")
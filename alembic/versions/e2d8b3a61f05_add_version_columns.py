@@ -0,0 +1,33 @@
+"""add_version_columns
+
+Revision ID: e2d8b3a61f05
+Revises: c7a4e9f1d386
+Create Date: 2026-10-17 14:05:12.667391
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2d8b3a61f05'
+down_revision: Union[str, None] = 'c7a4e9f1d386'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('activities', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('buildings', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('organizations', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.create_index(op.f('ix_organizations_building_id'), 'organizations', ['building_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_organizations_building_id'), table_name='organizations')
+    # Plain ALTER TABLE ... DROP COLUMN (SQLite >= 3.35): a batch table rebuild would drop the triggers
+    op.drop_column('organizations', 'version')
+    op.drop_column('buildings', 'version')
+    op.drop_column('activities', 'version')
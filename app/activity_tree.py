@@ -0,0 +1,105 @@
+"""
+The activity taxonomy as an in-process tree.
+
+Each request checks the activities table's fingerprint (row count and version
+and id sums, like the list ETags; activity ids are never reused, so a deleted
+row cannot come back under the same id and version) with one aggregate query;
+when it moved, the
+tree is rebuilt from one more query, so writes from any process show up on the
+next request. Each version is immutable:
+depth, ancestors and descendants are precomputed for every activity, the whole
+tree is encoded once, and subtrees are encoded on first use. Responses carry a
+strong ETag over those bytes.
+"""
+import itertools
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.conditional import content_etag
+from app.models import Activity
+from app.replicas import is_replica_session
+from app.serialization import ActivityNodeRow, activity_node_adapter, activity_tree_adapter
+from app.singleflight import coalesce
+
+
+class ActivityTree:
+    def __init__(self, rows: Sequence):
+        """`rows` are (id, name, parent_id, version) tuples."""
+        self.fingerprint = (len(rows), sum(row.version for row in rows), sum(row.id for row in rows))
+        self.names: Dict[int, str] = {row.id: row.name for row in rows}
+        self.parents: Dict[int, Optional[int]] = {row.id: row.parent_id for row in rows}
+        self.children: Dict[int, List[int]] = {activity_id: [] for activity_id in self.names}
+        self.roots: List[int] = []
+        for row in sorted(rows, key=lambda row: row.id):
+            if row.parent_id is None:
+                self.roots.append(row.id)
+            elif row.parent_id in self.children:
+                self.children[row.parent_id].append(row.id)
+
+        # Parents before children, so each level extends the one above it
+        order: List[int] = []
+        self.depth: Dict[int, int] = {}
+        self.ancestors: Dict[int, Tuple[int, ...]] = {}
+        for root in self.roots:
+            self.depth[root], self.ancestors[root] = 1, ()
+        level = self.roots
+        while level:
+            order.extend(level)
+            for parent in level:
+                for child in self.children[parent]:
+                    self.depth[child] = self.depth[parent] + 1
+                    self.ancestors[child] = self.ancestors[parent] + (parent,)
+            level = [child for parent in level for child in self.children[parent]]
+        # Depth-first, in id order among siblings
+        self.descendants: Dict[int, Tuple[int, ...]] = {}
+        for parent in reversed(order):
+            self.descendants[parent] = tuple(itertools.chain.from_iterable((child,) + self.descendants[child] for child in self.children[parent]))
+
+        self.content = activity_tree_adapter.dump_json([self._node(root) for root in self.roots])
+        self.etag = content_etag(self.content)
+        self._subtrees: Dict[int, Tuple[bytes, str]] = {}
+
+    def __contains__(self, activity_id: int) -> bool:
+        return activity_id in self.depth
+
+    def _node(self, activity_id: int) -> ActivityNodeRow:
+        return {
+            "name": self.names[activity_id],
+            "id": activity_id,
+            "parent_id": self.parents[activity_id],
+            "children": [self._node(child) for child in self.children[activity_id]],
+        }
+
+    def subtree(self, activity_id: int) -> Tuple[bytes, str]:
+        """Encoded subtree rooted at `activity_id`, and its ETag."""
+        entry = self._subtrees.get(activity_id)
+        if entry is None:
+            content = activity_node_adapter.dump_json(self._node(activity_id))
+            entry = self._subtrees[activity_id] = (content, content_etag(content))
+        return entry
+
+
+# Latest tree per source; a lagging replica must not replace the primary's newer one
+_trees: Dict[bool, ActivityTree] = {}
+
+
+async def get_activity_tree(db: AsyncSession) -> ActivityTree:
+    """The current tree, rebuilt when the activities changed since it was built."""
+    replica = is_replica_session(db)
+    fingerprint = tuple((await db.execute(
+        select(func.count(), func.coalesce(func.sum(Activity.version), 0), func.coalesce(func.sum(Activity.id), 0))
+    )).one())
+    tree = _trees.get(replica)
+    if tree is not None and tree.fingerprint == fingerprint:
+        return tree
+
+    async def build() -> ActivityTree:
+        # The tree keeps the fingerprint of the rows it was built from, which a write
+        # since the check above may already have moved on
+        rows = (await db.execute(select(Activity.id, Activity.name, Activity.parent_id, Activity.version))).all()
+        _trees[replica] = ActivityTree(rows)
+        return _trees[replica]
+
+    return await coalesce("activity_tree", (replica, fingerprint), build)
@@ -0,0 +1,84 @@
+import hashlib
+import hmac
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import settings
+
+READ_SCOPE = "read"
+WRITE_SCOPE = "write"
+ALL_SCOPES = frozenset({READ_SCOPE, WRITE_SCOPE})
+
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+def configured_api_keys() -> Dict[str, FrozenSet[str]]:
+    """STATIC_API_KEY gets every scope; API_KEYS adds keys with their own scopes."""
+    keys = {settings.STATIC_API_KEY: ALL_SCOPES}
+    keys.update({key: frozenset(scopes) for key, scopes in settings.API_KEYS.items()})
+    return keys
+
+
+def _digest(key: bytes) -> bytes:
+    return hashlib.sha256(key).digest()
+
+
+class APIKeyMiddleware:
+    """
+    X-API-KEY check as plain ASGI middleware: no per-request task or body
+    stream wrapping, so streaming responses pass straight through.
+
+    Safe methods need the "read" scope, everything else "write". The matched
+    scopes are exposed to handlers as request.state.api_key_scopes.
+    """
+
+    def __init__(self, app: ASGIApp, keys: Dict[str, Iterable[str]], public_paths: Iterable[str] = ()):
+        self.app = app
+        # Digests have a fixed length, so comparisons reveal nothing about key length either
+        self.keys: List[Tuple[bytes, FrozenSet[str]]] = [(_digest(key.encode()), frozenset(scopes)) for key, scopes in keys.items()]
+        self.public_paths = frozenset(public_paths)
+
+    def authenticate(self, presented: Optional[bytes]) -> Optional[FrozenSet[str]]:
+        if presented is None:
+            return None
+        digest = _digest(presented)
+        matched = None
+        # Every key is compared, whichever matches, to keep timing independent of the key list
+        for key, scopes in self.keys:
+            if hmac.compare_digest(digest, key):
+                matched = scopes
+        return matched
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Allow exact match or with trailing slash for better UX
+        if scope["path"].rstrip("/") in self.public_paths:
+            await self.app(scope, receive, send)
+            return
+
+        presented = None
+        for name, value in scope["headers"]:
+            if name == b"x-api-key":
+                presented = value
+                break
+
+        scopes = self.authenticate(presented)
+        if scopes is None:
+            response = JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"detail": "Invalid or missing API Key"})
+            await response(scope, receive, send)
+            return
+
+        required = READ_SCOPE if scope["method"] in SAFE_METHODS else WRITE_SCOPE
+        if required not in scopes:
+            response = JSONResponse(status_code=status.HTTP_403_FORBIDDEN, content={"detail": f"API key lacks the '{required}' scope"})
+            await response(scope, receive, send)
+            return
+
+        scope.setdefault("state", {})["api_key_scopes"] = scopes
+        await self.app(scope, receive, send)
@@ -0,0 +1,270 @@
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app import metrics
+from app.config import settings
+from app.models import Activity, Building, Organization, Phone, organization_activities
+
+ORGANIZATION_PREFIX = "organization:"
+
+
+def organization_key(org_id: int) -> str:
+    return f"{ORGANIZATION_PREFIX}{org_id}"
+
+
+class CacheBackend(ABC):
+    """
+    Byte-oriented key/value store with per-entry TTL. The surface mirrors a
+    Redis client (GET, SET EX, DEL, SCAN+DEL) so an out-of-process store can
+    stand in for the in-memory one.
+    """
+
+    hits: int = 0
+    misses: int = 0
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, *keys: str) -> None:
+        ...
+
+    @abstractmethod
+    def delete_prefix(self, prefix: str) -> None:
+        ...
+
+
+class NullCache(CacheBackend):
+    def get(self, key: str) -> Optional[bytes]:
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        pass
+
+    def delete(self, *keys: str) -> None:
+        pass
+
+    def delete_prefix(self, prefix: str) -> None:
+        pass
+
+
+class TTLLRUCache(CacheBackend):
+    """In-process cache: entries expire after `ttl` seconds, least recently used go first when full."""
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def delete_prefix(self, prefix: str) -> None:
+        for key in [k for k in self._entries if k.startswith(prefix)]:
+            del self._entries[key]
+
+
+def create_cache() -> CacheBackend:
+    if settings.CACHE_BACKEND == "memory":
+        return TTLLRUCache(max_entries=settings.CACHE_MAX_ENTRIES, ttl=settings.CACHE_TTL_SECONDS)
+    if settings.CACHE_BACKEND == "none":
+        return NullCache()
+    raise ValueError(f"Unknown CACHE_BACKEND: {settings.CACHE_BACKEND}")
+
+
+cache: CacheBackend = create_cache()
+
+
+def _hit_ratio():
+    lookups = cache.hits + cache.misses
+    return [((), cache.hits / lookups if lookups else 0.0)]
+
+
+metrics.register(metrics.Collected("cache_hits_total", "Response cache hits", lambda: [((), cache.hits)], type="counter"))
+metrics.register(metrics.Collected("cache_misses_total", "Response cache misses", lambda: [((), cache.misses)], type="counter"))
+metrics.register(metrics.Collected("cache_hit_ratio", "Share of response cache lookups that hit, since start", _hit_ratio))
+
+# Bumped on every invalidation; a load that raced with a write does not get stored
+_generation = 0
+
+# When keys were last invalidated (monotonic). A replica may still serve the old
+# rows for READ_REPLICA_MAX_LAG_SECONDS, so replica loads do not refill them before that.
+_invalidated_at: "OrderedDict[str, float]" = OrderedDict()
+_all_invalidated_at = float("-inf")
+
+
+def generation() -> int:
+    """Bumped on every invalidation, so keys that include it change with every write."""
+    return _generation
+
+
+def _recently_invalidated(key: str) -> bool:
+    horizon = time.monotonic() - settings.READ_REPLICA_MAX_LAG_SECONDS
+    return _all_invalidated_at > horizon or _invalidated_at.get(key, float("-inf")) > horizon
+
+
+def _record_invalidation(keys: Iterable[str]) -> None:
+    now = time.monotonic()
+    for key in keys:
+        _invalidated_at[key] = now
+        _invalidated_at.move_to_end(key)
+    # Kept in time order, so expired keys are at the front
+    horizon = now - settings.READ_REPLICA_MAX_LAG_SECONDS
+    while _invalidated_at and next(iter(_invalidated_at.values())) <= horizon:
+        _invalidated_at.popitem(last=False)
+
+
+async def read_through(key: str, load: Callable[[], Awaitable[Optional[bytes]]], from_replica: bool = False) -> Optional[bytes]:
+    value = cache.get(key)
+    if value is not None:
+        return value
+    generation = _generation
+    value = await load()
+    if value is not None and generation == _generation and not (from_replica and _recently_invalidated(key)):
+        cache.set(key, value)
+    return value
+
+
+async def read_through_many(
+    keys: Sequence[str], load: Callable[[List[str]], Awaitable[Dict[str, bytes]]], from_replica: bool = False
+) -> Dict[str, bytes]:
+    """Like read_through for several keys: the misses are loaded with a single `load` call."""
+    values: Dict[str, bytes] = {}
+    misses = []
+    for key in keys:
+        value = cache.get(key)
+        if value is None:
+            misses.append(key)
+        else:
+            values[key] = value
+    if not misses:
+        return values
+    generation = _generation
+    loaded = await load(misses)
+    if generation == _generation:
+        for key, value in loaded.items():
+            if not (from_replica and _recently_invalidated(key)):
+                cache.set(key, value)
+    values.update(loaded)
+    return values
+
+
+def invalidate_organizations(org_ids: Iterable[int]) -> None:
+    global _generation
+    _generation += 1
+    keys = [organization_key(org_id) for org_id in org_ids]
+    _record_invalidation(keys)
+    cache.delete(*keys)
+
+
+def invalidate_all_organizations() -> None:
+    global _generation, _all_invalidated_at
+    _generation += 1
+    _all_invalidated_at = time.monotonic()
+    _invalidated_at.clear()
+    cache.delete_prefix(ORGANIZATION_PREFIX)
+
+
+# --- Invalidation through session events ---
+#
+# Affected organization ids are collected at flush time and dropped right away,
+# then dropped again once the transaction ends, so a reader that repopulated an
+# entry from pre-commit data in between cannot leave it stale.
+
+_PENDING = "cache_pending_organizations"
+_PENDING_ALL = "cache_pending_all_organizations"
+_WATCHED_TABLES = {
+    Organization.__tablename__,
+    Phone.__tablename__,
+    Building.__tablename__,
+    Activity.__tablename__,
+    organization_activities.name,
+}
+
+
+def _affected_organization_ids(session: Session) -> Set[int]:
+    org_ids: Set[int] = set()
+    building_ids: Set[int] = set()
+    activity_ids: Set[int] = set()
+
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Organization) and obj.id is not None:
+            org_ids.add(obj.id)
+        elif isinstance(obj, Phone) and obj.organization_id is not None:
+            org_ids.add(obj.organization_id)
+        elif isinstance(obj, Building) and obj.id is not None:
+            building_ids.add(obj.id)
+        elif isinstance(obj, Activity) and obj.id is not None:
+            activity_ids.add(obj.id)
+
+    # Buildings and activities are embedded in organization payloads
+    connection = session.connection()
+    if building_ids:
+        stmt = select(Organization.id).where(Organization.building_id.in_(building_ids))
+        org_ids.update(connection.execute(stmt).scalars())
+    if activity_ids:
+        stmt = select(organization_activities.c.organization_id).where(organization_activities.c.activity_id.in_(activity_ids))
+        org_ids.update(connection.execute(stmt).scalars())
+    return org_ids
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_after_flush(session: Session, flush_context) -> None:
+    org_ids = _affected_organization_ids(session)
+    if org_ids:
+        session.info.setdefault(_PENDING, set()).update(org_ids)
+        invalidate_organizations(org_ids)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_statement(orm_execute_state) -> None:
+    # Bulk INSERT/UPDATE/DELETE statements bypass the unit of work; rows are unknown, drop everything
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    if table is not None and table.name in _WATCHED_TABLES:
+        orm_execute_state.session.info[_PENDING_ALL] = True
+        invalidate_all_organizations()
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_soft_rollback")
+def _invalidate_pending(session: Session, *args) -> None:
+    org_ids = session.info.pop(_PENDING, None)
+    if session.info.pop(_PENDING_ALL, False):
+        invalidate_all_organizations()
+    elif org_ids:
+        invalidate_organizations(org_ids)
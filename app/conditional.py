@@ -0,0 +1,29 @@
+import hashlib
+from typing import Optional
+
+from fastapi import Response, status
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak, as RFC 9110 requires for GET)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == bare for candidate in if_none_match.split(","))
+
+
+def fingerprint_etag(*parts) -> str:
+    """Weak ETag from a tuple of cheap aggregates (counts, version sums, page params)."""
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def content_etag(content: bytes) -> str:
+    """Strong ETag over the exact response bytes."""
+    return f'"{hashlib.sha1(content).hexdigest()[:20]}"'
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
@@ -1,9 +1,68 @@
+from typing import Dict, List
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     STATIC_API_KEY: str = "test-secret"
+    # Extra keys with their scopes ("read", "write"), as JSON: {"reader-key": ["read"]}
+    API_KEYS: Dict[str, List[str]] = {}
     DATABASE_URL: str = "sqlite+aiosqlite:///./test.db"
-    
+
+    # Engine and connection pool. Pool settings do not apply to in-memory SQLite,
+    # which always shares a single connection.
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # asyncpg prepared statements cached per connection; 0 disables (needed behind pgbouncer)
+    DB_STATEMENT_CACHE_SIZE: int = 100
+
+    # Read replicas used by GET endpoints; empty sends every read to DATABASE_URL
+    READ_REPLICA_URLS: List[str] = []
+    # "round_robin" or "least_loaded" (fewest sessions in use)
+    READ_REPLICA_STRATEGY: str = "round_robin"
+    # A replica is probed with SELECT 1 before use at most this often; failed ones are retried as often
+    READ_REPLICA_HEALTH_INTERVAL_SECONDS: float = 5
+    # Replication lag tolerated: after a write the client reads from the primary for this long,
+    # and invalidated cache entries are not refilled from replicas within it
+    READ_REPLICA_MAX_LAG_SECONDS: float = 5
+
+    # PRAGMAs applied to every new SQLite connection
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    # Negative values are KiB, positive values are pages
+    SQLITE_CACHE_SIZE: int = -64000
+
+    # Response cache for organization payloads: "memory" (TTL + LRU, per process) or "none"
+    CACHE_BACKEND: str = "memory"
+    CACHE_TTL_SECONDS: float = 300
+    CACHE_MAX_ENTRIES: int = 10000
+
+    # Serve organization reads from an in-memory copy of the directory (SQLite only),
+    # refreshed from the change_log table. After a write the client reads from the
+    # database for READ_REPLICA_MAX_LAG_SECONDS, so keep the interval below that.
+    SNAPSHOT_ENABLED: bool = False
+    SNAPSHOT_REFRESH_SECONDS: float = 1
+    # change_log rows kept; a snapshot that falls further behind reloads in full. Without
+    # the snapshot the log is trimmed to this size every CHANGE_LOG_PRUNE_SECONDS.
+    CHANGE_LOG_RETENTION: int = 100000
+    CHANGE_LOG_PRUNE_SECONDS: float = 60
+
+    # Identical concurrent reads of an organization or a building's organizations share one
+    # fetch (see app/singleflight.py); a waiting request gives up and runs its own after the timeout
+    SINGLE_FLIGHT_ENABLED: bool = True
+    SINGLE_FLIGHT_TIMEOUT_SECONDS: float = 5
+
+    # Request, SQL, pool and cache metrics, served at /metrics
+    METRICS_ENABLED: bool = True
+    # SQL traces (Server-Timing header and a JSON log line, see app/tracing.py): on request
+    # with X-Query-Trace: 1 when the header is enabled, and for this share of all requests
+    QUERY_TRACE_HEADER_ENABLED: bool = False
+    QUERY_TRACE_SAMPLE_RATE: float = 0.0
+
     class Config:
         env_file = ".env"
 
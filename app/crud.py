@@ -0,0 +1,323 @@
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Sequence, Set, Tuple
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+from sqlalchemy import Table, bindparam, delete, func, insert, select, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Activity, Building, Organization, Phone, activity_closure, organization_activities
+from app.schemas import ActivityBatch, BatchItemError, BatchResult, BuildingBatch, OrganizationBatch, OrganizationCreate
+
+# Writes go through bulk statements: one executemany per table and operation,
+# whatever the number of items. A batch is validated as a whole against the
+# database (one lookup per reference kind) and either fully applied or rejected
+# with an error per offending item.
+
+MAX_ACTIVITY_DEPTH = 3
+DEPTH_EXCEEDED = f"Max activity tree depth ({MAX_ACTIVITY_DEPTH}) exceeded"  # same text as the check_depth triggers
+
+# Bound parameters per IN (...) list, well below SQLite's variable limit
+IN_CHUNK_SIZE = 5000
+
+CREATE, UPDATE, DELETE = "create", "update", "delete"
+OPERATIONS = (CREATE, UPDATE, DELETE)
+
+activities = Activity.__table__
+buildings = Building.__table__
+organizations = Organization.__table__
+phones = Phone.__table__
+
+
+class WriteError(Exception):
+    def __init__(self, errors: List[BatchItemError]):
+        super().__init__(errors)
+        self.errors = errors
+
+    def single(self) -> HTTPException:
+        error = self.errors[0]
+        return HTTPException(status_code=error.status_code, detail=error.detail)
+
+    def batch(self) -> HTTPException:
+        return HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=[error.model_dump() for error in self.errors])
+
+
+def _reject(errors: List[BatchItemError], operation: str, index: int, status_code: int, detail: str) -> None:
+    errors.append(BatchItemError(operation=operation, index=index, status_code=status_code, detail=detail))
+
+
+def _chunks(ids: Iterable[int]) -> Iterator[List[int]]:
+    ids = list(ids)
+    for start in range(0, len(ids), IN_CHUNK_SIZE):
+        yield ids[start:start + IN_CHUNK_SIZE]
+
+
+async def _existing(db: AsyncSession, column, ids: Iterable[int]) -> Set[int]:
+    found: Set[int] = set()
+    for chunk in _chunks(set(ids)):
+        found.update((await db.execute(select(column).where(column.in_(chunk)))).scalars())
+    return found
+
+
+async def insert_returning_ids(db: AsyncSession, table: Table, rows: List[Dict[str, Any]]) -> List[int]:
+    """
+    Insert `rows` (dicts with the same keys) with one executemany and return
+    their new ids in order. RETURNING rows are matched back by value: asking
+    for parameter order makes SQLite fall back to one statement per row.
+    Identical rows are interchangeable, so any pairing among duplicates is correct.
+    """
+    if not rows:
+        return []
+    columns = list(rows[0])
+    returned: Dict[Tuple, List[int]] = {}
+    result = await db.execute(insert(table).returning(table.c.id, *(table.c[column] for column in columns)), rows)
+    for row in result:
+        returned.setdefault(tuple(row[1:]), []).append(row[0])
+    return [returned[tuple(row[column] for column in columns)].pop() for row in rows]
+
+
+async def _bulk_update(db: AsyncSession, table: Table, rows: List[Dict[str, Any]]) -> None:
+    """One executemany UPDATE ... WHERE id = ? for `rows` (id plus new values); bumps version."""
+    columns = [column for column in rows[0] if column != "id"]
+    values = {column: bindparam(f"new_{column}") for column in columns}
+    values["version"] = table.c.version + 1
+    statement = update(table).where(table.c.id == bindparam("target_id")).values(values)
+    await db.execute(statement, [{"target_id": row["id"], **{f"new_{column}": row[column] for column in columns}} for row in rows])
+
+
+async def _delete_in(db: AsyncSession, column, ids: Sequence[int]) -> None:
+    for chunk in _chunks(ids):
+        await db.execute(delete(column.table).where(column.in_(chunk)))
+
+
+async def _bump_organizations_where_in(db: AsyncSession, column, ids: Sequence[int]) -> None:
+    # Organization payloads embed buildings and activities, so their versions move too.
+    # `column` is organizations.building_id or organization_activities.activity_id.
+    for chunk in _chunks(ids):
+        if column.table is organizations:
+            condition = column.in_(chunk)
+        else:
+            condition = organizations.c.id.in_(select(organization_activities.c.organization_id).where(column.in_(chunk)))
+        await db.execute(update(organizations).where(condition).values(version=organizations.c.version + 1))
+
+
+async def _locate_failures(db: AsyncSession, batch: BaseModel, apply: Callable[[AsyncSession, Any], Awaitable[BatchResult]]) -> List[BatchItemError]:
+    """
+    The database rejected the batch (a trigger or constraint the validation did
+    not foresee). Replay it one item at a time, each in a savepoint, to name the
+    offending items; nothing is kept. Only runs on this error path.
+    """
+    errors: List[BatchItemError] = []
+    if db.get_bind().dialect.name == "sqlite":
+        # pysqlite opens its transaction lazily, right before DML; a SAVEPOINT sent
+        # first would start one of its own that its RELEASE commits
+        await db.execute(text("BEGIN"))
+    try:
+        for operation in OPERATIONS:
+            for index, item in enumerate(getattr(batch, operation)):
+                try:
+                    async with db.begin_nested():
+                        await apply(db, type(batch)(**{operation: [item]}))
+                except IntegrityError as exc:
+                    _reject(errors, operation, index, status.HTTP_422_UNPROCESSABLE_ENTITY, str(exc.orig))
+    finally:
+        await db.rollback()
+    return errors
+
+
+async def _run(db: AsyncSession, batch: BaseModel, validate, apply) -> BatchResult:
+    errors = await validate(db, batch)
+    if errors:
+        raise WriteError(errors)
+    try:
+        result = await apply(db, batch)
+        await db.commit()
+    except IntegrityError as exc:
+        # executemany is not atomic on every driver: drop whatever part was applied
+        await db.rollback()
+        errors = await _locate_failures(db, batch, apply)
+        raise WriteError(errors or [BatchItemError(operation="batch", index=0, status_code=status.HTTP_409_CONFLICT, detail=str(exc.orig))])
+    return result
+
+
+# --- Buildings ---
+
+async def _validate_buildings(db: AsyncSession, batch: BuildingBatch) -> List[BatchItemError]:
+    errors: List[BatchItemError] = []
+    existing = await _existing(db, buildings.c.id, [item.id for item in batch.update] + batch.delete)
+    in_use = await _existing(db, organizations.c.building_id, batch.delete)
+    for index, item in enumerate(batch.update):
+        if item.id not in existing:
+            _reject(errors, UPDATE, index, status.HTTP_404_NOT_FOUND, "Building not found")
+    for index, building_id in enumerate(batch.delete):
+        if building_id not in existing:
+            _reject(errors, DELETE, index, status.HTTP_404_NOT_FOUND, "Building not found")
+        elif building_id in in_use:
+            _reject(errors, DELETE, index, status.HTTP_409_CONFLICT, "Building still has organizations")
+    return errors
+
+
+async def _apply_buildings(db: AsyncSession, batch: BuildingBatch) -> BatchResult:
+    created = await insert_returning_ids(db, buildings, [item.model_dump() for item in batch.create])
+    updated = [item.id for item in batch.update]
+    if updated:
+        await _bulk_update(db, buildings, [item.model_dump() for item in batch.update])
+        await _bump_organizations_where_in(db, organizations.c.building_id, updated)
+    await _delete_in(db, buildings.c.id, batch.delete)
+    return BatchResult(created=created, updated=updated, deleted=batch.delete)
+
+
+async def write_buildings(db: AsyncSession, batch: BuildingBatch) -> BatchResult:
+    return await _run(db, batch, _validate_buildings, _apply_buildings)
+
+
+# --- Activities ---
+
+async def _levels(db: AsyncSession, ids: Iterable[int]) -> Dict[int, int]:
+    """Level of each activity in its tree (roots are level 1)."""
+    levels: Dict[int, int] = {}
+    for chunk in _chunks(set(ids)):
+        query = select(activity_closure.c.descendant_id, func.max(activity_closure.c.depth)).where(activity_closure.c.descendant_id.in_(chunk)).group_by(activity_closure.c.descendant_id)
+        levels.update((activity_id, depth + 1) for activity_id, depth in await db.execute(query))
+    return levels
+
+
+async def _subtrees(db: AsyncSession, ids: Iterable[int]) -> Dict[int, Dict[int, int]]:
+    """Descendants of each activity (itself included) with their relative depth."""
+    subtrees: Dict[int, Dict[int, int]] = {}
+    for chunk in _chunks(set(ids)):
+        query = select(activity_closure.c.ancestor_id, activity_closure.c.descendant_id, activity_closure.c.depth).where(activity_closure.c.ancestor_id.in_(chunk))
+        for ancestor_id, descendant_id, depth in await db.execute(query):
+            subtrees.setdefault(ancestor_id, {})[descendant_id] = depth
+    return subtrees
+
+
+async def _validate_activities(db: AsyncSession, batch: ActivityBatch) -> List[BatchItemError]:
+    errors: List[BatchItemError] = []
+    parent_ids = {item.parent_id for item in batch.create + batch.update if item.parent_id is not None}
+    updated_ids = [item.id for item in batch.update]
+    existing = await _existing(db, activities.c.id, parent_ids.union(updated_ids, batch.delete))
+    levels = await _levels(db, parent_ids)
+    subtrees = await _subtrees(db, updated_ids)
+
+    for operation, items in ((CREATE, batch.create), (UPDATE, batch.update)):
+        for index, item in enumerate(items):
+            if operation == UPDATE and item.id not in existing:
+                _reject(errors, operation, index, status.HTTP_404_NOT_FOUND, "Activity not found")
+                continue
+            if item.parent_id is None:
+                continue
+            subtree = subtrees.get(item.id, {}) if operation == UPDATE else {}
+            if item.parent_id not in existing:
+                _reject(errors, operation, index, status.HTTP_422_UNPROCESSABLE_ENTITY, f"Unknown parent_id {item.parent_id}")
+            elif item.parent_id in subtree:
+                _reject(errors, operation, index, status.HTTP_422_UNPROCESSABLE_ENTITY, "An activity cannot be moved under itself or its descendants")
+            elif levels.get(item.parent_id, 1) + 1 + max(subtree.values(), default=0) > MAX_ACTIVITY_DEPTH:
+                _reject(errors, operation, index, status.HTTP_422_UNPROCESSABLE_ENTITY, DEPTH_EXCEEDED)
+
+    deleted = set(batch.delete)
+    children: Dict[int, Set[int]] = {}
+    for chunk in _chunks(deleted):
+        for child_id, parent_id in await db.execute(select(activities.c.id, activities.c.parent_id).where(activities.c.parent_id.in_(chunk))):
+            children.setdefault(parent_id, set()).add(child_id)
+    for index, activity_id in enumerate(batch.delete):
+        if activity_id not in existing:
+            _reject(errors, DELETE, index, status.HTTP_404_NOT_FOUND, "Activity not found")
+        elif children.get(activity_id, set()) - deleted:
+            _reject(errors, DELETE, index, status.HTTP_409_CONFLICT, "Activity has child activities")
+    return errors
+
+
+async def _apply_activities(db: AsyncSession, batch: ActivityBatch) -> BatchResult:
+    created = await insert_returning_ids(db, activities, [item.model_dump() for item in batch.create])
+    updated = [item.id for item in batch.update]
+    if updated:
+        await _bulk_update(db, activities, [item.model_dump() for item in batch.update])
+        await _bump_organizations_where_in(db, organization_activities.c.activity_id, updated)
+    if batch.delete:
+        # Organizations lose the deleted activities; the closure rows go with the triggers
+        await _bump_organizations_where_in(db, organization_activities.c.activity_id, batch.delete)
+        await _delete_in(db, organization_activities.c.activity_id, batch.delete)
+        await _delete_in(db, activities.c.id, batch.delete)
+    return BatchResult(created=created, updated=updated, deleted=batch.delete)
+
+
+async def write_activities(db: AsyncSession, batch: ActivityBatch) -> BatchResult:
+    return await _run(db, batch, _validate_activities, _apply_activities)
+
+
+# --- Organizations ---
+
+async def _validate_organizations(db: AsyncSession, batch: OrganizationBatch) -> List[BatchItemError]:
+    errors: List[BatchItemError] = []
+    writes = batch.create + batch.update
+    known_buildings = await _existing(db, buildings.c.id, [item.building_id for item in writes])
+    known_activities = await _existing(db, activities.c.id, [activity_id for item in writes for activity_id in item.activity_ids])
+    existing = await _existing(db, organizations.c.id, [item.id for item in batch.update] + batch.delete)
+
+    for operation, items in ((CREATE, batch.create), (UPDATE, batch.update)):
+        for index, item in enumerate(items):
+            unknown_activities = sorted(set(item.activity_ids) - known_activities)
+            if operation == UPDATE and item.id not in existing:
+                _reject(errors, operation, index, status.HTTP_404_NOT_FOUND, "Organization not found")
+            elif item.building_id not in known_buildings:
+                _reject(errors, operation, index, status.HTTP_422_UNPROCESSABLE_ENTITY, f"Unknown building_id {item.building_id}")
+            elif unknown_activities:
+                _reject(errors, operation, index, status.HTTP_422_UNPROCESSABLE_ENTITY, f"Unknown activity ids {unknown_activities}")
+    for index, org_id in enumerate(batch.delete):
+        if org_id not in existing:
+            _reject(errors, DELETE, index, status.HTTP_404_NOT_FOUND, "Organization not found")
+    return errors
+
+
+async def _insert_organization_details(db: AsyncSession, items: List[Tuple[int, OrganizationCreate]]) -> None:
+    links = [
+        {"organization_id": org_id, "activity_id": activity_id}
+        for org_id, item in items for activity_id in dict.fromkeys(item.activity_ids)
+    ]
+    if links:
+        await db.execute(insert(organization_activities), links)
+    numbers = [{"organization_id": org_id, "number": number} for org_id, item in items for number in item.phones]
+    if numbers:
+        await db.execute(insert(phones), numbers)
+
+
+async def _apply_organizations(db: AsyncSession, batch: OrganizationBatch) -> BatchResult:
+    created = await insert_returning_ids(db, organizations, [{"name": item.name, "building_id": item.building_id} for item in batch.create])
+    await _insert_organization_details(db, list(zip(created, batch.create)))
+
+    updated = [item.id for item in batch.update]
+    if updated:
+        await _bulk_update(db, organizations, [{"id": item.id, "name": item.name, "building_id": item.building_id} for item in batch.update])
+        # Phones and activities are replaced wholesale
+        await _delete_in(db, phones.c.organization_id, updated)
+        await _delete_in(db, organization_activities.c.organization_id, updated)
+        await _insert_organization_details(db, [(item.id, item) for item in batch.update])
+
+    if batch.delete:
+        await _delete_in(db, phones.c.organization_id, batch.delete)
+        await _delete_in(db, organization_activities.c.organization_id, batch.delete)
+        await _delete_in(db, organizations.c.id, batch.delete)
+    return BatchResult(created=created, updated=updated, deleted=batch.delete)
+
+
+async def write_organizations(db: AsyncSession, batch: OrganizationBatch) -> BatchResult:
+    return await _run(db, batch, _validate_organizations, _apply_organizations)
+
+
+# --- Route helpers ---
+
+async def write_one(write, db: AsyncSession, batch: BaseModel) -> BatchResult:
+    """Apply a single-item batch; its error becomes the response (404, 409 or 422)."""
+    try:
+        return await write(db, batch)
+    except WriteError as exc:
+        raise exc.single() from None
+
+
+async def write_many(write, db: AsyncSession, batch: BaseModel) -> BatchResult:
+    """Apply a batch; any rejected item fails the whole batch with a 422 listing each error."""
+    try:
+        return await write(db, batch)
+    except WriteError as exc:
+        raise exc.batch() from None
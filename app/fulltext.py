@@ -0,0 +1,115 @@
+import difflib
+import string
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Integer, case, func, literal_column, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Organization
+
+# The trigram tokenizer cannot match anything shorter than one trigram
+MIN_INDEXED_QUERY_LENGTH = 3
+
+# Match classes, used as the leading sort key of every name search
+PREFIX_MATCH = 0
+SUBSTRING_MATCH = 1
+FUZZY_MATCH = 2
+# Name search cursors: match class, then name length or fuzzy score, then id
+NAME_SEARCH_CURSOR = (int, float, int)
+
+# Typo-tolerant fallback: how many trigram-overlap candidates are re-scored, and the minimum score kept
+FUZZY_CANDIDATES = 200
+FUZZY_MIN_SIMILARITY = 0.75
+
+
+def supports_fulltext(db: AsyncSession) -> bool:
+    return db.get_bind().dialect.name == "sqlite"
+
+
+def _quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+# SQLite's LIKE and lower() fold ASCII letters only, while the trigram tokenizer
+# folds all of Unicode; name matching follows LIKE on every path
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def fold_case(value: str) -> str:
+    """`value` with ASCII letters lowercased, as SQLite's LIKE compares them."""
+    return value.translate(_ASCII_LOWER)
+
+
+def trigrams(value: str) -> List[str]:
+    value = value.lower()
+    return sorted({value[i:i + 3] for i in range(len(value) - 2)})
+
+
+def _matches(expression: str):
+    """(id, score) rows of organizations_fts for an FTS5 MATCH expression; lower score is better."""
+    return (
+        select(
+            literal_column("organizations_fts.rowid").label("id"),
+            func.bm25(literal_column("organizations_fts")).label("score"),
+        )
+        .select_from(text("organizations_fts"))
+        .where(text("organizations_fts MATCH :expression").bindparams(expression=expression))
+        .subquery()
+    )
+
+
+def substring_search(q: str):
+    """
+    Organizations whose name contains `q`, answered by the trigram index.
+    Returns (query, sort keys): prefix matches first, then shorter names, then id.
+    For a single phrase bm25 mostly ranks by name length too, but it depends on
+    corpus statistics; the length does not, so the in-memory snapshot ranks the
+    same way and cursors stay valid when a client moves between the two.
+    """
+    hits = _matches(_quote(q))
+    match_class = case((Organization.name.istartswith(q, autoescape=True), PREFIX_MATCH), else_=SUBSTRING_MATCH)
+    name_length = func.length(Organization.name, type_=Integer)
+    query = (
+        select(Organization.id, match_class.label("match_class"), name_length.label("name_length"))
+        .join(hits, hits.c.id == Organization.id)
+        .where(Organization.name.icontains(q, autoescape=True))
+    )
+    return query, (match_class, name_length, Organization.id)
+
+
+def substring_ids(q: str):
+    """Ids of organizations whose name contains `q`, from the trigram index (rechecked with LIKE)."""
+    hits = _matches(_quote(q))
+    return select(hits.c.id).join(Organization, Organization.id == hits.c.id).where(Organization.name.icontains(q, autoescape=True))
+
+
+def similarity(q: str, name: str) -> float:
+    """Best edit similarity between `q` and a same-length window starting at a word of `name`."""
+    q, name = q.lower(), name.lower()
+    starts = [0] + [i + 1 for i, ch in enumerate(name) if ch == " "]
+    return max(difflib.SequenceMatcher(None, q, name[i:i + len(q)]).ratio() for i in starts)
+
+
+async def fuzzy_search(db: AsyncSession, q: str, after: Optional[Sequence] = None, limit: int = 100) -> List[Tuple[int, float]]:
+    """
+    Typo-tolerant fallback. Candidates sharing at least one trigram with `q` come
+    from the index (best bm25 first), are re-scored in Python and filtered.
+    Returns (id, -similarity) pairs in (score, id) order, starting after `after`.
+    """
+    grams = trigrams(q)
+    if not grams:
+        return []
+    hits = _matches(" OR ".join(_quote(g) for g in grams))
+    query = (
+        select(Organization.id, Organization.name)
+        .join(hits, hits.c.id == Organization.id)
+        .order_by(hits.c.score, Organization.id)
+        .limit(FUZZY_CANDIDATES)
+    )
+    scored: Iterable[Tuple[int, float]] = (
+        (row.id, -similarity(q, row.name)) for row in (await db.execute(query)).all()
+    )
+    ranked = sorted(((score, org_id) for org_id, score in scored if -score >= FUZZY_MIN_SIMILARITY))
+    if after is not None:
+        ranked = [item for item in ranked if item > tuple(after)]
+    return [(org_id, score) for score, org_id in ranked[:limit]]
@@ -0,0 +1,148 @@
+import math
+from typing import List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import Float, and_, or_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180
+
+
+class BoundingBox(NamedTuple):
+    min_lat: float
+    min_lon: float
+    max_lat: float
+    max_lon: float
+
+
+def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in km."""
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + \
+        math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a)))
+
+
+def haversine_many(lat: float, lon: float, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """haversine() from (lat, lon) to every point of the arrays at once."""
+    dlat = np.radians(latitudes - lat)
+    dlon = np.radians(longitudes - lon)
+    a = np.sin(dlat / 2) ** 2 + \
+        math.cos(math.radians(lat)) * np.cos(np.radians(latitudes)) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(1.0, a)))
+
+
+def bounding_boxes(lat: float, lon: float, radius_km: float) -> List[BoundingBox]:
+    """
+    Boxes that fully contain the circle of `radius_km` around (lat, lon).
+    Usually one box; two when the circle crosses the antimeridian.
+    """
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    min_lat, max_lat = lat - dlat, lat + dlat
+
+    # Circle reaches a pole (or covers half the globe): every longitude qualifies
+    angular = radius_km / EARTH_RADIUS_KM
+    if max_lat >= 90 or min_lat <= -90 or angular >= math.pi / 2:
+        return [BoundingBox(max(min_lat, -90.0), -180.0, min(max_lat, 90.0), 180.0)]
+
+    ratio = math.sin(angular) / math.cos(math.radians(lat))
+    if ratio >= 1:
+        return [BoundingBox(min_lat, -180.0, max_lat, 180.0)]
+    dlon = math.degrees(math.asin(ratio))
+    min_lon, max_lon = lon - dlon, lon + dlon
+
+    if min_lon < -180:
+        return [BoundingBox(min_lat, min_lon + 360, max_lat, 180.0), BoundingBox(min_lat, -180.0, max_lat, max_lon)]
+    if max_lon > 180:
+        return [BoundingBox(min_lat, min_lon, max_lat, 180.0), BoundingBox(min_lat, -180.0, max_lat, max_lon - 360)]
+    return [BoundingBox(min_lat, min_lon, max_lat, max_lon)]
+
+
+class PointIndex:
+    """
+    Point coordinates in NumPy arrays sorted by latitude. A box query is two
+    binary searches for its latitude band plus one vectorized longitude mask
+    over the band; a radius query adds haversine_many over what is left.
+    """
+
+    def __init__(self, ids: Sequence[int], latitudes: Sequence[float], longitudes: Sequence[float]):
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        order = np.argsort(latitudes, kind="stable")
+        self.ids = np.asarray(ids, dtype=np.int64)[order]
+        self.latitudes = latitudes[order]
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)[order]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _positions(self, boxes: List[BoundingBox]) -> np.ndarray:
+        parts = []
+        for box in boxes:
+            start = np.searchsorted(self.latitudes, box.min_lat, side="left")
+            stop = np.searchsorted(self.latitudes, box.max_lat, side="right")
+            longitudes = self.longitudes[start:stop]
+            parts.append(np.flatnonzero((longitudes >= box.min_lon) & (longitudes <= box.max_lon)) + start)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def in_boxes(self, boxes: List[BoundingBox]) -> List[int]:
+        """Ids of the points inside any of the (non-overlapping) boxes."""
+        return self.ids[self._positions(boxes)].tolist()
+
+    def within(self, lat: float, lon: float, radius_km: float) -> Tuple[List[int], List[float]]:
+        """Ids of the points within `radius_km` of (lat, lon), and their distances."""
+        positions = self._positions(bounding_boxes(lat, lon, radius_km))
+        distances = haversine_many(lat, lon, self.latitudes[positions], self.longitudes[positions])
+        inside = distances <= radius_km
+        return self.ids[positions[inside]].tolist(), distances[inside].tolist()
+
+
+def within_boxes(lat_col, lon_col, boxes: List[BoundingBox]):
+    """SQL predicate on indexed coordinate columns (served by ix_buildings_lat_lon)."""
+    clauses = [
+        and_(lat_col.between(b.min_lat, b.max_lat), lon_col.between(b.min_lon, b.max_lon))
+        for b in boxes
+    ]
+    return clauses[0] if len(clauses) == 1 else or_(*clauses)
+
+
+class haversine_km(FunctionElement):
+    """
+    haversine_km(lat1, lon1, lat2, lon2) as a SQL expression.
+    SQLite gets a registered Python function (see register_sqlite_functions),
+    other backends get the formula spelled out with built-in math functions.
+    """
+    type = Float()
+    name = "haversine_km"
+    inherit_cache = True
+
+
+@compiles(haversine_km)
+def _compile_haversine_default(element, compiler, **kw):
+    lat1, lon1, lat2, lon2 = [compiler.process(arg, **kw) for arg in element.clauses]
+    return (
+        f"(2 * {EARTH_RADIUS_KM} * asin(sqrt(least(1.0, "
+        f"power(sin(radians(({lat2}) - ({lat1})) / 2), 2) + "
+        f"cos(radians({lat1})) * cos(radians({lat2})) * "
+        f"power(sin(radians(({lon2}) - ({lon1})) / 2), 2)))))"
+    )
+
+
+@compiles(haversine_km, "sqlite")
+def _compile_haversine_sqlite(element, compiler, **kw):
+    return f"haversine_km({compiler.process(element.clauses, **kw)})"
+
+
+def _sqlite_haversine(lat1, lon1, lat2, lon2):
+    if None in (lat1, lon1, lat2, lon2):
+        return None
+    return haversine(lat1, lon1, lat2, lon2)
+
+
+def register_sqlite_functions(dbapi_connection, connection_record):
+    # Pool "connect" hook; a no-op for drivers without user-defined functions
+    create_function = getattr(dbapi_connection, "create_function", None)
+    if create_function is not None:
+        create_function("haversine_km", 4, _sqlite_haversine, deterministic=True)
@@ -0,0 +1,338 @@
+"""
+Streaming bulk import of organizations with their phones and activity links.
+
+One organization per CSV record or NDJSON line:
+
+    name             required
+    building_id      or building_address (matched exactly)
+    activity_ids     CSV: "1;5", NDJSON: [1, 5]
+    activities       activity names, CSV: "Food;Dairy Products", NDJSON: ["Food"]
+    phones           CSV: "8-800-555-35-35;8-495-123-45-67", NDJSON: ["8-800-555-35-35"]
+
+Buildings and activities must already exist; they are looked up in memory.
+Rows are inserted in batches with executemany, one transaction per batch. A
+row that fails validation (or, on retry, the insert) is reported and skipped.
+
+    python -m app.importer organizations.csv
+    python -m app.importer organizations.ndjson --batch-size 5000
+"""
+import argparse
+import asyncio
+import codecs
+import contextlib
+import csv
+import json
+import sys
+import time
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud import insert_returning_ids
+from app.database import SessionLocal
+from app.models import Activity, Building, Organization, Phone, organization_activities
+from app.schemas import ImportReport, ImportRowError
+from app.serialization import NDJSON_MEDIA_TYPE
+from app.snapshot import prune_change_log
+
+CSV_MEDIA_TYPE = "text/csv"
+IMPORT_MEDIA_TYPES = (CSV_MEDIA_TYPE, NDJSON_MEDIA_TYPE)
+
+IMPORT_BATCH_SIZE = 1000
+MAX_IMPORT_BATCH_SIZE = 10000
+# Only the first errors are listed in the report; all of them are counted
+MAX_REPORTED_ERRORS = 100
+LIST_SEPARATOR = ";"
+
+Record = Dict[str, Any]
+
+
+class RowError(ValueError):
+    pass
+
+
+# --- Parsing ---
+
+async def decode_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """UTF-8 lines (with their line endings) from a byte stream split anywhere."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def parse_ndjson(lines: AsyncIterable[str]) -> AsyncIterator[Tuple[int, Any]]:
+    number = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            yield number, json.loads(line)
+        except ValueError as exc:
+            yield number, RowError(f"Invalid JSON: {exc}")
+
+
+def _quote_open(line: str, quoted: bool) -> bool:
+    """
+    Whether a quoted field is still open at the end of `line`, given whether
+    one was open where it starts. As in csv.reader, a quote only opens a field
+    at its start; elsewhere in an unquoted field it is a plain character, so a
+    stray one cannot pull the following lines into its record.
+    """
+    at_start, after_close = not quoted, False
+    for char in line:
+        if quoted:
+            if char == '"':
+                quoted, after_close = False, True
+            continue
+        # Right after a closing quote, another one is a doubled (escaped) quote
+        if char == '"' and (at_start or after_close):
+            quoted = True
+        at_start, after_close = char == ",", False
+    return quoted
+
+
+async def parse_csv(lines: AsyncIterable[str]) -> AsyncIterator[Tuple[int, Any]]:
+    header: Optional[List[str]] = None
+    record = ""
+    quoted = False
+    number = 0
+    async for line in lines:
+        record += line
+        quoted = _quote_open(line, quoted)
+        if quoted:
+            continue
+        text, record = record, ""
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        number += 1
+        if len(values) != len(header):
+            yield number, RowError(f"Expected {len(header)} fields, got {len(values)}")
+        else:
+            yield number, dict(zip(header, values))
+    if record.strip():
+        yield number + 1, RowError("Unterminated quoted field")
+
+
+PARSERS: Dict[str, Callable[[AsyncIterable[str]], AsyncIterator[Tuple[int, Any]]]] = {
+    CSV_MEDIA_TYPE: parse_csv,
+    NDJSON_MEDIA_TYPE: parse_ndjson,
+}
+
+
+# --- Reference resolution ---
+
+def _as_list(value: Any) -> List[Any]:
+    if value is None or value == "":
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(LIST_SEPARATOR) if item.strip()]
+    if isinstance(value, list):
+        return value
+    raise RowError(f"Expected a list, got {value!r}")
+
+
+def _as_id(value: Any, field: str) -> int:
+    try:
+        if isinstance(value, bool):
+            raise ValueError
+        return int(value)
+    except (TypeError, ValueError):
+        raise RowError(f"{field} must be an integer, got {value!r}") from None
+
+
+class References:
+    """Building and activity lookups, loaded once per import."""
+
+    def __init__(self):
+        self.building_ids = set()
+        self.building_by_address: Dict[str, Optional[int]] = {}
+        self.activity_ids = set()
+        self.activity_by_name: Dict[str, Optional[int]] = {}
+
+    async def load(self, db: AsyncSession) -> "References":
+        for building_id, address in await db.execute(select(Building.id, Building.address)):
+            self.building_ids.add(building_id)
+            # Addresses and names shared by several rows map to None and are rejected as ambiguous
+            self.building_by_address[address] = None if address in self.building_by_address else building_id
+        for activity_id, name in await db.execute(select(Activity.id, Activity.name)):
+            self.activity_ids.add(activity_id)
+            self.activity_by_name[name] = None if name in self.activity_by_name else activity_id
+        return self
+
+    def building(self, row: Dict[str, Any]) -> int:
+        if row.get("building_id") not in (None, ""):
+            building_id = _as_id(row["building_id"], "building_id")
+            if building_id not in self.building_ids:
+                raise RowError(f"Unknown building_id {building_id}")
+            return building_id
+        address = row.get("building_address")
+        if not address or not isinstance(address, str):
+            raise RowError("building_id or building_address is required")
+        if address not in self.building_by_address:
+            raise RowError(f"Unknown building_address {address!r}")
+        building_id = self.building_by_address[address]
+        if building_id is None:
+            raise RowError(f"Ambiguous building_address {address!r}")
+        return building_id
+
+    def activities(self, row: Dict[str, Any]) -> List[int]:
+        ids: Dict[int, None] = {}
+        for value in _as_list(row.get("activity_ids")):
+            activity_id = _as_id(value, "activity_ids")
+            if activity_id not in self.activity_ids:
+                raise RowError(f"Unknown activity id {activity_id}")
+            ids[activity_id] = None
+        for name in _as_list(row.get("activities")):
+            if not isinstance(name, str) or name not in self.activity_by_name:
+                raise RowError(f"Unknown activity {name!r}")
+            if self.activity_by_name[name] is None:
+                raise RowError(f"Ambiguous activity {name!r}, use activity_ids")
+            ids[self.activity_by_name[name]] = None
+        return list(ids)
+
+
+def to_record(row: Any, references: References) -> Record:
+    if isinstance(row, Exception):
+        raise row
+    if not isinstance(row, dict):
+        raise RowError("Expected an object")
+    name = row.get("name")
+    if not isinstance(name, str) or not name.strip():
+        raise RowError("name is required")
+    phones = _as_list(row.get("phones"))
+    if not all(isinstance(phone, str) and phone for phone in phones):
+        raise RowError("phones must be non-empty strings")
+    return {
+        "name": name.strip(),
+        "building_id": references.building(row),
+        "activity_ids": references.activities(row),
+        "phones": phones,
+    }
+
+
+# --- Loading ---
+
+async def _insert(db: AsyncSession, records: List[Record]) -> None:
+    org_ids = await insert_returning_ids(
+        db, Organization.__table__, [{"name": record["name"], "building_id": record["building_id"]} for record in records]
+    )
+    links = [
+        {"organization_id": org_id, "activity_id": activity_id}
+        for org_id, record in zip(org_ids, records) for activity_id in record["activity_ids"]
+    ]
+    if links:
+        await db.execute(insert(organization_activities), links)
+    phones = [{"organization_id": org_id, "number": number} for org_id, record in zip(org_ids, records) for number in record["phones"]]
+    if phones:
+        await db.execute(insert(Phone.__table__), phones)
+
+
+async def _load_batch(db: AsyncSession, batch: List[Tuple[int, Record]]) -> List[ImportRowError]:
+    """Insert and commit a batch; if the database rejects it, retry row by row to find the culprits."""
+    try:
+        await _insert(db, [record for _, record in batch])
+        await db.commit()
+        return []
+    except DBAPIError:
+        await db.rollback()
+
+    errors = []
+    for number, record in batch:
+        try:
+            await _insert(db, [record])
+            await db.commit()
+        except DBAPIError as exc:
+            await db.rollback()
+            errors.append(ImportRowError(row=number, error=str(exc.orig)))
+    return errors
+
+
+async def import_organizations(
+    db: AsyncSession,
+    rows: AsyncIterable[Tuple[int, Any]],
+    batch_size: int = IMPORT_BATCH_SIZE,
+    progress: Optional[Callable[[ImportReport], None]] = None,
+) -> ImportReport:
+    """Validate and insert parsed `rows` ((row number, row) pairs) in batches of `batch_size`."""
+    started = time.perf_counter()
+    report = ImportReport(rows=0, imported=0, failed=0, errors=[], seconds=0, rows_per_second=0)
+    references = await References().load(db)
+    batch: List[Tuple[int, Record]] = []
+
+    def fail(errors: Iterable[ImportRowError]) -> None:
+        for error in errors:
+            report.failed += 1
+            if len(report.errors) < MAX_REPORTED_ERRORS:
+                report.errors.append(error)
+
+    async def flush() -> None:
+        errors = await _load_batch(db, batch)
+        fail(errors)
+        report.imported += len(batch) - len(errors)
+        batch.clear()
+        report.seconds = time.perf_counter() - started
+        report.rows_per_second = report.rows / report.seconds if report.seconds else 0
+        if progress is not None:
+            progress(report)
+
+    async for number, row in rows:
+        report.rows += 1
+        try:
+            batch.append((number, to_record(row, references)))
+        except RowError as exc:
+            fail([ImportRowError(row=number, error=str(exc))])
+        if len(batch) >= batch_size:
+            await flush()
+    await flush()
+    return report
+
+
+# --- CLI ---
+
+async def _file_chunks(path: str, size: int = 1 << 16) -> AsyncIterator[bytes]:
+    # stdin belongs to the process; only a file opened here is closed here
+    with (contextlib.nullcontext(sys.stdin.buffer) if path == "-" else open(path, "rb")) as source:
+        while chunk := source.read(size):
+            yield chunk
+
+
+async def _main(args) -> None:
+    media_type = NDJSON_MEDIA_TYPE if args.format == "ndjson" else CSV_MEDIA_TYPE
+    rows = PARSERS[media_type](decode_lines(_file_chunks(args.path)))
+
+    def progress(report: ImportReport) -> None:
+        print(f"{report.rows} rows, {report.imported} imported, {report.failed} failed, {report.rows_per_second:.0f} rows/s", file=sys.stderr)
+
+    async with SessionLocal() as session:
+        report = await import_organizations(session, rows, args.batch_size, progress if args.progress else None)
+        # No server may be running to trim what the import logged
+        if session.bind.dialect.name == "sqlite":
+            await prune_change_log(session)
+    for error in report.errors:
+        print(f"row {error.row}: {error.error}", file=sys.stderr)
+    print(f"Imported {report.imported} of {report.rows} rows ({report.failed} failed) in {report.seconds:.1f}s, {report.rows_per_second:.0f} rows/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import organizations from CSV or NDJSON")
+    parser.add_argument("path", help="Input file, or - for stdin")
+    parser.add_argument("--format", choices=("csv", "ndjson"), help="Defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    parser.add_argument("--progress", action="store_true", help="Print a line after every batch")
+    args = parser.parse_args()
+    args.format = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    asyncio.run(_main(args))
@@ -1,35 +1,42 @@
-from fastapi import FastAPI, Request, status
-from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
+from app import metrics, tracing
+from app.auth import APIKeyMiddleware, configured_api_keys
 from app.config import settings
-from app.routers import organizations
+from app.routers import activities, buildings, organizations
+from app.snapshot import start_change_log_pruning, start_snapshot, stop_snapshot
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.SNAPSHOT_ENABLED:
+        await start_snapshot()
+    else:
+        start_change_log_pruning()
+    yield
+    await stop_snapshot()
 
-app = FastAPI(title="Organization Directory API")
+
+app = FastAPI(title="Organization Directory API", lifespan=lifespan)
 
 app.include_router(organizations.router)
+app.include_router(buildings.router)
+app.include_router(activities.router)
+
+HIDDEN_PATHS = {"/docs", "/redoc", "/openapi.json", "/health", "/metrics"}
 
-HIDDEN_PATHS = {"/docs", "/redoc", "/openapi.json", "/health"}
-
-@app.middleware("http")
-async def api_key_middleware(request: Request, call_next):
-    # Allow exact match or with trailing slash for better UX
-    path = request.url.path.rstrip("/")
-    if path in HIDDEN_PATHS or request.url.path == "/openapi.json": 
-        # openapi.json usually doesn't have trailing slash but to be safe
-        # actually rstrip handles it.
-        return await call_next(request)
-    
-    # Also allow strict equality or prefix if needed? Task implies "all other endpoints".
-    # Docs are usually exact paths.
-    
-    api_key = request.headers.get("X-API-KEY")
-    if api_key != settings.STATIC_API_KEY:
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={"detail": "Invalid or missing API Key"}
-        )
-    
-    return await call_next(request)
+app.add_middleware(APIKeyMiddleware, keys=configured_api_keys(), public_paths=HIDDEN_PATHS)
+if settings.QUERY_TRACE_HEADER_ENABLED or settings.QUERY_TRACE_SAMPLE_RATE > 0:
+    app.add_middleware(tracing.QueryTraceMiddleware, header_enabled=settings.QUERY_TRACE_HEADER_ENABLED, sample_rate=settings.QUERY_TRACE_SAMPLE_RATE)
+if settings.METRICS_ENABLED:
+    # Outermost, so rejected API keys are counted too
+    app.add_middleware(metrics.MetricsMiddleware)
 
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
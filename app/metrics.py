@@ -0,0 +1,252 @@
+"""
+Prometheus-style metrics, served as text at /metrics.
+
+Series are plain dicts keyed by label values. Everything that records runs on
+the event loop thread (SQLAlchemy's cursor events included, via greenlets),
+so a request costs a few dict lookups and bisects and no locking.
+
+Other modules register what they own at import time (see app/cache.py);
+this module imports nothing from the app so that anything can import it.
+"""
+import bisect
+import time
+import weakref
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (128, 1024, 8192, 65536, 524288, 4194304)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 10, 20, 50, 100)
+
+# Route label of requests that matched no route (404s, rejected API keys)
+UNMATCHED_ROUTE = "unmatched"
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(name: str, label_names: Sequence[str], labels: Labels, value: float) -> str:
+    if label_names:
+        pairs = ",".join(f'{key}="{_escape(str(item))}"' for key, item in zip(label_names, labels))
+        name = f"{name}{{{pairs}}}"
+    return f"{name} {value}"
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.help}\n# TYPE {self.name} {self.type}\n"
+        return header + "".join(f"{line}\n" for line in self.samples())
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in sorted(self.values.items()):
+            yield _format(self.name, self.label_names, labels, value)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float], labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # Per series: a count per bucket (the last one is +Inf), not cumulative, then the sum
+        self.series: Dict[Labels, List[float]] = {}
+
+    def observe(self, labels: Labels, value: float) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self) -> Iterator[str]:
+        names = self.label_names + ("le",)
+        for labels, series in sorted(self.series.items()):
+            total = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                total += count
+                yield _format(f"{self.name}_bucket", names, labels + (bound,), total)
+            yield _format(f"{self.name}_sum", self.label_names, labels, series[-1])
+            yield _format(f"{self.name}_count", self.label_names, labels, total)
+
+
+class Collected(Metric):
+    """Values read from their owner at scrape time: gauges, or counters kept elsewhere."""
+
+    def __init__(self, name: str, help: str, collect: Callable[[], Iterable[Tuple[Labels, float]]], labels: Sequence[str] = (), type: str = "gauge"):
+        super().__init__(name, help, labels)
+        self.type = type
+        self.collect = collect
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in self.collect():
+            yield _format(self.name, self.label_names, labels, value)
+
+
+REGISTRY: List[Metric] = []
+
+
+def register(metric: Metric) -> Metric:
+    REGISTRY.append(metric)
+    return metric
+
+
+def render() -> str:
+    return "".join(metric.render() for metric in REGISTRY)
+
+
+# --- HTTP ---
+
+REQUESTS = register(Counter("http_requests_total", "Requests handled", ("method", "route", "status")))
+REQUEST_SECONDS = register(Histogram("http_request_duration_seconds", "Time to the last response byte", LATENCY_BUCKETS, ("method", "route")))
+RESPONSE_BYTES = register(Histogram("http_response_size_bytes", "Response body size", SIZE_BUCKETS, ("method", "route")))
+REQUEST_QUERIES = register(Histogram("http_request_db_queries", "SQL statements executed per request", QUERY_COUNT_BUCKETS, ("method", "route")))
+REQUEST_DB_SECONDS = register(Histogram("http_request_db_seconds", "Time spent executing SQL per request", LATENCY_BUCKETS, ("method", "route")))
+
+_in_progress = 0
+register(Collected("http_requests_in_progress", "Requests being handled", lambda: [((), _in_progress)]))
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+# Stats of the request being handled; tasks and greenlets started for it share the object
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def route_label(scope: Scope) -> str:
+    # FastAPI stores the matched route in the scope; its path template keeps the label set bounded
+    return getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+
+
+class MetricsMiddleware:
+    """Plain ASGI middleware, like APIKeyMiddleware: responses stream through untouched."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        global _in_progress
+        status = 500
+        size = 0
+
+        async def counting_send(message: Message) -> None:
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        _in_progress += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, counting_send)
+        finally:
+            elapsed = time.perf_counter() - start
+            _in_progress -= 1
+            _request_stats.reset(token)
+            labels = (scope["method"], route_label(scope))
+            REQUESTS.inc(labels + (str(status),))
+            REQUEST_SECONDS.observe(labels, elapsed)
+            RESPONSE_BYTES.observe(labels, size)
+            REQUEST_QUERIES.observe(labels, stats.queries)
+            REQUEST_DB_SECONDS.observe(labels, stats.db_seconds)
+
+
+# --- Database ---
+
+QUERIES = register(Counter("db_queries_total", "SQL statements executed", ("database",)))
+QUERY_SECONDS = register(Counter("db_query_seconds_total", "Time spent executing SQL", ("database",)))
+POOL_CHECKOUT_SECONDS = register(Histogram("db_pool_checkout_seconds", "Time to get a connection from the pool, waiting included", LATENCY_BUCKETS, ("database",)))
+
+# Instrumented (sync) engines and their database label
+_engines: "weakref.WeakKeyDictionary[Engine, str]" = weakref.WeakKeyDictionary()
+
+
+def _pool_checked_out() -> Iterator[Tuple[Labels, float]]:
+    for sync_engine, database in list(_engines.items()):
+        checkedout = getattr(sync_engine.pool, "checkedout", None)
+        if checkedout is not None:
+            yield (database,), checkedout()
+
+
+register(Collected("db_pool_checked_out", "Connections currently checked out", _pool_checked_out, ("database",)))
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Count statements, SQL time and pool checkout time of `engine`; repeat calls are no-ops."""
+    sync_engine = engine.sync_engine
+    if sync_engine in _engines:
+        return
+    database = engine.url.render_as_string(hide_password=True)
+    _engines[sync_engine] = database
+    labels = (database,)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _started(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _finished(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._metrics_started
+        QUERIES.inc(labels)
+        QUERY_SECONDS.inc(labels, elapsed)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+
+    # Pool events only fire once a connection is handed out, so the wait is
+    # timed around Engine.raw_connection, which every Connection goes through
+    raw_connection = sync_engine.raw_connection
+
+    def timed_raw_connection():
+        start = time.perf_counter()
+        try:
+            return raw_connection()
+        finally:
+            POOL_CHECKOUT_SECONDS.observe(labels, time.perf_counter() - start)
+
+    sync_engine.raw_connection = timed_raw_connection
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Table, event
-from sqlalchemy.orm import relationship, Mapped, mapped_column
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Index, Table, event, or_, select, update
+from sqlalchemy.orm import relationship, Mapped, mapped_column, Session
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from .database import Base
@@ -10,14 +10,35 @@ organization_activities = Table(
     Base.metadata,
     Column("organization_id", ForeignKey("organizations.id"), primary_key=True),
     Column("activity_id", ForeignKey("activities.id"), primary_key=True),
+    # The primary key only serves organization_id lookups; activity search goes the other way
+    Index("ix_organization_activities_activity_id", "activity_id"),
+)
+
+# Closure table for the activity tree: one row per (ancestor, descendant) pair,
+# including every activity paired with itself at depth 0. Maintained by triggers
+# on activities (see below), so a subtree is a single indexed lookup on ancestor_id.
+activity_closure = Table(
+    "activity_closure",
+    Base.metadata,
+    Column("ancestor_id", ForeignKey("activities.id", ondelete="CASCADE"), primary_key=True),
+    Column("descendant_id", ForeignKey("activities.id", ondelete="CASCADE"), primary_key=True),
+    Column("depth", Integer, nullable=False),
+    Index("ix_activity_closure_descendant_id", "descendant_id"),
 )
 
 class Activity(Base):
     __tablename__ = "activities"
+    # Ids are never reused on SQLite either, so (count, sum of ids, sum of versions)
+    # identifies a version of the table (see app/activity_tree.py)
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String, index=True)
     parent_id: Mapped[int | None] = mapped_column(ForeignKey("activities.id"), nullable=True)
+    # Bumped on every change, see _bump_versions below
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"eager_defaults": True}
 
     # Self-referencing relationship
     children = relationship("Activity", back_populates="parent", cascade="all, delete-orphan")
@@ -35,9 +56,15 @@ class Building(Base):
     address: Mapped[str] = mapped_column(String)
     latitude: Mapped[float] = mapped_column(Float)
     longitude: Mapped[float] = mapped_column(Float)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")
 
     organizations = relationship("Organization", back_populates="building")
 
+    # Bounding-box prefilter for geo searches: latitude range scan, longitude checked on the index entry.
+    # Ids are never reused on SQLite either, so the list fingerprints (count, version and id sums) cannot repeat
+    __table_args__ = (Index("ix_buildings_lat_lon", "latitude", "longitude"), {"sqlite_autoincrement": True})
+    __mapper_args__ = {"eager_defaults": True}
+
     def __repr__(self):
         return f"<Building(id={self.id}, address='{self.address}')>"
 
@@ -46,7 +73,14 @@ class Organization(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String, index=True)
-    building_id: Mapped[int] = mapped_column(ForeignKey("buildings.id"), nullable=False)
+    building_id: Mapped[int] = mapped_column(ForeignKey("buildings.id"), nullable=False, index=True)
+    # Version of the whole payload: also bumped when phones, activity links,
+    # the building or a linked activity change
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")
+
+    # Ids are never reused on SQLite either, so the per-building fingerprints cannot repeat
+    __table_args__ = {"sqlite_autoincrement": True}
+    __mapper_args__ = {"eager_defaults": True}
 
     building = relationship("Building", back_populates="organizations")
     activities = relationship("Activity", secondary=organization_activities, back_populates="organizations")
@@ -117,3 +151,186 @@ END;
 
 event.listen(Activity.__table__, 'after_create', trigger_insert_ddl)
 event.listen(Activity.__table__, 'after_create', trigger_update_ddl)
+
+# --- Activity closure maintenance ---
+
+closure_insert_ddl = DDL("""
+CREATE TRIGGER activity_closure_insert
+AFTER INSERT ON activities
+FOR EACH ROW
+BEGIN
+    INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+    SELECT NEW.id, NEW.id, 0;
+    INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+    SELECT ancestor_id, NEW.id, depth + 1
+    FROM activity_closure WHERE descendant_id = NEW.parent_id;
+END;
+""")
+
+# Re-parenting moves the whole subtree: drop paths from the old ancestors
+# into the subtree, then link every new ancestor to every subtree node.
+closure_update_ddl = DDL("""
+CREATE TRIGGER activity_closure_update
+AFTER UPDATE OF parent_id ON activities
+FOR EACH ROW
+WHEN OLD.parent_id IS NOT NEW.parent_id
+BEGIN
+    DELETE FROM activity_closure
+    WHERE descendant_id IN (SELECT descendant_id FROM activity_closure WHERE ancestor_id = NEW.id)
+      AND ancestor_id NOT IN (SELECT descendant_id FROM activity_closure WHERE ancestor_id = NEW.id);
+    INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+    SELECT super.ancestor_id, sub.descendant_id, super.depth + sub.depth + 1
+    FROM activity_closure AS super, activity_closure AS sub
+    WHERE super.descendant_id = NEW.parent_id AND sub.ancestor_id = NEW.id;
+END;
+""")
+
+closure_delete_ddl = DDL("""
+CREATE TRIGGER activity_closure_delete
+AFTER DELETE ON activities
+FOR EACH ROW
+BEGIN
+    DELETE FROM activity_closure WHERE descendant_id = OLD.id OR ancestor_id = OLD.id;
+END;
+""")
+
+event.listen(activity_closure, 'after_create', closure_insert_ddl)
+event.listen(activity_closure, 'after_create', closure_update_ddl)
+event.listen(activity_closure, 'after_create', closure_delete_ddl)
+
+# --- Organization name search index ---
+
+# External-content FTS5 table over organizations.name with the trigram tokenizer,
+# so case-insensitive substring matches are answered from the index.
+# Only created on SQLite; other backends use the plain ILIKE search.
+fts_table_ddl = DDL("""
+CREATE VIRTUAL TABLE organizations_fts USING fts5(
+    name, content='organizations', content_rowid='id', tokenize='trigram'
+);
+""")
+
+fts_insert_ddl = DDL("""
+CREATE TRIGGER organizations_fts_insert
+AFTER INSERT ON organizations
+BEGIN
+    INSERT INTO organizations_fts (rowid, name) VALUES (NEW.id, NEW.name);
+END;
+""")
+
+fts_update_ddl = DDL("""
+CREATE TRIGGER organizations_fts_update
+AFTER UPDATE OF name ON organizations
+BEGIN
+    INSERT INTO organizations_fts (organizations_fts, rowid, name) VALUES ('delete', OLD.id, OLD.name);
+    INSERT INTO organizations_fts (rowid, name) VALUES (NEW.id, NEW.name);
+END;
+""")
+
+fts_delete_ddl = DDL("""
+CREATE TRIGGER organizations_fts_delete
+AFTER DELETE ON organizations
+BEGIN
+    INSERT INTO organizations_fts (organizations_fts, rowid, name) VALUES ('delete', OLD.id, OLD.name);
+END;
+""")
+
+for ddl in (fts_table_ddl, fts_insert_ddl, fts_update_ddl, fts_delete_ddl):
+    event.listen(Organization.__table__, 'after_create', ddl.execute_if(dialect='sqlite'))
+
+event.listen(Organization.__table__, 'before_drop', DDL("DROP TABLE IF EXISTS organizations_fts").execute_if(dialect='sqlite'))
+
+# --- Version counters ---
+#
+# Versions back the ETags of read endpoints. Increments are computed in SQL
+# (version = version + 1) so concurrent writers never hand out the same number.
+
+@event.listens_for(Session, "before_flush")
+def _bump_versions(session, flush_context, instances):
+    bumped_org_ids = set()
+    org_ids = set()
+    building_ids = set()
+    activity_ids = set()
+
+    for obj in session.dirty:
+        if isinstance(obj, (Organization, Building, Activity)) and session.is_modified(obj):
+            obj.version = type(obj).version + 1
+            if isinstance(obj, Organization):
+                bumped_org_ids.add(obj.id)
+            elif isinstance(obj, Building):
+                building_ids.add(obj.id)
+            else:
+                activity_ids.add(obj.id)
+
+    for obj in session.deleted:
+        if isinstance(obj, Activity):
+            activity_ids.add(obj.id)
+
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Phone) and obj.organization_id is not None:
+            org_ids.add(obj.organization_id)
+
+    # Organizations embedding a changed phone, building or activity
+    conditions = []
+    if org_ids:
+        conditions.append(Organization.id.in_(org_ids))
+    if building_ids:
+        conditions.append(Organization.building_id.in_(building_ids))
+    if activity_ids:
+        conditions.append(Organization.id.in_(
+            select(organization_activities.c.organization_id)
+            .where(organization_activities.c.activity_id.in_(activity_ids))
+        ))
+    if conditions:
+        stmt = (
+            update(Organization.__table__)
+            .where(or_(*conditions))
+            .values(version=Organization.__table__.c.version + 1)
+        )
+        if bumped_org_ids:
+            stmt = stmt.where(Organization.__table__.c.id.not_in(bumped_org_ids))
+        # Connection-level on purpose: not an application bulk write (see app/cache.py)
+        session.connection().execute(stmt)
+
+# --- Change log ---
+#
+# Every row change in the directory appends (entity, id) here, so in-process
+# snapshots (app/snapshot.py) can refresh incrementally, whichever process or
+# statement made the change. Phones and activity links are logged as changes
+# of their organization. Only kept on SQLite, like the name index.
+
+change_log = Table(
+    "change_log",
+    Base.metadata,
+    Column("seq", Integer, primary_key=True),
+    Column("entity", String, nullable=False),
+    Column("entity_id", Integer, nullable=False),
+    # Never reuse sequence numbers, even after the newest rows are pruned
+    sqlite_autoincrement=True,
+)
+
+# (table, logged entity, column holding the entity id)
+CHANGE_LOG_SOURCES = [
+    ("buildings", "building", "id"),
+    ("activities", "activity", "id"),
+    ("organizations", "organization", "id"),
+    ("phones", "organization", "organization_id"),
+    ("organization_activities", "organization", "organization_id"),
+]
+
+
+def change_log_trigger_ddl(table: str, entity: str, column: str, operation: str) -> str:
+    rows = {"INSERT": ["NEW"], "UPDATE": ["NEW"] if column == "id" else ["OLD", "NEW"], "DELETE": ["OLD"]}[operation]
+    inserts = "".join(f"    INSERT INTO change_log (entity, entity_id) VALUES ('{entity}', {row}.{column});\n" for row in rows)
+    return f"""
+CREATE TRIGGER change_log_{table}_{operation.lower()}
+AFTER {operation} ON {table}
+FOR EACH ROW
+BEGIN
+{inserts}END;
+"""
+
+
+for source, entity, column in CHANGE_LOG_SOURCES:
+    for operation in ("INSERT", "UPDATE", "DELETE"):
+        ddl = DDL(change_log_trigger_ddl(source, entity, column, operation))
+        event.listen(Base.metadata.tables[source], 'after_create', ddl.execute_if(dialect='sqlite'))
@@ -0,0 +1,91 @@
+import base64
+import binascii
+import json
+import math
+from typing import Any, Callable, List, Optional, Sequence
+
+from fastapi import HTTPException, Query, Response, status
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# List bodies stay plain JSON arrays; the cursor for the following page travels in a header
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Database integers are 64-bit; a larger Python int fails when it is bound
+INT64_MIN, INT64_MAX = -(1 << 63), (1 << 63) - 1
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _is_a(value: Any, kind: type) -> bool:
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, int) and kind in (int, float):
+        # JSON has one number type, so a float position may come back as an int
+        return INT64_MIN <= value <= INT64_MAX
+    if kind is float:
+        return isinstance(value, float) and math.isfinite(value)
+    return isinstance(value, kind)
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> List[Any]:
+    """Cursor positions, one per sort key; each must be of the matching type in `types`."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        values = None
+    if not isinstance(values, list) or len(values) != len(types) or not all(map(_is_a, values, types)):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return values
+
+
+class PageParams:
+    """Query parameters shared by every paginated list endpoint."""
+
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of items per page"),
+        cursor: Optional[str] = Query(None, description=f"Opaque cursor taken from the {NEXT_CURSOR_HEADER} response header"),
+    ):
+        self.limit = limit
+        self.cursor = cursor
+
+
+def _after(keys, values):
+    # (k1, k2, ...) > (v1, v2, ...) spelled out, so it works without row-value support
+    clauses = []
+    for i, (key, value) in enumerate(zip(keys, values)):
+        equal_prefix = [k == v for k, v in zip(keys[:i], values[:i])]
+        clauses.append(and_(*equal_prefix, key > value))
+    return or_(*clauses)
+
+
+def resume(query, cursor: Optional[str], *keys):
+    """Order by `keys` (the last one must be unique, usually the id) and start right after the cursor position."""
+    query = query.order_by(*keys)
+    if cursor is not None:
+        query = query.where(_after(keys, decode_cursor(cursor, [key.type.python_type for key in keys])))
+    return query
+
+
+def seek(query, page: PageParams, *keys):
+    """
+    One page of `query` in `keys` order. One extra row is fetched to learn
+    whether another page exists, so deep pages cost the same as the first.
+    """
+    return resume(query, page.cursor, *keys).limit(page.limit + 1)
+
+
+def finish(rows: Sequence[Any], page: PageParams, response: Response, key: Callable[[Any], Sequence[Any]]) -> List[Any]:
+    """Trim the look-ahead row and publish the cursor of the last returned item."""
+    rows = list(rows)
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(key(rows[-1]))
+    return rows
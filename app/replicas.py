@@ -0,0 +1,192 @@
+import asyncio
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, AsyncIterator, List, Optional
+
+from fastapi import Depends, Request
+from sqlalchemy import event, text
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import RESPONSE_INFO_KEY, get_db, make_engine
+
+ROUND_ROBIN = "round_robin"
+LEAST_LOADED = "least_loaded"
+
+# Requests carrying this header (value "primary") or an unexpired cookie read from the primary
+CONSISTENCY_HEADER = "X-Read-Consistency"
+READ_PRIMARY_COOKIE = "read_primary_until"
+
+HEALTH_CHECK_TIMEOUT_SECONDS = 1.0
+
+_REPLICA_INFO_KEY = "replica_url"
+_WROTE_INFO_KEY = "replica_wrote"
+
+
+class Replica:
+    def __init__(self, url: str):
+        self.url = url
+        self.engine = make_engine(url)
+        self.sessionmaker = async_sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=self.engine, class_=AsyncSession)
+        self.in_flight = 0
+        self.healthy = True
+        self.checked_at = float("-inf")
+
+
+class ReplicaSet:
+    """
+    Read replicas behind GET endpoints. Replicas are picked round-robin or by
+    fewest sessions in use, skipping those that failed their last health check;
+    with none available the caller falls back to the primary.
+    """
+
+    def __init__(self, urls: List[str], strategy: str = ROUND_ROBIN, health_interval: float = 5.0):
+        if strategy not in (ROUND_ROBIN, LEAST_LOADED):
+            raise ValueError(f"Unknown read replica strategy: {strategy}")
+        self.replicas = [Replica(url) for url in urls]
+        self.strategy = strategy
+        self.health_interval = health_interval
+        self._turn = itertools.count()
+
+    def __bool__(self) -> bool:
+        return bool(self.replicas)
+
+    def _candidates(self) -> List[Replica]:
+        start = next(self._turn) % len(self.replicas)
+        rotated = self.replicas[start:] + self.replicas[:start]
+        if self.strategy == LEAST_LOADED:
+            # Stable sort: ties keep the rotation, so idle replicas still share the load
+            rotated.sort(key=lambda replica: replica.in_flight)
+        return rotated
+
+    async def _probe(self, replica: Replica) -> None:
+        async with replica.engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    async def _is_healthy(self, replica: Replica) -> bool:
+        now = time.monotonic()
+        if now - replica.checked_at < self.health_interval:
+            return replica.healthy
+        replica.checked_at = now
+        try:
+            # Connecting is timed too: a dead host can hold it for the OS connect timeout
+            await asyncio.wait_for(self._probe(replica), HEALTH_CHECK_TIMEOUT_SECONDS)
+            replica.healthy = True
+        except (OperationalError, InterfaceError, OSError, asyncio.TimeoutError):
+            replica.healthy = False
+        return replica.healthy
+
+    def mark_failed(self, replica: Replica) -> None:
+        replica.healthy = False
+        replica.checked_at = time.monotonic()
+
+    async def choose(self) -> Optional[Replica]:
+        if not self.replicas:
+            return None
+        for replica in self._candidates():
+            if await self._is_healthy(replica):
+                return replica
+        return None
+
+    async def dispose(self) -> None:
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+
+replicas = ReplicaSet(
+    settings.READ_REPLICA_URLS,
+    strategy=settings.READ_REPLICA_STRATEGY,
+    health_interval=settings.READ_REPLICA_HEALTH_INTERVAL_SECONDS,
+)
+
+
+def reads_from_primary(request: Request) -> bool:
+    if request.headers.get(CONSISTENCY_HEADER, "").lower() == "primary":
+        return True
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, "")) > time.time()
+    except ValueError:
+        return False
+
+
+def is_replica_session(db: AsyncSession) -> bool:
+    return _REPLICA_INFO_KEY in db.info
+
+
+async def get_read_db(request: Request, primary: AsyncSession = Depends(get_db)) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Session for read-only handlers: a healthy replica when configured, else the
+    primary session (which opens no connection until it is used).
+    """
+    replica = None if reads_from_primary(request) else await replicas.choose()
+    if replica is None:
+        yield primary
+        return
+    async with _replica_session(replica) as session:
+        yield session
+
+
+@asynccontextmanager
+async def _replica_session(replica: Replica) -> AsyncIterator[AsyncSession]:
+    """Session on `replica`, counted in its in_flight; connection errors mark it failed."""
+    replica.in_flight += 1
+    try:
+        async with replica.sessionmaker() as session:
+            session.info[_REPLICA_INFO_KEY] = replica.url
+            yield session
+    except (OperationalError, InterfaceError):
+        replicas.mark_failed(replica)
+        raise
+    finally:
+        replica.in_flight -= 1
+
+
+@asynccontextmanager
+async def stream_session(db: AsyncSession) -> AsyncIterator[AsyncSession]:
+    """
+    A new session on the database `db` reads from, for a response body that is
+    sent after the request's session dependency has exited. A replica gets the
+    same accounting as in get_read_db for as long as the stream runs.
+    """
+    url = db.info.get(_REPLICA_INFO_KEY)
+    replica = next((replica for replica in replicas.replicas if replica.url == url), None)
+    if replica is None:
+        async with AsyncSession(db.bind, autoflush=False, expire_on_commit=False) as session:
+            yield session
+        return
+    async with _replica_session(replica) as session:
+        yield session
+
+
+# --- Read-your-writes ---
+#
+# A request whose primary session commits a write gets a cookie that sends the
+# client's reads to the primary until replicas (and the in-memory snapshot, see
+# app/snapshot.py) have had time to catch up.
+
+@event.listens_for(Session, "after_flush")
+def _note_flush(session: Session, flush_context) -> None:
+    session.info[_WROTE_INFO_KEY] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _note_bulk_statement(orm_execute_state) -> None:
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info[_WROTE_INFO_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _set_read_primary_cookie(session: Session) -> None:
+    response = session.info.get(RESPONSE_INFO_KEY)
+    if session.info.pop(_WROTE_INFO_KEY, False) and response is not None and (replicas or settings.SNAPSHOT_ENABLED):
+        lag = settings.READ_REPLICA_MAX_LAG_SECONDS
+        response.set_cookie(READ_PRIMARY_COOKIE, f"{time.time() + lag:.3f}", max_age=math.ceil(lag), httponly=True, samesite="lax")
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_write(session: Session, previous_transaction) -> None:
+    session.info.pop(_WROTE_INFO_KEY, None)
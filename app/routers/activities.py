@@ -0,0 +1,73 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.activity_tree import get_activity_tree
+from app.conditional import etag_matches, not_modified
+from app.crud import write_activities, write_many, write_one
+from app.database import get_db
+from app.models import Activity
+from app.replicas import get_read_db
+from app.schemas import Activity as ActivitySchema, ActivityBatch, ActivityCreate, ActivityFlat, ActivityUpdate, BatchResult
+
+router = APIRouter(prefix="/activities", tags=["activities"])
+
+ANCESTORS_HEADER = "X-Activity-Ancestors"
+
+
+async def _activity(db: AsyncSession, activity_id: int) -> dict:
+    row = (await db.execute(select(Activity.name, Activity.id, Activity.parent_id).where(Activity.id == activity_id))).one_or_none()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Activity not found")
+    return row._asdict()
+
+
+@router.post("", response_model=ActivityFlat, status_code=201, summary="Create Activity", description="Create an activity, optionally under an existing parent. Trees are at most 3 levels deep.")
+async def create_activity(payload: ActivityCreate, db: AsyncSession = Depends(get_db)):
+    result = await write_one(write_activities, db, ActivityBatch(create=[payload]))
+    return await _activity(db, result.created[0])
+
+
+@router.get("/tree", response_model=List[ActivitySchema], summary="Get Activity Tree", description="The whole activity taxonomy as nested root activities, children in id order. Served from an in-memory copy rebuilt when activities change; supports conditional requests via a strong ETag / If-None-Match.")
+async def get_activity_tree_route(if_none_match: Optional[str] = Header(None), db: AsyncSession = Depends(get_read_db)):
+    tree = await get_activity_tree(db)
+    if etag_matches(if_none_match, tree.etag):
+        return not_modified(tree.etag)
+    return Response(content=tree.content, media_type="application/json", headers={"ETag": tree.etag})
+
+
+@router.get("/{activity_id}/subtree", response_model=ActivitySchema, summary="Get Activity Subtree", description=f"An activity with its nested sub-activities. The `{ANCESTORS_HEADER}` header lists the ids above it, root first. Supports conditional requests via a strong ETag / If-None-Match.")
+async def get_activity_subtree(activity_id: int, if_none_match: Optional[str] = Header(None), db: AsyncSession = Depends(get_read_db)):
+    tree = await get_activity_tree(db)
+    if activity_id not in tree:
+        raise HTTPException(status_code=404, detail="Activity not found")
+    content, etag = tree.subtree(activity_id)
+    headers = {"ETag": etag, ANCESTORS_HEADER: ",".join(map(str, tree.ancestors[activity_id]))}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+@router.get("/{activity_id}", response_model=ActivityFlat, summary="Get Activity by ID", description="Retrieve a single activity.")
+async def get_activity(activity_id: int, db: AsyncSession = Depends(get_read_db)):
+    return await _activity(db, activity_id)
+
+
+@router.put("/{activity_id}", response_model=ActivityFlat, summary="Replace Activity", description="Rename an activity or move it, with its sub-activities, under another parent. The resulting tree must stay within 3 levels.")
+async def replace_activity(activity_id: int, payload: ActivityCreate, db: AsyncSession = Depends(get_db)):
+    await write_one(write_activities, db, ActivityBatch(update=[ActivityUpdate(id=activity_id, **payload.model_dump())]))
+    return await _activity(db, activity_id)
+
+
+@router.delete("/{activity_id}", status_code=204, summary="Delete Activity", description="Delete an activity and unlink it from organizations. Activities with sub-activities cannot be deleted (409).")
+async def delete_activity(activity_id: int, response: Response, db: AsyncSession = Depends(get_db)):
+    await write_one(write_activities, db, ActivityBatch(delete=[activity_id]))
+    # Keeps the read-your-writes cookie set on the injected response at commit
+    return Response(status_code=204, headers=dict(response.headers))
+
+
+@router.post(":batch", response_model=BatchResult, summary="Batch Write Activities", description="Create, replace and delete activities in one transaction using bulk statements. New activities must hang under existing ones. If any item is rejected nothing is written and the 422 response lists every rejected item.")
+async def batch_write_activities(batch: ActivityBatch, db: AsyncSession = Depends(get_db)):
+    return await write_many(write_activities, db, batch)
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud import write_buildings, write_many, write_one
+from app.database import get_db
+from app.models import Building
+from app.replicas import get_read_db
+from app.schemas import BatchResult, Building as BuildingSchema, BuildingBatch, BuildingCreate, BuildingUpdate
+from app.serialization import building_row
+
+router = APIRouter(prefix="/buildings", tags=["buildings"])
+
+
+async def _building(db: AsyncSession, building_id: int) -> dict:
+    row = (await db.execute(
+        select(Building.id, Building.address, Building.latitude, Building.longitude).where(Building.id == building_id)
+    )).one_or_none()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Building not found")
+    return building_row(row)
+
+
+@router.post("", response_model=BuildingSchema, status_code=201, summary="Create Building", description="Create a building with its address and coordinates.")
+async def create_building(payload: BuildingCreate, db: AsyncSession = Depends(get_db)):
+    result = await write_one(write_buildings, db, BuildingBatch(create=[payload]))
+    return await _building(db, result.created[0])
+
+
+@router.get("/{building_id}", response_model=BuildingSchema, summary="Get Building by ID", description="Retrieve a single building.")
+async def get_building(building_id: int, db: AsyncSession = Depends(get_read_db)):
+    return await _building(db, building_id)
+
+
+@router.put("/{building_id}", response_model=BuildingSchema, summary="Replace Building", description="Replace a building's address and coordinates.")
+async def replace_building(building_id: int, payload: BuildingCreate, db: AsyncSession = Depends(get_db)):
+    await write_one(write_buildings, db, BuildingBatch(update=[BuildingUpdate(id=building_id, **payload.model_dump())]))
+    return await _building(db, building_id)
+
+
+@router.delete("/{building_id}", status_code=204, summary="Delete Building", description="Delete a building. Buildings that still have organizations cannot be deleted (409).")
+async def delete_building(building_id: int, response: Response, db: AsyncSession = Depends(get_db)):
+    await write_one(write_buildings, db, BuildingBatch(delete=[building_id]))
+    # Keeps the read-your-writes cookie set on the injected response at commit
+    return Response(status_code=204, headers=dict(response.headers))
+
+
+@router.post(":batch", response_model=BatchResult, summary="Batch Write Buildings", description="Create, replace and delete buildings in one transaction using bulk statements. If any item is rejected nothing is written and the 422 response lists every rejected item.")
+async def batch_write_buildings(batch: BuildingBatch, db: AsyncSession = Depends(get_db)):
+    return await write_many(write_buildings, db, batch)
@@ -1,110 +1,231 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+import math
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
-from typing import List
+from sqlalchemy import func, select
+from typing import Dict, List, Optional, Sequence, Tuple
 
+from app.cache import generation, organization_key, read_through_many
+from app.conditional import content_etag, etag_matches, fingerprint_etag, not_modified
+from app.crud import write_many, write_one, write_organizations
 from app.database import get_db
-from app.models import Organization
-from app.schemas import Organization as OrganizationSchema, Building
+from app.fulltext import FUZZY_MATCH, MIN_INDEXED_QUERY_LENGTH, NAME_SEARCH_CURSOR, fuzzy_search, substring_search, supports_fulltext
+from app.geo import EARTH_RADIUS_KM, BoundingBox, bounding_boxes, haversine_km, within_boxes
+from app.importer import IMPORT_BATCH_SIZE, IMPORT_MEDIA_TYPES, MAX_IMPORT_BATCH_SIZE, PARSERS, decode_lines, import_organizations
+from app.models import Organization, Building
+from app.pagination import INT64_MAX, INT64_MIN, NEXT_CURSOR_HEADER, PageParams, decode_cursor, finish, resume, seek
+from app.replicas import get_read_db, is_replica_session
+from app.search import SearchParams, compound_search, organization_ids_in_activity_subtree
+from app.singleflight import coalesce
+from app.snapshot import Snapshot, get_snapshot
+from app.schemas import (
+    Organization as OrganizationSchema, Building as BuildingSchema, BatchResult, ImportReport,
+    OrganizationBatch, OrganizationCreate, OrganizationUpdate, OrganizationWithDistance,
+)
+from app.serialization import (
+    NDJSON_RESPONSES, ORGANIZATION_FIELDS, building_row, buildings_adapter, fetch_organization_rows, json_response, organization_adapter,
+    organization_fields, organization_list_adapter, ndjson_response, wants_ndjson,
+)
 
 router = APIRouter(prefix="/organizations", tags=["organizations"])
 
-@router.get("/search/name", response_model=List[OrganizationSchema], summary="Search Organizations by Name", description="Find organizations whose name matches the query string (case-insensitive partial match).")
+# Nearest-neighbour search starts with a small ring and widens it until k matches are inside
+KNN_INITIAL_RADIUS_KM = 1.0
+KNN_MAX_RADIUS_KM = math.pi * EARTH_RADIUS_KM  # half the circumference covers the globe
+
+MAX_BATCH_GET_IDS = 500
+MISSING_IDS_HEADER = "X-Missing-Ids"
+
+@router.get("/search/name", response_model=List[OrganizationSchema], summary="Search Organizations by Name", description="Find organizations whose name contains the query string (ASCII letters match case-insensitively). Prefix matches come first, then shorter names; when nothing contains the query, close spellings are returned instead.")
 async def search_organizations_by_name(
+    response: Response,
     q: str = Query(..., min_length=1, description="Partial name to search for"),
-    db: AsyncSession = Depends(get_db)
+    page: PageParams = Depends(),
+    fields: Tuple[str, ...] = Depends(organization_fields),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    query = (
-        select(Organization)
-        .options(
-            selectinload(Organization.building),
-            selectinload(Organization.activities),
-            selectinload(Organization.phones)
-        )
-        .where(Organization.name.ilike(f"%{q}%"))
-    )
-    result = await db.execute(query)
-    return result.scalars().all()
+    if snapshot is not None:
+        ids = snapshot.search_name(q, page, response)
+        return json_response(organization_list_adapter(fields), snapshot.organization_rows(ids, fields), response)
+
+    if len(q) < MIN_INDEXED_QUERY_LENGTH or not supports_fulltext(db):
+        # Too short for the trigram index: walk the name index in order and stop once the page is full
+        query = select(Organization.id, Organization.name).where(Organization.name.icontains(q, autoescape=True))
+        result = await db.execute(seek(query, page, Organization.name, Organization.id))
+        rows = finish(result.all(), page, response, lambda row: (row.name, row.id))
+        return json_response(organization_list_adapter(fields), await fetch_organization_rows(db, [row.id for row in rows], fields=fields), response)
+
+    # Cursors carry the match class, so later pages stay in the mode of the first one
+    after = decode_cursor(page.cursor, NAME_SEARCH_CURSOR) if page.cursor else None
+    if after is None or after[0] != FUZZY_MATCH:
+        query, keys = substring_search(q)
+        result = await db.execute(seek(query, page, *keys))
+        rows = finish(result.all(), page, response, lambda row: (row.match_class, row.name_length, row.id))
+        if rows or after is not None:
+            return json_response(organization_list_adapter(fields), await fetch_organization_rows(db, [row.id for row in rows], fields=fields), response)
+
+    ranked = await fuzzy_search(db, q, after[1:] if after else None, page.limit + 1)
+    ranked = finish(ranked, page, response, lambda item: (FUZZY_MATCH, item[1], item[0]))
+    return json_response(organization_list_adapter(fields), await fetch_organization_rows(db, [org_id for org_id, _ in ranked], fields=fields), response)
+
+@router.get("/search", response_model=List[OrganizationSchema], summary="Search Organizations", description="Combine any of the name, activity (with sub-categories), building, bounding box and radius filters in one query. Results are paginated and ordered by name, or by distance from lat/lon with `sort=distance`; when lat/lon are given every item also carries `distance_km`. The `X-Search-Plan` header names the filter the search was driven from (`order` when it walked the sort order).")
+async def search_organizations(
+    response: Response,
+    params: SearchParams = Depends(),
+    page: PageParams = Depends(),
+    fields: Tuple[str, ...] = Depends(organization_fields),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+    db: AsyncSession = Depends(get_read_db)
+):
+    if snapshot is not None:
+        matches = snapshot.compound_search(params, page, response)
+    else:
+        matches = await compound_search(db, params, page, response)
+    if params.point is None:
+        ids = [row.id for row in matches]
+        rows = snapshot.organization_rows(ids, fields) if snapshot is not None else await fetch_organization_rows(db, ids, fields=fields)
+        return json_response(organization_list_adapter(fields), rows, response)
+    rows = await _rows_with_distances(db, snapshot, matches, fields)
+    return json_response(organization_list_adapter(fields, with_distance=True), rows, response)
+
+def organization_entry(row) -> bytes:
+    """Cache entry "<etag>\n<payload>"; the ETag hashes the payload."""
+    payload = organization_adapter.dump_json(row)
+    return content_etag(payload).encode() + b"\n" + payload
+
+async def _organization_entries(db: AsyncSession, org_ids: List[int]) -> Dict[int, bytes]:
+    """
+    Cache entries ("<etag>\n<payload>") for the organizations in `org_ids` that
+    exist. Entries are dropped whenever the organization, its phones, activities
+    or building change (see app/cache.py); misses are loaded together.
+    """
+    async def load(keys: List[str]) -> Dict[str, bytes]:
+        rows = await fetch_organization_rows(db, [ids_by_key[key] for key in keys])
+        return {organization_key(row["id"]): organization_entry(row) for row in rows}
+
+    ids_by_key = {organization_key(org_id): org_id for org_id in org_ids}
+    entries = await read_through_many(list(ids_by_key), load, from_replica=is_replica_session(db))
+    return {ids_by_key[key]: entry for key, entry in entries.items()}
+
+def _snapshot_entries(snapshot: Snapshot, org_ids: List[int]) -> Dict[int, bytes]:
+    """The same entries rendered from the in-memory snapshot."""
+    return {row["id"]: organization_entry(row) for row in snapshot.organization_rows(org_ids)}
+
+def _parse_ids(ids: str) -> List[int]:
+    try:
+        parsed = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=422, detail="ids must be a comma-separated list of integers") from None
+    if any(not INT64_MIN <= org_id <= INT64_MAX for org_id in parsed):
+        raise HTTPException(status_code=422, detail="ids must be 64-bit integers")
+    # Duplicates are returned once, at their first position
+    parsed = list(dict.fromkeys(parsed))
+    if not parsed:
+        raise HTTPException(status_code=422, detail="ids must not be empty")
+    if len(parsed) > MAX_BATCH_GET_IDS:
+        raise HTTPException(status_code=422, detail=f"At most {MAX_BATCH_GET_IDS} ids per request")
+    return parsed
 
-@router.get("/{org_id}", response_model=OrganizationSchema, summary="Get Organization by ID", description="Retrieve detailed information about a specific organization, including its building, activities, and phone numbers.")
+@router.get("", response_model=List[OrganizationSchema], summary="Get Organizations by IDs", description=f"Retrieve up to {MAX_BATCH_GET_IDS} organizations in one request, in the order the ids are given. Ids that do not exist are skipped and listed in the `{MISSING_IDS_HEADER}` header. Shares the cache of the single-organization endpoint and supports conditional requests via ETag / If-None-Match.")
+async def get_organizations_by_ids(
+    ids: str = Query(..., description="Comma-separated organization ids, e.g. `1,2,3`"),
+    if_none_match: Optional[str] = Header(None),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+    db: AsyncSession = Depends(get_read_db)
+):
+    org_ids = _parse_ids(ids)
+    entries = _snapshot_entries(snapshot, org_ids) if snapshot is not None else await _organization_entries(db, org_ids)
+
+    found = [entries[org_id].split(b"\n", 1) for org_id in org_ids if org_id in entries]
+    etag = fingerprint_etag("organizations", org_ids, [entry_etag for entry_etag, _ in found])
+    headers = {"ETag": etag}
+    missing = [org_id for org_id in org_ids if org_id not in entries]
+    if missing:
+        headers[MISSING_IDS_HEADER] = ",".join(map(str, missing))
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    # Cached payloads are already JSON; the array is spliced together without re-encoding
+    return Response(content=b"[" + b",".join(payload for _, payload in found) + b"]", media_type="application/json", headers=headers)
+
+@router.get("/{org_id}", response_model=OrganizationSchema, summary="Get Organization by ID", description="Retrieve detailed information about a specific organization, including its building, activities, and phone numbers. Supports conditional requests via ETag / If-None-Match.")
 async def get_organization_by_id(
     org_id: int,
-    db: AsyncSession = Depends(get_db)
+    if_none_match: Optional[str] = Header(None),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    query = (
-        select(Organization)
-        .options(
-            selectinload(Organization.building),
-            selectinload(Organization.activities),
-            selectinload(Organization.phones)
-        )
-        .where(Organization.id == org_id)
-    )
-    result = await db.execute(query)
-    org = result.scalars().first()
-    
-    if not org:
+    if snapshot is not None:
+        entries = _snapshot_entries(snapshot, [org_id])
+    else:
+        # Identical concurrent requests share one load; the entries are immutable bytes
+        entries = await coalesce("organization", (org_id, generation(), is_replica_session(db)), lambda: _organization_entries(db, [org_id]))
+    entry = entries.get(org_id)
+    if entry is None:
         raise HTTPException(status_code=404, detail="Organization not found")
-    
-    return org
 
-@router.get("/building/radius", response_model=List[OrganizationSchema], summary="Search Organizations by Radius", description="Find organizations within a specified distance (in km) from a geographic point.")
+    etag, payload = entry.split(b"\n", 1)
+    etag = etag.decode()
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    return Response(content=payload, media_type="application/json", headers={"ETag": etag})
+
+@router.get("/building/radius", response_model=List[OrganizationSchema], responses=NDJSON_RESPONSES, summary="Search Organizations by Radius", description="Find organizations within a specified distance (in km) from a geographic point. With `Accept: application/x-ndjson` all matches after the cursor are streamed, one per line.")
 async def get_organizations_by_radius(
-    lat: float,
-    lon: float,
-    radius_km: float,
-    db: AsyncSession = Depends(get_db)
+    request: Request,
+    response: Response,
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(..., gt=0, description="Search radius in kilometers"),
+    page: PageParams = Depends(),
+    fields: Tuple[str, ...] = Depends(organization_fields),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+    db: AsyncSession = Depends(get_read_db)
 ):
+    if snapshot is not None:
+        ids = snapshot.radius_organization_ids(lat, lon, radius_km)
+        if wants_ndjson(request):
+            return snapshot.ndjson_response(ids, page.cursor, fields)
+        return json_response(organization_list_adapter(fields), snapshot.organization_rows(snapshot.page(ids, page, response), fields), response)
+
+    # Indexed bounding-box prefilter on buildings, exact great-circle check only for candidates.
+    # Relationships are loaded for matching organizations only.
     query = (
-        select(Organization)
+        select(Organization.id)
         .join(Organization.building)
-        .options(
-            selectinload(Organization.building),
-            selectinload(Organization.activities),
-            selectinload(Organization.phones)
+        .where(
+            within_boxes(Building.latitude, Building.longitude, bounding_boxes(lat, lon, radius_km)),
+            haversine_km(lat, lon, Building.latitude, Building.longitude) <= radius_km
         )
     )
-    result = await db.execute(query)
-    all_orgs = result.scalars().all()
-    
-    import math
-    
-    def haversine(lat1, lon1, lat2, lon2):
-        R = 6371  # km
-        dlat = math.radians(lat2 - lat1)
-        dlon = math.radians(lon2 - lon1)
-        a = math.sin(dlat / 2) * math.sin(dlat / 2) + \
-            math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * \
-            math.sin(dlon / 2) * math.sin(dlon / 2)
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        return R * c
-        
-    filtered_orgs = []
-    for org in all_orgs:
-        dist = haversine(lat, lon, org.building.latitude, org.building.longitude)
-        if dist <= radius_km:
-            filtered_orgs.append(org)
-            
-    return filtered_orgs
-
-@router.get("/building/bbox", response_model=List[OrganizationSchema], summary="Search Organizations by Bounding Box", description="Find organizations located within a rectangular geographic area defined by min/max latitude and longitude.")
+    if wants_ndjson(request):
+        return ndjson_response(db, resume(query, page.cursor, Organization.id), fields)
+    result = await db.execute(seek(query, page, Organization.id))
+    ids = finish(result.scalars().all(), page, response, lambda org_id: (org_id,))
+    return json_response(organization_list_adapter(fields), await fetch_organization_rows(db, ids, fields=fields), response)
+
+@router.get("/building/bbox", response_model=List[OrganizationSchema], responses=NDJSON_RESPONSES, summary="Search Organizations by Bounding Box", description="Find organizations located within a rectangular geographic area defined by min/max latitude and longitude. With `Accept: application/x-ndjson` all matches after the cursor are streamed, one per line.")
 async def get_organizations_by_bbox(
     min_lat: float,
     min_lon: float,
     max_lat: float,
     max_lon: float,
-    db: AsyncSession = Depends(get_db)
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(),
+    fields: Tuple[str, ...] = Depends(organization_fields),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    from app.models import Building
+    if snapshot is not None:
+        ids = snapshot.bbox_organization_ids(BoundingBox(min_lat, min_lon, max_lat, max_lon))
+        if wants_ndjson(request):
+            return snapshot.ndjson_response(ids, page.cursor, fields)
+        return json_response(organization_list_adapter(fields), snapshot.organization_rows(snapshot.page(ids, page, response), fields), response)
+
     query = (
-        select(Organization)
+        select(Organization.id)
         .join(Organization.building)
-        .options(
-            selectinload(Organization.building),
-            selectinload(Organization.activities),
-            selectinload(Organization.phones)
-        )
         .where(
             Building.latitude >= min_lat,
             Building.latitude <= max_lat,
@@ -112,72 +233,204 @@ async def get_organizations_by_bbox(
             Building.longitude <= max_lon
         )
     )
-    result = await db.execute(query)
-    return result.scalars().all()
+    if wants_ndjson(request):
+        return ndjson_response(db, resume(query, page.cursor, Organization.id), fields)
+    result = await db.execute(seek(query, page, Organization.id))
+    ids = finish(result.scalars().all(), page, response, lambda org_id: (org_id,))
+    return json_response(organization_list_adapter(fields), await fetch_organization_rows(db, ids, fields=fields), response)
+
+async def _rows_with_distances(db: AsyncSession, snapshot: Optional[Snapshot], matches: Sequence, fields: Tuple[str, ...]) -> List[dict]:
+    """
+    Rows for `matches` ((id, distance_km) in order), each with its distance_km.
+    Joined by id rather than position: an organization deleted since it matched
+    has no row, and every later row would get its neighbour's distance.
+    """
+    distances = {match.id: match.distance_km for match in matches}
+    with_id = tuple(field for field in ORGANIZATION_FIELDS if field == "id" or field in fields)
+    ids = list(distances)
+    rows = snapshot.organization_rows(ids, with_id) if snapshot is not None else await fetch_organization_rows(db, ids, fields=with_id)
+    for item in rows:
+        org_id = item["id"] if "id" in fields else item.pop("id")
+        item["distance_km"] = distances[org_id]
+    return rows
 
-@router.get("/building/{building_id}", response_model=List[OrganizationSchema], summary="Get Organizations by Building", description="List all organizations located in a specific building.")
+@router.get("/building/nearest", response_model=List[OrganizationWithDistance], summary="Nearest Organizations", description="Find the k organizations closest to a geographic point, sorted by distance, optionally restricted to an activity and its sub-categories.")
+async def get_nearest_organizations(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    k: int = Query(10, ge=1, le=100, description="Number of organizations to return"),
+    activity_id: Optional[int] = Query(None, description="Only organizations in this activity subtree"),
+    fields: Tuple[str, ...] = Depends(organization_fields),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+    db: AsyncSession = Depends(get_read_db)
+):
+    distance = haversine_km(lat, lon, Building.latitude, Building.longitude)
+    base = select(Organization.id, distance.label("distance_km")).join(Organization.building)
+    if activity_id is not None:
+        base = base.where(Organization.id.in_(organization_ids_in_activity_subtree(activity_id)))
+
+    # Walk outward in rings over the coordinates index. Once k organizations lie
+    # inside the ring they are exactly the k nearest, so the cost follows k and
+    # local density rather than the table size.
+    radius = KNN_INITIAL_RADIUS_KM
+    while True:
+        if snapshot is not None:
+            nearest = snapshot.nearest_within(lat, lon, radius, k, activity_id)
+        else:
+            query = (
+                base.where(
+                    within_boxes(Building.latitude, Building.longitude, bounding_boxes(lat, lon, radius)),
+                    distance <= radius
+                )
+                .order_by(distance, Organization.id)
+                .limit(k)
+            )
+            nearest = (await db.execute(query)).all()
+        if len(nearest) == k or radius >= KNN_MAX_RADIUS_KM:
+            break
+        # Grow by the area still needed for k hits, at least doubling
+        growth = math.sqrt(k / len(nearest)) * 1.2 if nearest else 4.0
+        radius = min(radius * max(2.0, growth), KNN_MAX_RADIUS_KM)
+
+    rows = await _rows_with_distances(db, snapshot, nearest, fields)
+    return json_response(organization_list_adapter(fields, with_distance=True), rows)
+
+@router.get("/building/{building_id}", response_model=List[OrganizationSchema], summary="Get Organizations by Building", description="List all organizations located in a specific building. Supports conditional requests via ETag / If-None-Match.")
 async def get_organizations_by_building_id(
     building_id: int,
-    db: AsyncSession = Depends(get_db)
+    response: Response,
+    page: PageParams = Depends(),
+    fields: Tuple[str, ...] = Depends(organization_fields),
+    if_none_match: Optional[str] = Header(None),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    query = (
-        select(Organization)
-        .options(
-            selectinload(Organization.building),
-            selectinload(Organization.activities),
-            selectinload(Organization.phones)
-        )
-        .where(Organization.building_id == building_id)
-    )
-    result = await db.execute(query)
-    return result.scalars().all()
+    # Aggregates over the building_id index; organization versions already
+    # move with their phones, activities and building
+    if snapshot is not None:
+        stats = snapshot.building_organization_stats(building_id)
+    else:
+        async def load_stats():
+            return tuple((await db.execute(
+                select(func.count(), func.coalesce(func.sum(Organization.version), 0), func.coalesce(func.sum(Organization.id), 0))
+                .where(Organization.building_id == building_id)
+            )).one())
+        stats = await coalesce("building_stats", (building_id, generation(), is_replica_session(db)), load_stats)
+    etag = fingerprint_etag("building-orgs", building_id, *stats, page.limit, page.cursor, fields)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+
+    if snapshot is not None:
+        ids = snapshot.page(snapshot.building_organization_ids(building_id), page, response)
+        return json_response(organization_list_adapter(fields), snapshot.organization_rows(ids, fields), response)
+
+    async def load_page():
+        page_response = Response()
+        query = select(Organization.id).where(Organization.building_id == building_id)
+        result = await db.execute(seek(query, page, Organization.id))
+        ids = finish(result.scalars().all(), page, page_response, lambda org_id: (org_id,))
+        rows = await fetch_organization_rows(db, ids, fields=fields)
+        return page_response.headers.get(NEXT_CURSOR_HEADER), organization_list_adapter(fields).dump_json(rows)
+
+    # The ETag covers the building's organization versions, the page and the fields,
+    # so requests with the same one can share the page and its encoding
+    cursor, content = await coalesce("building_page", (etag, is_replica_session(db)), load_page)
+    if cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+    return Response(content=content, media_type="application/json", headers=dict(response.headers))
 
-@router.get("/activity/{activity_id}", response_model=List[OrganizationSchema], summary="Get Organizations by Activity (Tree Search)", description="Find organizations associated with a specific activity or any of its sub-categories (up to 3 levels deep).")
+@router.get("/activity/{activity_id}", response_model=List[OrganizationSchema], responses=NDJSON_RESPONSES, summary="Get Organizations by Activity (Tree Search)", description="Find organizations associated with a specific activity or any of its sub-categories (up to 3 levels deep). With `Accept: application/x-ndjson` all matches after the cursor are streamed, one per line.")
 async def get_organizations_by_activity_id(
     activity_id: int,
-    db: AsyncSession = Depends(get_db)
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(),
+    fields: Tuple[str, ...] = Depends(organization_fields),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    related_ids = {activity_id}
-    
-    # Get all activities to traverse in memory (dataset is small)
-    # Alternatively, iterative query
-    # Let's do iterative for depth 3
-    from app.models import Activity
-    
-    current_ids = [activity_id]
-    
-    for _ in range(3): # Max depth 3
-        if not current_ids:
-            break
-        stmt = select(Activity.id).where(Activity.parent_id.in_(current_ids))
-        result = await db.execute(stmt)
-        children = result.scalars().all()
-        current_ids = children
-        related_ids.update(children)
-        
-    query = (
-        select(Organization)
-        .join(Organization.activities)
-        .options(
-            selectinload(Organization.building),
-            selectinload(Organization.activities),
-            selectinload(Organization.phones)
-        )
-        .where(Organization.activities.any(Activity.id.in_(related_ids)))
-        .distinct()
-    )
-    result = await db.execute(query)
-    return result.scalars().all()
+    if snapshot is not None:
+        ids = snapshot.activity_organization_ids(activity_id)
+        if wants_ndjson(request):
+            return snapshot.ndjson_response(ids, page.cursor, fields)
+        return json_response(organization_list_adapter(fields), snapshot.organization_rows(snapshot.page(ids, page, response), fields), response)
+
+    query = select(Organization.id).where(Organization.id.in_(organization_ids_in_activity_subtree(activity_id)))
+    if wants_ndjson(request):
+        return ndjson_response(db, resume(query, page.cursor, Organization.id), fields)
+    result = await db.execute(seek(query, page, Organization.id))
+    ids = finish(result.scalars().all(), page, response, lambda org_id: (org_id,))
+    return json_response(organization_list_adapter(fields), await fetch_organization_rows(db, ids, fields=fields), response)
 
 
-@router.get("/buildings/list", response_model=List[Building], summary="List All Buildings", description="Retrieve a list of all buildings in the directory.")
+@router.get("/buildings/list", response_model=List[BuildingSchema], summary="List All Buildings", description="Retrieve a list of all buildings in the directory. Supports conditional requests via ETag / If-None-Match.")
 async def get_buildings(
+    response: Response,
+    page: PageParams = Depends(),
+    if_none_match: Optional[str] = Header(None),
+    snapshot: Optional[Snapshot] = Depends(get_snapshot),
+    db: AsyncSession = Depends(get_read_db)
+):
+    if snapshot is not None:
+        stats = snapshot.building_stats()
+    else:
+        stats = (await db.execute(
+            select(func.count(), func.coalesce(func.sum(Building.version), 0), func.coalesce(func.sum(Building.id), 0))
+        )).one()
+    etag = fingerprint_etag("buildings", *stats, page.limit, page.cursor)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+
+    if snapshot is not None:
+        return json_response(buildings_adapter, snapshot.building_rows(page, response), response)
+
+    query = select(Building.id, Building.address, Building.latitude, Building.longitude)
+    result = await db.execute(seek(query, page, Building.id))
+    rows = finish(result.all(), page, response, lambda row: (row.id,))
+    return json_response(buildings_adapter, [building_row(row) for row in rows], response)
+
+
+IMPORT_REQUEST_BODY = {"requestBody": {"required": True, "content": {media_type: {"schema": {"type": "string"}} for media_type in IMPORT_MEDIA_TYPES}}}
+
+
+@router.post("/import", response_model=ImportReport, openapi_extra=IMPORT_REQUEST_BODY, summary="Bulk Import Organizations", description="Create organizations with their phones and activity links from a CSV (`text/csv`, with a header row) or NDJSON (`application/x-ndjson`) body, streamed and inserted in batches. Buildings and activities are referenced by id, address or name. Invalid rows are skipped and reported; the rest of the file is still imported.")
+async def bulk_import_organizations(
+    request: Request,
+    batch_size: int = Query(IMPORT_BATCH_SIZE, ge=1, le=MAX_IMPORT_BATCH_SIZE, description="Rows inserted per transaction"),
     db: AsyncSession = Depends(get_db)
 ):
-    from app.models import Building
-    # from app.schemas import Building as BuildingSchema # Validation via response_model
-    query = select(Building)
-    result = await db.execute(query)
-    return result.scalars().all()
+    media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if media_type not in PARSERS:
+        raise HTTPException(status_code=415, detail=f"Content-Type must be one of: {', '.join(IMPORT_MEDIA_TYPES)}")
+    rows = PARSERS[media_type](decode_lines(request.stream()))
+    return await import_organizations(db, rows, batch_size)
+
+
+# --- Writes ---
+
+@router.post("", response_model=OrganizationSchema, status_code=201, summary="Create Organization", description="Create an organization with its phone numbers and activities. The building and activities must exist.")
+async def create_organization(payload: OrganizationCreate, response: Response, db: AsyncSession = Depends(get_db)):
+    result = await write_one(write_organizations, db, OrganizationBatch(create=[payload]))
+    rows = await fetch_organization_rows(db, result.created)
+    # The injected response carries the read-your-writes cookie set on commit
+    return json_response(organization_adapter, rows[0], response, status_code=201)
+
+
+@router.put("/{org_id}", response_model=OrganizationSchema, summary="Replace Organization", description="Replace an organization's name, building, activities and phone numbers.")
+async def replace_organization(org_id: int, payload: OrganizationCreate, response: Response, db: AsyncSession = Depends(get_db)):
+    await write_one(write_organizations, db, OrganizationBatch(update=[OrganizationUpdate(id=org_id, **payload.model_dump())]))
+    rows = await fetch_organization_rows(db, [org_id])
+    return json_response(organization_adapter, rows[0], response)
+
+
+@router.delete("/{org_id}", status_code=204, summary="Delete Organization", description="Delete an organization together with its phone numbers and activity links.")
+async def delete_organization(org_id: int, response: Response, db: AsyncSession = Depends(get_db)):
+    await write_one(write_organizations, db, OrganizationBatch(delete=[org_id]))
+    return Response(status_code=204, headers=dict(response.headers))
 
 
+@router.post(":batch", response_model=BatchResult, summary="Batch Write Organizations", description="Create, replace and delete organizations in one transaction using bulk statements. The whole payload is validated first; if any item is rejected nothing is written and the 422 response lists every rejected item.")
+async def batch_write_organizations(batch: OrganizationBatch, db: AsyncSession = Depends(get_db)):
+    return await write_many(write_organizations, db, batch)
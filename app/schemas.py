@@ -75,3 +75,53 @@ class Organization(BaseModel):
     phones: List[Phone] = Field(..., description="List of phone numbers")
 
     model_config = ConfigDict(from_attributes=True)
+
+class OrganizationWithDistance(Organization):
+    distance_km: float = Field(..., description="Great-circle distance from the requested point in km")
+
+class BuildingUpdate(BuildingCreate):
+    id: int = Field(..., description="ID of the building to replace")
+
+class ActivityUpdate(ActivityCreate):
+    id: int = Field(..., description="ID of the activity to replace")
+
+class OrganizationUpdate(OrganizationCreate):
+    id: int = Field(..., description="ID of the organization to replace")
+
+class BuildingBatch(BaseModel):
+    create: List[BuildingCreate] = Field([], description="Buildings to create")
+    update: List[BuildingUpdate] = Field([], description="Buildings to replace")
+    delete: List[int] = Field([], description="IDs of buildings to delete")
+
+class ActivityBatch(BaseModel):
+    create: List[ActivityCreate] = Field([], description="Activities to create (parents must already exist)")
+    update: List[ActivityUpdate] = Field([], description="Activities to replace")
+    delete: List[int] = Field([], description="IDs of activities to delete")
+
+class OrganizationBatch(BaseModel):
+    create: List[OrganizationCreate] = Field([], description="Organizations to create")
+    update: List[OrganizationUpdate] = Field([], description="Organizations to replace, including phones and activities")
+    delete: List[int] = Field([], description="IDs of organizations to delete")
+
+class BatchResult(BaseModel):
+    created: List[int] = Field(..., description="IDs of created items, in request order")
+    updated: List[int] = Field(..., description="IDs of replaced items")
+    deleted: List[int] = Field(..., description="IDs of deleted items")
+
+class BatchItemError(BaseModel):
+    operation: str = Field(..., description="create, update or delete")
+    index: int = Field(..., description="Position of the item in that operation's list")
+    status_code: int = Field(..., description="Status the item would get on its own (404, 409 or 422)")
+    detail: str = Field(..., description="Why the item was rejected")
+
+class ImportRowError(BaseModel):
+    row: int = Field(..., description="1-based data row (CSV header and blank lines not counted)")
+    error: str = Field(..., description="Why the row was skipped")
+
+class ImportReport(BaseModel):
+    rows: int = Field(..., description="Data rows read")
+    imported: int = Field(..., description="Organizations created")
+    failed: int = Field(..., description="Rows skipped because of an error")
+    errors: List[ImportRowError] = Field(..., description="The first skipped rows with their errors")
+    seconds: float = Field(..., description="Wall-clock duration of the import")
+    rows_per_second: float = Field(..., description="Rows read per second")
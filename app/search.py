@@ -0,0 +1,158 @@
+"""
+Compound organization search: any combination of name, activity, building,
+bounding box and radius filters in one query.
+
+Every filter is a predicate on organizations joined to their buildings. Those
+backed by an index (trigram name index, activity closure, building_id, the
+coordinates index) can also produce their matching ids on their own. The
+planner counts each of those candidate sets with a capped probe and drives the
+search from the smallest one: its ids are materialized first and the remaining
+filters are checked only against them. When no filter is selective enough,
+the search walks the requested order instead and stops once the page is full.
+"""
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import and_, exists, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.fulltext import MIN_INDEXED_QUERY_LENGTH, substring_ids, supports_fulltext
+from app.geo import BoundingBox, bounding_boxes, haversine_km, within_boxes
+from app.models import Building, Organization, activity_closure, organization_activities
+from app.pagination import PageParams, finish, seek
+
+SORT_NAME = "name"
+SORT_DISTANCE = "distance"
+
+# Candidate sets are counted up to this many ids; a filter matching more is not worth driving from
+PROBE_LIMIT = 5000
+
+# Response header naming the filter the search was driven from, or ORDER_PLAN
+PLAN_HEADER = "X-Search-Plan"
+ORDER_PLAN = "order"
+
+
+def organization_ids_in_activity_subtree(activity_id: int):
+    # One indexed lookup: closure rows under the activity joined to the org links
+    return (
+        select(organization_activities.c.organization_id)
+        .join(activity_closure, activity_closure.c.descendant_id == organization_activities.c.activity_id)
+        .where(activity_closure.c.ancestor_id == activity_id)
+    )
+
+
+class Filter(NamedTuple):
+    name: str
+    # Condition on organizations joined to buildings
+    predicate: Any
+    # Select of matching organization ids served by an index, None when there is none
+    ids: Any
+
+
+class SearchParams:
+    """Query parameters of the compound search; every filter is optional."""
+
+    def __init__(
+        self,
+        q: Optional[str] = Query(None, min_length=1, description="Part of the organization name (ASCII letters match case-insensitively)"),
+        activity_id: Optional[int] = Query(None, description="Activity, including its sub-categories"),
+        building_id: Optional[int] = Query(None, description="Building the organization is located in"),
+        min_lat: Optional[float] = Query(None, description="Bounding box: all four of min_lat, min_lon, max_lat, max_lon"),
+        min_lon: Optional[float] = Query(None),
+        max_lat: Optional[float] = Query(None),
+        max_lon: Optional[float] = Query(None),
+        lat: Optional[float] = Query(None, ge=-90, le=90, description="Point for radius_km and distance sorting"),
+        lon: Optional[float] = Query(None, ge=-180, le=180),
+        radius_km: Optional[float] = Query(None, gt=0, description="Only organizations within this distance of lat/lon"),
+        sort: str = Query(SORT_NAME, pattern=f"^({SORT_NAME}|{SORT_DISTANCE})$", description="Order by name or by distance from lat/lon"),
+    ):
+        box = (min_lat, min_lon, max_lat, max_lon)
+        if any(value is not None for value in box) and None in box:
+            raise HTTPException(status_code=422, detail="Bounding box needs min_lat, min_lon, max_lat and max_lon")
+        if (lat is None) != (lon is None):
+            raise HTTPException(status_code=422, detail="lat and lon must be given together")
+        if lat is None and (radius_km is not None or sort == SORT_DISTANCE):
+            raise HTTPException(status_code=422, detail="radius_km and sort=distance need lat and lon")
+        self.q = q
+        self.activity_id = activity_id
+        self.building_id = building_id
+        self.box = BoundingBox(*box) if min_lat is not None else None
+        self.point: Optional[Tuple[float, float]] = (lat, lon) if lat is not None else None
+        self.radius_km = radius_km
+        self.sort = sort
+
+    def distance(self):
+        return haversine_km(self.point[0], self.point[1], Building.latitude, Building.longitude)
+
+    def filters(self, fulltext: bool) -> List[Filter]:
+        filters = []
+        if self.building_id is not None:
+            filters.append(Filter(
+                "building",
+                Organization.building_id == self.building_id,
+                select(Organization.id).where(Organization.building_id == self.building_id),
+            ))
+        if self.activity_id is not None:
+            # Correlated, so checking a few candidates does not expand the whole subtree
+            in_subtree = exists().where(
+                organization_activities.c.organization_id == Organization.id,
+                activity_closure.c.descendant_id == organization_activities.c.activity_id,
+                activity_closure.c.ancestor_id == self.activity_id,
+            )
+            filters.append(Filter("activity", in_subtree, organization_ids_in_activity_subtree(self.activity_id)))
+        if self.box is not None:
+            in_box = within_boxes(Building.latitude, Building.longitude, [self.box])
+            filters.append(Filter("bbox", in_box, select(Organization.id).join(Organization.building).where(in_box)))
+        if self.radius_km is not None:
+            lat, lon = self.point
+            in_radius = and_(
+                within_boxes(Building.latitude, Building.longitude, bounding_boxes(lat, lon, self.radius_km)),
+                self.distance() <= self.radius_km,
+            )
+            filters.append(Filter("radius", in_radius, select(Organization.id).join(Organization.building).where(in_radius)))
+        if self.q is not None:
+            indexed = fulltext and len(self.q) >= MIN_INDEXED_QUERY_LENGTH
+            filters.append(Filter(
+                "name",
+                Organization.name.icontains(self.q, autoescape=True),
+                substring_ids(self.q) if indexed else None,
+            ))
+        return filters
+
+
+async def choose_driver(db: AsyncSession, filters: List[Filter], sort: str) -> Optional[Filter]:
+    """The indexed filter with the fewest candidates, or None to walk the sort order instead."""
+    best, best_count = None, None
+    for candidate in filters:
+        if candidate.ids is None:
+            continue
+        count = await db.scalar(select(func.count()).select_from(candidate.ids.limit(PROBE_LIMIT).subquery()))
+        if best_count is None or count < best_count:
+            best, best_count = candidate, count
+    # Walking the name index finds a page quickly unless the filters are narrow;
+    # distance has no index to walk, so any candidate set beats a full scan
+    if best is not None and best_count >= PROBE_LIMIT and sort == SORT_NAME:
+        return None
+    return best
+
+
+async def compound_search(db: AsyncSession, params: SearchParams, page: PageParams, response: Response) -> list:
+    """One page of (id, name[, distance_km]) rows in the requested order; the plan used goes in PLAN_HEADER."""
+    filters = params.filters(supports_fulltext(db))
+    driver = await choose_driver(db, filters, params.sort)
+    response.headers[PLAN_HEADER] = driver.name if driver is not None else ORDER_PLAN
+
+    columns = [Organization.id, Organization.name]
+    if params.point is not None:
+        columns.append(params.distance().label("distance_km"))
+    query = select(*columns).join(Organization.building)
+    if driver is not None:
+        candidates = driver.ids.cte("candidates").prefix_with("MATERIALIZED")
+        query = query.where(Organization.id.in_(select(candidates.c[0])))
+    query = query.where(*(f.predicate for f in filters if f is not driver))
+
+    if params.sort == SORT_DISTANCE:
+        result = await db.execute(seek(query, page, params.distance(), Organization.id))
+        return finish(result.all(), page, response, lambda row: (row.distance_km, row.id))
+    result = await db.execute(seek(query, page, Organization.name, Organization.id))
+    return finish(result.all(), page, response, lambda row: (row.name, row.id))
@@ -0,0 +1,208 @@
+from functools import lru_cache
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing_extensions import TypedDict
+
+from app.models import Activity, Building, Organization, Phone, organization_activities
+from app.replicas import stream_session
+
+# Row-shaped mirrors of the response schemas in app/schemas.py. List endpoints
+# build these straight from row tuples and encode them with precompiled
+# adapters, skipping ORM hydration and per-row from_attributes validation.
+# Keys are produced in schema field order, so the JSON is byte-for-byte what
+# the Pydantic models emit; the declared response_model (and OpenAPI) is unchanged.
+
+
+class BuildingRow(TypedDict):
+    address: str
+    latitude: float
+    longitude: float
+    id: int
+
+
+class ActivityRow(TypedDict):
+    name: str
+    id: int
+    parent_id: Optional[int]
+
+
+class ActivityNodeRow(TypedDict):
+    name: str
+    id: int
+    parent_id: Optional[int]
+    children: List["ActivityNodeRow"]
+
+
+class PhoneRow(TypedDict):
+    number: str
+    id: int
+    organization_id: int
+
+
+class OrganizationRow(TypedDict):
+    id: int
+    name: str
+    building: BuildingRow
+    activities: List[ActivityRow]
+    phones: List[PhoneRow]
+
+
+class NearbyOrganizationRow(OrganizationRow):
+    distance_km: float
+
+
+organization_adapter = TypeAdapter(OrganizationRow)
+organizations_adapter = TypeAdapter(List[OrganizationRow])
+nearby_organizations_adapter = TypeAdapter(List[NearbyOrganizationRow])
+buildings_adapter = TypeAdapter(List[BuildingRow])
+activity_tree_adapter = TypeAdapter(List[ActivityNodeRow])
+activity_node_adapter = TypeAdapter(ActivityNodeRow)
+
+
+# --- Sparse fieldsets ---
+
+ORGANIZATION_FIELDS = tuple(OrganizationRow.__annotations__)
+
+
+def organization_fields(
+    fields: Optional[str] = Query(None, description=f"Comma-separated subset of {', '.join(ORGANIZATION_FIELDS)}; relationships left out are not queried"),
+) -> Tuple[str, ...]:
+    """Requested organization fields, in schema order (all of them by default)."""
+    if fields is None:
+        return ORGANIZATION_FIELDS
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested.difference(ORGANIZATION_FIELDS)
+    if unknown or not requested:
+        raise HTTPException(status_code=422, detail=f"fields must be a comma-separated subset of: {', '.join(ORGANIZATION_FIELDS)}")
+    return tuple(field for field in ORGANIZATION_FIELDS if field in requested)
+
+
+@lru_cache(maxsize=None)
+def _projection(fields: Tuple[str, ...], with_distance: bool) -> type:
+    return TypedDict("OrganizationProjection", {
+        name: kind for name, kind in NearbyOrganizationRow.__annotations__.items()
+        if name in fields or (with_distance and name == "distance_km")
+    })
+
+
+@lru_cache(maxsize=None)
+def organization_row_adapter(fields: Tuple[str, ...]) -> TypeAdapter:
+    """Adapter for one organization row holding only `fields`."""
+    if fields == ORGANIZATION_FIELDS:
+        return organization_adapter
+    return TypeAdapter(_projection(fields, False))
+
+
+@lru_cache(maxsize=None)
+def organization_list_adapter(fields: Tuple[str, ...], with_distance: bool = False) -> TypeAdapter:
+    """Adapter for a list of organization rows holding only `fields`, plus distance_km if asked."""
+    if fields == ORGANIZATION_FIELDS:
+        return nearby_organizations_adapter if with_distance else organizations_adapter
+    return TypeAdapter(List[_projection(fields, with_distance)])
+
+
+def building_row(row) -> BuildingRow:
+    return {"address": row.address, "latitude": row.latitude, "longitude": row.longitude, "id": row.id}
+
+
+async def fetch_organization_rows(
+    db: AsyncSession, ids: Sequence[int], fields: Tuple[str, ...] = ORGANIZATION_FIELDS
+) -> List[OrganizationRow]:
+    """
+    Organizations for `ids`, in that order, as plain dicts. One query per
+    table (the same round-trips as the selectinload options), no ORM objects.
+    Relationships not in `fields` are neither queried nor included.
+    """
+    if not ids:
+        return []
+
+    orgs = (await db.execute(
+        select(Organization.id, Organization.name, Organization.building_id).where(Organization.id.in_(ids))
+    )).all()
+    if not orgs:
+        return []
+
+    buildings: Dict[int, BuildingRow] = {}
+    if "building" in fields:
+        building_ids = {org.building_id for org in orgs}
+        buildings = {
+            row.id: building_row(row)
+            for row in await db.execute(
+                select(Building.id, Building.address, Building.latitude, Building.longitude).where(Building.id.in_(building_ids))
+            )
+        }
+
+    activities: Dict[int, List[ActivityRow]] = {}
+    if "activities" in fields:
+        for row in await db.execute(
+            select(organization_activities.c.organization_id, Activity.id, Activity.name, Activity.parent_id)
+            .join(Activity, Activity.id == organization_activities.c.activity_id)
+            .where(organization_activities.c.organization_id.in_(ids))
+        ):
+            activities.setdefault(row.organization_id, []).append({"name": row.name, "id": row.id, "parent_id": row.parent_id})
+
+    phones: Dict[int, List[PhoneRow]] = {}
+    if "phones" in fields:
+        for row in await db.execute(
+            select(Phone.organization_id, Phone.id, Phone.number).where(Phone.organization_id.in_(ids)).order_by(Phone.id)
+        ):
+            phones.setdefault(row.organization_id, []).append({"number": row.number, "id": row.id, "organization_id": row.organization_id})
+
+    by_id = {
+        org.id: {
+            "id": org.id,
+            "name": org.name,
+            "building": buildings.get(org.building_id),
+            "activities": activities.get(org.id, []),
+            "phones": phones.get(org.id, []),
+        }
+        for org in orgs
+    }
+    if fields != ORGANIZATION_FIELDS:
+        by_id = {org_id: {field: row[field] for field in fields} for org_id, row in by_id.items()}
+    return [by_id[org_id] for org_id in ids if org_id in by_id]
+
+
+def json_response(adapter: TypeAdapter, rows, response: Optional[Response] = None, status_code: int = 200) -> Response:
+    """Encode `rows`, keeping headers set on the injected response (cursor, ETag)."""
+    headers = dict(response.headers) if response is not None else None
+    return Response(content=adapter.dump_json(rows), status_code=status_code, media_type="application/json", headers=headers)
+
+
+# --- Streaming ---
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+NDJSON_RESPONSES = {200: {"content": {NDJSON_MEDIA_TYPE: {}}, "description": f"JSON array, or one organization per line with Accept: {NDJSON_MEDIA_TYPE}"}}
+
+# Organizations fetched and encoded per round-trip while streaming
+STREAM_CHUNK_SIZE = 500
+
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def ndjson_response(db: AsyncSession, id_query, fields: Tuple[str, ...] = ORGANIZATION_FIELDS) -> StreamingResponse:
+    """
+    Stream every organization matched by `id_query` (a select of Organization.id)
+    as NDJSON. Ids come from a server-side cursor in chunks and each chunk is
+    loaded, encoded and sent before the next one is read, so memory stays
+    bounded by the chunk size.
+    """
+    adapter = organization_row_adapter(fields)
+
+    async def lines() -> AsyncIterator[bytes]:
+        # The request's session dependency has already exited once the body is
+        # being sent, so the stream runs on a session of its own
+        async with stream_session(db) as session:
+            result = await session.stream(id_query.execution_options(yield_per=STREAM_CHUNK_SIZE))
+            async for ids in result.scalars().partitions():
+                rows = await fetch_organization_rows(session, ids, fields=fields)
+                yield b"".join(adapter.dump_json(row) + b"\n" for row in rows)
+
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
@@ -0,0 +1,83 @@
+"""
+Single-flight for identical concurrent reads.
+
+While a read for a key is in flight, requests for the same key wait for its
+result instead of running the same queries and serialization again. Nothing
+is kept once the flight lands (that is the response cache's job), so only
+requests that overlap share a result, and results must be immutable (bytes,
+tuples).
+
+The leader's exception is raised in every waiting request. A follower that
+waits longer than SINGLE_FLIGHT_TIMEOUT_SECONDS, or whose leader was
+cancelled (client gone), runs the load itself.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+from app import metrics
+from app.config import settings
+
+T = TypeVar("T")
+
+FLIGHTS = metrics.register(metrics.Counter(
+    "single_flight_requests_total",
+    "Coalescable reads by outcome: leader (ran the load), coalesced (shared a leader's result or error), "
+    "timeout and abandoned (gave up on the leader and ran the load)",
+    ("read", "outcome"),
+))
+
+_flights: Dict[Tuple[str, Hashable], asyncio.Future] = {}
+
+
+class _LeaderCancelled(Exception):
+    pass
+
+
+def in_flight() -> int:
+    return len(_flights)
+
+
+metrics.register(metrics.Collected("single_flight_in_progress", "Reads currently being shared", lambda: [((), in_flight())]))
+
+
+async def coalesce(read: str, key: Hashable, load: Callable[[], Awaitable[T]], timeout: Optional[float] = None) -> T:
+    """
+    Return `await load()`, shared with every concurrent call for the same `read`
+    and `key`. `key` must cover everything the result depends on.
+    """
+    if not settings.SINGLE_FLIGHT_ENABLED:
+        return await load()
+
+    flight_key = (read, key)
+    leader = _flights.get(flight_key)
+    if leader is not None:
+        try:
+            result = await asyncio.wait_for(asyncio.shield(leader), settings.SINGLE_FLIGHT_TIMEOUT_SECONDS if timeout is None else timeout)
+        except _LeaderCancelled:
+            FLIGHTS.inc((read, "abandoned"))
+        except Exception:
+            if leader.done():
+                FLIGHTS.inc((read, "coalesced"))
+                raise
+            FLIGHTS.inc((read, "timeout"))
+        else:
+            FLIGHTS.inc((read, "coalesced"))
+            return result
+        return await load()
+
+    future = _flights[flight_key] = asyncio.get_running_loop().create_future()
+    FLIGHTS.inc((read, "leader"))
+    try:
+        result = await load()
+    except Exception as exc:
+        future.set_exception(exc)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        if not future.done():
+            future.set_exception(_LeaderCancelled())
+        # Marks the exception as retrieved, so a flight nobody joined is not logged by asyncio
+        future.exception()
+        del _flights[flight_key]
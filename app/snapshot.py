@@ -0,0 +1,617 @@
+"""
+In-memory snapshot of the directory for the organization read endpoints.
+
+Buildings, activities, organizations and phones are loaded once into
+__slots__ records, together with prebuilt indexes:
+
+    name trigram       -> organization ids   substring and fuzzy name search
+    (name, id)         sorted                name order, short queries
+    activity           -> subtree            recomputed from parent ids
+    activity           -> organization ids
+    building           -> organization ids
+    building coordinates (NumPy)             radius, bounding box, nearest
+
+The snapshot then follows the change_log table (see app/models.py): each
+refresh reloads only the rows logged since the previous one. Rows are fetched
+first and applied without awaiting, so a request never sees half a refresh.
+"""
+import asyncio
+import bisect
+import heapq
+import logging
+from collections import Counter
+from typing import AsyncIterator, Callable, Dict, FrozenSet, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.crud import IN_CHUNK_SIZE
+from app.database import SessionLocal, engine
+from app.fulltext import FUZZY_CANDIDATES, FUZZY_MATCH, FUZZY_MIN_SIMILARITY, MIN_INDEXED_QUERY_LENGTH, NAME_SEARCH_CURSOR, PREFIX_MATCH, SUBSTRING_MATCH, fold_case, similarity, trigrams
+from app.geo import BoundingBox, PointIndex, haversine
+from app.models import Activity, Building, Organization, Phone, change_log, organization_activities
+from app.pagination import PageParams, decode_cursor, finish
+from app.replicas import reads_from_primary
+from app.search import PLAN_HEADER, SORT_DISTANCE, SearchParams
+from app.serialization import NDJSON_MEDIA_TYPE, ORGANIZATION_FIELDS, STREAM_CHUNK_SIZE, BuildingRow, OrganizationRow, organization_row_adapter
+
+# Above this many changed keys a sorted index is rebuilt instead of patched
+RESORT_THRESHOLD = 64
+
+# PLAN_HEADER value of compound searches answered from memory
+SNAPSHOT_PLAN = "snapshot"
+
+logger = logging.getLogger(__name__)
+
+
+class BuildingRecord:
+    __slots__ = ("id", "latitude", "longitude", "version", "row")
+
+    def __init__(self, id: int, address: str, latitude: float, longitude: float, version: int):
+        self.id = id
+        self.latitude = latitude
+        self.longitude = longitude
+        self.version = version
+        self.row: BuildingRow = {"address": address, "latitude": latitude, "longitude": longitude, "id": id}
+
+
+class ActivityRecord:
+    __slots__ = ("id", "parent_id", "row")
+
+    def __init__(self, id: int, name: str, parent_id: Optional[int]):
+        self.id = id
+        self.parent_id = parent_id
+        self.row = {"name": name, "id": id, "parent_id": parent_id}
+
+
+class OrganizationRecord:
+    __slots__ = ("id", "name", "lowered", "building_id", "version", "activity_ids", "phones")
+
+    def __init__(self, id: int, name: str, building_id: int, version: int):
+        self.id = id
+        self.name = name
+        # Folded like SQLite's LIKE, so matches and prefix classes agree with the database
+        self.lowered = fold_case(name)
+        self.building_id = building_id
+        self.version = version
+        self.activity_ids: Tuple[int, ...] = ()
+        self.phones: Tuple[dict, ...] = ()
+
+
+class Nearby(NamedTuple):
+    id: int
+    distance_km: float
+
+
+class SearchRow(NamedTuple):
+    id: int
+    name: str
+    distance_km: Optional[float]
+
+
+def _patched(order: list, removed: Sequence, added: Sequence) -> list:
+    if len(removed) + len(added) > RESORT_THRESHOLD:
+        gone = set(removed)
+        return sorted([key for key in order if key not in gone] + list(added))
+    for key in removed:
+        del order[bisect.bisect_left(order, key)]
+    for key in added:
+        bisect.insort(order, key)
+    return order
+
+
+def _start(keys: Sequence, cursor: Optional[str], types: Sequence[type], key: Optional[Callable] = None) -> int:
+    """Position right after the cursor in sorted `keys`; `types` are those of the cursor positions."""
+    if cursor is None:
+        return 0
+    after = tuple(decode_cursor(cursor, types))
+    return bisect.bisect_right(keys, after if len(types) > 1 else after[0], key=key)
+
+
+class Snapshot:
+    def __init__(self, seq: int = 0):
+        # Last change_log entry applied
+        self.seq = seq
+        self.buildings: Dict[int, BuildingRecord] = {}
+        self.activities: Dict[int, ActivityRecord] = {}
+        self.organizations: Dict[int, OrganizationRecord] = {}
+
+        self.building_order: List[int] = []
+        self.name_order: List[Tuple[str, int]] = []
+        self.trigrams: Dict[str, Set[int]] = {}
+        self.coordinates = PointIndex([], [], [])
+        self.orgs_by_building: Dict[int, Set[int]] = {}
+        self.orgs_by_activity: Dict[int, Set[int]] = {}
+        self.subtrees: Dict[int, FrozenSet[int]] = {}
+
+        # Derived lazily, dropped whenever the data they depend on changes
+        self._activity_orgs: Dict[int, Tuple[List[int], Set[int]]] = {}
+        self._building_stats: Optional[Tuple[int, int, int]] = None
+
+    # --- Applying changes ---
+
+    def apply(
+        self,
+        seq: int,
+        buildings: Dict[int, Optional[BuildingRecord]],
+        activities: Optional[Dict[int, ActivityRecord]],
+        organizations: Dict[int, Optional[OrganizationRecord]],
+    ) -> None:
+        """
+        Apply reloaded rows: None marks a deleted row. `activities`, when given,
+        replaces the whole (small) activity table.
+        """
+        removed_buildings, added_buildings = [], []
+        for building_id, record in buildings.items():
+            if record is not None:
+                if self._put_building(record):
+                    added_buildings.append(building_id)
+
+        if activities is not None:
+            self.activities = activities
+            self._index_subtrees()
+
+        removed_names, added_names = [], []
+        for org_id, record in organizations.items():
+            old = self._drop_organization(org_id)
+            if old is not None:
+                removed_names.append((old.name, org_id))
+            if record is not None:
+                self._put_organization(record)
+                added_names.append((record.name, org_id))
+
+        # After organizations, which may have moved out of them
+        for building_id, record in buildings.items():
+            if record is None and self._drop_building(building_id):
+                removed_buildings.append(building_id)
+
+        self.name_order = _patched(self.name_order, removed_names, added_names)
+        self.building_order = _patched(self.building_order, removed_buildings, added_buildings)
+        if organizations or activities is not None:
+            self._activity_orgs.clear()
+        if buildings:
+            self._building_stats = None
+            self._index_coordinates()
+        self.seq = seq
+
+    def _put_building(self, record: BuildingRecord) -> bool:
+        old = self.buildings.get(record.id)
+        self.buildings[record.id] = record
+        return old is None
+
+    def _drop_building(self, building_id: int) -> bool:
+        old = self.buildings.pop(building_id, None)
+        if old is None:
+            return False
+        self.orgs_by_building.pop(building_id, None)
+        return True
+
+    def _put_organization(self, record: OrganizationRecord) -> None:
+        self.organizations[record.id] = record
+        for gram in trigrams(record.name):
+            self.trigrams.setdefault(gram, set()).add(record.id)
+        self.orgs_by_building.setdefault(record.building_id, set()).add(record.id)
+        for activity_id in record.activity_ids:
+            self.orgs_by_activity.setdefault(activity_id, set()).add(record.id)
+
+    def _drop_organization(self, org_id: int) -> Optional[OrganizationRecord]:
+        old = self.organizations.pop(org_id, None)
+        if old is None:
+            return None
+        for gram in trigrams(old.name):
+            self._discard(self.trigrams, gram, org_id)
+        self._discard(self.orgs_by_building, old.building_id, org_id)
+        for activity_id in old.activity_ids:
+            self._discard(self.orgs_by_activity, activity_id, org_id)
+        return old
+
+    @staticmethod
+    def _discard(index: Dict, key, org_id: int) -> None:
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(org_id)
+            if not ids:
+                del index[key]
+
+    def _index_coordinates(self) -> None:
+        # Rebuilt in one go: a few hundred ms at a million buildings, and buildings rarely change
+        buildings = self.buildings.values()
+        self.coordinates = PointIndex([b.id for b in buildings], [b.latitude for b in buildings], [b.longitude for b in buildings])
+
+    def _index_subtrees(self) -> None:
+        children: Dict[int, List[int]] = {}
+        for activity in self.activities.values():
+            if activity.parent_id is not None:
+                children.setdefault(activity.parent_id, []).append(activity.id)
+
+        def subtree(activity_id: int) -> Iterator[int]:
+            yield activity_id
+            for child in children.get(activity_id, ()):
+                yield from subtree(child)
+
+        self.subtrees = {activity_id: frozenset(subtree(activity_id)) for activity_id in self.activities}
+
+    # --- Rows ---
+
+    def organization_rows(self, ids: Iterable[int], fields: Tuple[str, ...] = ORGANIZATION_FIELDS) -> List[OrganizationRow]:
+        """Rows for the organizations in `ids` that exist, in that order."""
+        rows = []
+        for org_id in ids:
+            org = self.organizations.get(org_id)
+            if org is None:
+                continue
+            row = {
+                "id": org.id,
+                "name": org.name,
+                "building": self.buildings[org.building_id].row,
+                "activities": [self.activities[a].row for a in org.activity_ids if a in self.activities],
+                "phones": list(org.phones),
+            }
+            rows.append(row if fields == ORGANIZATION_FIELDS else {field: row[field] for field in fields})
+        return rows
+
+    def page(self, ids: Sequence[int], page: PageParams, response: Response) -> List[int]:
+        """One page of sorted `ids`, like seek() + finish() on an id-ordered query."""
+        start = _start(ids, page.cursor, (int,))
+        return finish(ids[start:start + page.limit + 1], page, response, lambda org_id: (org_id,))
+
+    def ndjson_response(self, ids: Sequence[int], cursor: Optional[str], fields: Tuple[str, ...]) -> StreamingResponse:
+        """Every organization in sorted `ids` after the cursor, one per line."""
+        ids = ids[_start(ids, cursor, (int,)):]
+        adapter = organization_row_adapter(fields)
+
+        async def lines() -> AsyncIterator[bytes]:
+            for i in range(0, len(ids), STREAM_CHUNK_SIZE):
+                rows = self.organization_rows(ids[i:i + STREAM_CHUNK_SIZE], fields)
+                yield b"".join(adapter.dump_json(row) + b"\n" for row in rows)
+
+        return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
+
+    # --- Buildings and activities ---
+
+    def building_organization_ids(self, building_id: int) -> List[int]:
+        return sorted(self.orgs_by_building.get(building_id, ()))
+
+    def building_organization_stats(self, building_id: int) -> Tuple[int, int, int]:
+        """(count, version sum, id sum), the aggregates behind the by-building ETag."""
+        orgs = [self.organizations[org_id] for org_id in self.orgs_by_building.get(building_id, ())]
+        return len(orgs), sum(org.version for org in orgs), sum(org.id for org in orgs)
+
+    def building_stats(self) -> Tuple[int, int, int]:
+        if self._building_stats is None:
+            buildings = self.buildings.values()
+            self._building_stats = (len(buildings), sum(b.version for b in buildings), sum(b.id for b in buildings))
+        return self._building_stats
+
+    def building_rows(self, page: PageParams, response: Response) -> List[BuildingRow]:
+        return [self.buildings[building_id].row for building_id in self.page(self.building_order, page, response)]
+
+    def _subtree_organizations(self, activity_id: int) -> Tuple[List[int], Set[int]]:
+        if activity_id not in self._activity_orgs:
+            ids: Set[int] = set()
+            for descendant in self.subtrees.get(activity_id, ()):
+                ids.update(self.orgs_by_activity.get(descendant, ()))
+            self._activity_orgs[activity_id] = (sorted(ids), ids)
+        return self._activity_orgs[activity_id]
+
+    def activity_organization_ids(self, activity_id: int) -> List[int]:
+        """Organizations in the activity or any of its sub-categories, by id."""
+        return self._subtree_organizations(activity_id)[0]
+
+    # --- Geo ---
+
+    def _organizations_in(self, building_ids: Iterable[int]) -> Set[int]:
+        ids: Set[int] = set()
+        for building_id in building_ids:
+            ids.update(self.orgs_by_building.get(building_id, ()))
+        return ids
+
+    def bbox_organization_ids(self, box: BoundingBox) -> List[int]:
+        return sorted(self._organizations_in(self.coordinates.in_boxes([box])))
+
+    def radius_organization_ids(self, lat: float, lon: float, radius_km: float) -> List[int]:
+        return sorted(self._organizations_in(self.coordinates.within(lat, lon, radius_km)[0]))
+
+    def nearest_within(self, lat: float, lon: float, radius_km: float, k: int, activity_id: Optional[int] = None) -> List[Nearby]:
+        """The k organizations closest to (lat, lon) within `radius_km`, by (distance, id)."""
+        allowed = self._subtree_organizations(activity_id)[1] if activity_id is not None else None
+        hits = [
+            (distance, org_id)
+            for building_id, distance in zip(*self.coordinates.within(lat, lon, radius_km))
+            for org_id in self.orgs_by_building.get(building_id, ())
+            if allowed is None or org_id in allowed
+        ]
+        return [Nearby(org_id, distance) for distance, org_id in heapq.nsmallest(k, hits)]
+
+    # --- Name search ---
+
+    def _containing(self, lowered: str) -> Set[int]:
+        """Organizations whose case-folded name contains `lowered` (at least one trigram long)."""
+        postings = sorted((self.trigrams.get(gram, set()) for gram in trigrams(lowered)), key=len)
+        if not postings:
+            return set()
+        return {org_id for org_id in postings[0].intersection(*postings[1:]) if lowered in self.organizations[org_id].lowered}
+
+    def _in_name_order(self, cursor: Optional[str], keep: Callable[[OrganizationRecord], bool]) -> Iterator[OrganizationRecord]:
+        order = self.name_order
+        for i in range(_start(order, cursor, (str, int)), len(order)):
+            org = self.organizations[order[i][1]]
+            if keep(org):
+                yield org
+
+    def _first(self, orgs: Iterator[OrganizationRecord], page: PageParams) -> List[OrganizationRecord]:
+        taken = []
+        for org in orgs:
+            taken.append(org)
+            if len(taken) > page.limit:
+                break
+        return taken
+
+    def search_name(self, q: str, page: PageParams, response: Response) -> List[int]:
+        """
+        Same contract and ranking as the name search endpoint: substring matches,
+        prefix matches first, then shorter names, then id; close spellings when
+        nothing matches. Short queries go in name order.
+        """
+        lowered = fold_case(q)
+        if len(q) < MIN_INDEXED_QUERY_LENGTH:
+            orgs = self._first(self._in_name_order(page.cursor, lambda org: lowered in org.lowered), page)
+            return [org.id for org in finish(orgs, page, response, lambda org: (org.name, org.id))]
+
+        after = decode_cursor(page.cursor, NAME_SEARCH_CURSOR) if page.cursor else None
+        if after is None or after[0] != FUZZY_MATCH:
+            keys = sorted(
+                (PREFIX_MATCH if self.organizations[org_id].lowered.startswith(lowered) else SUBSTRING_MATCH, len(self.organizations[org_id].name), org_id)
+                for org_id in self._containing(lowered)
+            )
+            start = _start(keys, page.cursor, NAME_SEARCH_CURSOR)
+            keys = finish(keys[start:start + page.limit + 1], page, response, lambda key: key)
+            if keys or after is not None:
+                return [key[2] for key in keys]
+
+        counts = Counter()
+        for gram in trigrams(q):
+            counts.update(self.trigrams.get(gram, ()))
+        candidates = heapq.nsmallest(FUZZY_CANDIDATES, counts.items(), key=lambda item: (-item[1], item[0]))
+        ranked = sorted(
+            (score, org_id) for score, org_id in ((-similarity(q, self.organizations[org_id].name), org_id) for org_id, _ in candidates)
+            if -score >= FUZZY_MIN_SIMILARITY
+        )
+        if after is not None:
+            ranked = [item for item in ranked if item > tuple(after[1:])]
+        ranked = finish(ranked[:page.limit + 1], page, response, lambda item: (FUZZY_MATCH, item[0], item[1]))
+        return [org_id for _, org_id in ranked]
+
+    # --- Compound search ---
+
+    def compound_search(self, params: SearchParams, page: PageParams, response: Response) -> List[SearchRow]:
+        """Same contract as app.search.compound_search: candidate sets intersected smallest first."""
+        response.headers[PLAN_HEADER] = SNAPSHOT_PLAN
+        candidate_sets: List[Set[int]] = []
+        keep: Callable[[OrganizationRecord], bool] = lambda org: True
+        if params.building_id is not None:
+            candidate_sets.append(self.orgs_by_building.get(params.building_id, set()))
+        if params.activity_id is not None:
+            candidate_sets.append(self._subtree_organizations(params.activity_id)[1])
+        if params.box is not None:
+            candidate_sets.append(self._organizations_in(self.coordinates.in_boxes([params.box])))
+        if params.radius_km is not None:
+            candidate_sets.append(self._organizations_in(self.coordinates.within(*params.point, params.radius_km)[0]))
+        if params.q is not None:
+            lowered = fold_case(params.q)
+            if len(lowered) >= MIN_INDEXED_QUERY_LENGTH:
+                candidate_sets.append(self._containing(lowered))
+            else:
+                keep = lambda org: lowered in org.lowered
+
+        def row(org: OrganizationRecord) -> SearchRow:
+            if params.point is None:
+                return SearchRow(org.id, org.name, None)
+            b = self.buildings[org.building_id]
+            return SearchRow(org.id, org.name, haversine(params.point[0], params.point[1], b.latitude, b.longitude))
+
+        if params.sort == SORT_DISTANCE:
+            key, types = (lambda r: (r.distance_km, r.id)), (float, int)
+        else:
+            key, types = (lambda r: (r.name, r.id)), (str, int)
+            if not candidate_sets:
+                # Nothing narrows the search: walk the name order and stop once the page is full
+                orgs = self._first(self._in_name_order(page.cursor, keep), page)
+                return finish([row(org) for org in orgs], page, response, key)
+
+        if candidate_sets:
+            smallest, *others = sorted(candidate_sets, key=len)
+            orgs = (self.organizations[org_id] for org_id in smallest.intersection(*others))
+        else:
+            orgs = iter(self.organizations.values())
+        rows = sorted((row(org) for org in orgs if keep(org)), key=key)
+        start = _start(rows, page.cursor, types, key=key)
+        return finish(rows[start:start + page.limit + 1], page, response, key)
+
+
+# --- Loading ---
+
+def _chunks(ids: Optional[Sequence[int]]) -> Iterator[Optional[Sequence[int]]]:
+    if ids is None:
+        yield None
+        return
+    for i in range(0, len(ids), IN_CHUNK_SIZE):
+        yield ids[i:i + IN_CHUNK_SIZE]
+
+
+async def _load_buildings(db: AsyncSession, ids: Optional[Sequence[int]] = None) -> Dict[int, BuildingRecord]:
+    records = {}
+    for chunk in _chunks(ids):
+        query = select(Building.id, Building.address, Building.latitude, Building.longitude, Building.version)
+        if chunk is not None:
+            query = query.where(Building.id.in_(chunk))
+        for row in await db.execute(query):
+            records[row.id] = BuildingRecord(*row)
+    return records
+
+
+async def _load_activities(db: AsyncSession) -> Dict[int, ActivityRecord]:
+    return {row.id: ActivityRecord(*row) for row in await db.execute(select(Activity.id, Activity.name, Activity.parent_id))}
+
+
+async def _load_organizations(db: AsyncSession, ids: Optional[Sequence[int]] = None) -> Dict[int, OrganizationRecord]:
+    records: Dict[int, OrganizationRecord] = {}
+    for chunk in _chunks(ids):
+        query = select(Organization.id, Organization.name, Organization.building_id, Organization.version)
+        links = select(organization_activities.c.organization_id, organization_activities.c.activity_id)
+        phones = select(Phone.organization_id, Phone.id, Phone.number).order_by(Phone.id)
+        if chunk is not None:
+            query = query.where(Organization.id.in_(chunk))
+            links = links.where(organization_activities.c.organization_id.in_(chunk))
+            phones = phones.where(Phone.organization_id.in_(chunk))
+
+        loaded = {row.id: OrganizationRecord(*row) for row in await db.execute(query)}
+        activity_ids: Dict[int, List[int]] = {}
+        for row in await db.execute(links):
+            activity_ids.setdefault(row.organization_id, []).append(row.activity_id)
+        numbers: Dict[int, List[dict]] = {}
+        for row in await db.execute(phones):
+            numbers.setdefault(row.organization_id, []).append({"number": row.number, "id": row.id, "organization_id": row.organization_id})
+        for org_id, record in loaded.items():
+            record.activity_ids = tuple(sorted(activity_ids.get(org_id, ())))
+            record.phones = tuple(numbers.get(org_id, ()))
+        records.update(loaded)
+    return records
+
+
+async def _add_missing_buildings(
+    db: AsyncSession,
+    known: Dict[int, BuildingRecord],
+    buildings: Dict[int, Optional[BuildingRecord]],
+    organizations: Dict[int, Optional[OrganizationRecord]],
+) -> None:
+    """
+    Tables are read by separate statements, so an organization may already sit in a
+    building created after the buildings were read; load those buildings as well.
+    """
+    missing = {
+        org.building_id for org in organizations.values()
+        if org is not None and buildings.get(org.building_id, known.get(org.building_id)) is None
+    }
+    if missing:
+        buildings.update(await _load_buildings(db, sorted(missing)))
+
+
+async def load_snapshot(db: AsyncSession) -> Snapshot:
+    # The log position is read first: anything written meanwhile is applied again by the next refresh
+    seq = await db.scalar(select(func.coalesce(func.max(change_log.c.seq), 0)))
+    snapshot = Snapshot()
+    buildings, activities, organizations = await _load_buildings(db), await _load_activities(db), await _load_organizations(db)
+    await _add_missing_buildings(db, snapshot.buildings, buildings, organizations)
+    snapshot.apply(seq, buildings, activities, organizations)
+    return snapshot
+
+
+async def refresh(snapshot: Snapshot, db: AsyncSession) -> Snapshot:
+    """Apply the change_log entries after snapshot.seq; a fresh snapshot if some were already pruned."""
+    entries = (await db.execute(
+        select(change_log.c.seq, change_log.c.entity, change_log.c.entity_id).where(change_log.c.seq > snapshot.seq).order_by(change_log.c.seq)
+    )).all()
+    if not entries:
+        return snapshot
+    if entries[0].seq > snapshot.seq + 1:
+        return await load_snapshot(db)
+
+    changed: Dict[str, Set[int]] = {"building": set(), "activity": set(), "organization": set()}
+    for entry in entries:
+        changed[entry.entity].add(entry.entity_id)
+    building_ids, org_ids = sorted(changed["building"]), sorted(changed["organization"])
+    buildings = await _load_buildings(db, building_ids)
+    activities = await _load_activities(db) if changed["activity"] else None
+    organizations = await _load_organizations(db, org_ids)
+    buildings = {building_id: buildings.get(building_id) for building_id in building_ids}
+    organizations = {org_id: organizations.get(org_id) for org_id in org_ids}
+    await _add_missing_buildings(db, snapshot.buildings, buildings, organizations)
+    snapshot.apply(entries[-1].seq, buildings, activities, organizations)
+    return snapshot
+
+
+# --- Process-wide snapshot ---
+
+_snapshot: Optional[Snapshot] = None
+_refresher: Optional[asyncio.Task] = None
+_pruner: Optional[asyncio.Task] = None
+_pruned_at = 0
+
+
+def current_snapshot() -> Optional[Snapshot]:
+    return _snapshot
+
+
+def get_snapshot(request: Request) -> Optional[Snapshot]:
+    """The loaded snapshot, unless it is disabled or the client asked to read from the primary."""
+    if _snapshot is None or reads_from_primary(request):
+        return None
+    return _snapshot
+
+
+async def refresh_snapshot(sessionmaker: async_sessionmaker = SessionLocal) -> Snapshot:
+    global _snapshot, _pruned_at
+    async with sessionmaker() as db:
+        _snapshot = await load_snapshot(db) if _snapshot is None else await refresh(_snapshot, db)
+        # Trim the log now and then; snapshots further behind than the retention reload in full
+        retention = settings.CHANGE_LOG_RETENTION
+        if _snapshot.seq - _pruned_at > max(retention // 10, 1) and _snapshot.seq > retention:
+            await prune_change_log(db, _snapshot.seq)
+            _pruned_at = _snapshot.seq
+    return _snapshot
+
+
+async def prune_change_log(db: AsyncSession, upto: Optional[int] = None) -> None:
+    """Keep only the CHANGE_LOG_RETENTION entries up to `upto` (the newest entry by default)."""
+    if upto is None:
+        upto = await db.scalar(select(func.coalesce(func.max(change_log.c.seq), 0)))
+    await db.execute(delete(change_log).where(change_log.c.seq <= upto - settings.CHANGE_LOG_RETENTION))
+    await db.commit()
+
+
+async def _prune_forever(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with SessionLocal() as db:
+                await prune_change_log(db)
+        except Exception:
+            logger.exception("Change log pruning failed")
+
+
+async def _refresh_forever(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await refresh_snapshot()
+        except Exception:
+            # Keep serving the last good snapshot and try again next time
+            logger.exception("Snapshot refresh failed")
+
+
+async def start_snapshot() -> None:
+    global _refresher
+    if engine.dialect.name != "sqlite":
+        raise RuntimeError("SNAPSHOT_ENABLED needs SQLite: the change_log is kept by SQLite triggers")
+    await refresh_snapshot()
+    _refresher = asyncio.create_task(_refresh_forever(settings.SNAPSHOT_REFRESH_SECONDS))
+
+
+def start_change_log_pruning() -> None:
+    """Without a snapshot nothing reads the log, but the SQLite triggers still fill it."""
+    global _pruner
+    if engine.dialect.name == "sqlite":
+        _pruner = asyncio.create_task(_prune_forever(settings.CHANGE_LOG_PRUNE_SECONDS))
+
+
+async def stop_snapshot() -> None:
+    global _snapshot, _refresher, _pruner
+    for task in (_refresher, _pruner):
+        if task is not None:
+            task.cancel()
+    _refresher = _pruner = None
+    _snapshot = None
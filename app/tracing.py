@@ -0,0 +1,227 @@
+"""
+Per-request SQL traces.
+
+A traced request records every statement it runs: SQL, parameter shape, rows
+and duration. The trace is returned in a Server-Timing header (statements run
+before the response started) and logged as one JSON line when the request
+ends. Requests are traced when they send X-Query-Trace: 1 (with
+QUERY_TRACE_HEADER_ENABLED) or are picked by QUERY_TRACE_SAMPLE_RATE.
+
+Two N+1 signs are flagged: the same statement run many times in one request,
+and routes whose query count grows with the size of their largest result,
+fitted over their recent traces.
+"""
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app import metrics
+
+TRACE_HEADER = "X-Query-Trace"
+SERVER_TIMING_HEADER = "Server-Timing"
+
+# Statements listed one by one in Server-Timing; the rest only count towards the total
+SERVER_TIMING_MAX_QUERIES = 20
+# A statement run this many times in one request is reported as repeated
+REPEATED_STATEMENT_THRESHOLD = 5
+# Recent (largest result, query count) pairs kept per route, and the fitted
+# queries-per-row slope above which a route is flagged
+ROUTE_SAMPLES = 50
+GROWTH_THRESHOLD = 0.5
+
+logger = logging.getLogger(__name__)
+
+_TRACE_HEADER_KEY = TRACE_HEADER.lower().encode()
+_SERVER_TIMING_KEY = SERVER_TIMING_HEADER.lower().encode()
+_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+\"?(\w+)", re.IGNORECASE)
+
+
+class QueryTrace(NamedTuple):
+    statement: str
+    params: str
+    rows: Optional[int]
+    # Seconds since the request started, and spent in the statement
+    offset: float
+    duration: float
+
+
+class Trace:
+    __slots__ = ("started", "queries")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries: List[QueryTrace] = []
+
+
+_trace: ContextVar[Optional[Trace]] = ContextVar("query_trace", default=None)
+
+
+def _type_names(values) -> str:
+    counts = Counter(type(value).__name__ for value in values)
+    return ", ".join(name if count == 1 else f"{name} x{count}" for name, count in counts.items())
+
+
+def params_shape(parameters: Any, executemany: bool) -> str:
+    """Parameter types and counts, never the values: "(int x3, str)", "{id: int}", "500 x (int, str)"."""
+    if executemany:
+        return f"{len(parameters)} x {params_shape(parameters[0], False)}" if parameters else "0 x ()"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in parameters.items()) + "}"
+    return f"({_type_names(parameters or ())})"
+
+
+def _rows(cursor) -> Optional[int]:
+    if cursor.description is None:
+        # Writes without RETURNING
+        return cursor.rowcount if cursor.rowcount >= 0 else None
+    # The asyncio adapters (aiosqlite, asyncpg) fetch the whole result during execute
+    rows = getattr(cursor, "_rows", None)
+    return len(rows) if rows is not None else None
+
+
+def trace_engine(engine: AsyncEngine) -> None:
+    """Record the statements of traced requests run through `engine`; repeat calls are no-ops."""
+    sync_engine = engine.sync_engine
+    if event.contains(sync_engine, "after_cursor_execute", _finished):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _started)
+    event.listen(sync_engine, "after_cursor_execute", _finished)
+
+
+def _started(conn, cursor, statement, parameters, context, executemany):
+    if _trace.get() is not None:
+        context._trace_started = time.perf_counter()
+
+
+def _finished(conn, cursor, statement, parameters, context, executemany):
+    trace = _trace.get()
+    started = getattr(context, "_trace_started", None)
+    if trace is None or started is None:
+        return
+    now = time.perf_counter()
+    trace.queries.append(QueryTrace(statement, params_shape(parameters, executemany), _rows(cursor), started - trace.started, now - started))
+
+
+def describe(statement: str) -> str:
+    """Verb and first table of a statement: "SELECT organizations"."""
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    table = _TABLE.search(statement)
+    return f"{verb} {table.group(1)}" if table else verb
+
+
+def server_timing(queries: List[QueryTrace]) -> str:
+    entries = [f'db;dur={sum(q.duration for q in queries) * 1000:.3f};desc="{len(queries)} queries"']
+    for number, query in enumerate(queries[:SERVER_TIMING_MAX_QUERIES], 1):
+        rows = "" if query.rows is None else f" {query.rows} rows"
+        entries.append(f'q{number};dur={query.duration * 1000:.3f};desc="{describe(query.statement)}{rows}"')
+    return ", ".join(entries)
+
+
+def repeated_statements(queries: List[QueryTrace]) -> Dict[str, int]:
+    counts = Counter(query.statement for query in queries)
+    return {statement: count for statement, count in counts.items() if count >= REPEATED_STATEMENT_THRESHOLD}
+
+
+# --- Queries against result size, per route ---
+
+_route_samples: Dict[str, Deque[Tuple[int, int]]] = {}
+
+
+def _slope(samples) -> Optional[float]:
+    """Least-squares queries-per-row slope; None until results of different sizes were seen."""
+    n = len(samples)
+    mean_x = sum(x for x, _ in samples) / n
+    mean_y = sum(y for _, y in samples) / n
+    spread = sum((x - mean_x) ** 2 for x, _ in samples)
+    if spread == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in samples) / spread
+
+
+def record_route(route: str, queries: List[QueryTrace]) -> Optional[float]:
+    """Add a trace to its route's samples and return the route's current slope."""
+    largest = max((query.rows or 0 for query in queries), default=0)
+    samples = _route_samples.setdefault(route, deque(maxlen=ROUTE_SAMPLES))
+    samples.append((largest, len(queries)))
+    return _slope(samples)
+
+
+def route_growth() -> Iterator[Tuple[Tuple[str], float]]:
+    for route, samples in list(_route_samples.items()):
+        slope = _slope(samples)
+        if slope is not None:
+            yield (route,), slope
+
+
+metrics.register(metrics.Collected(
+    "query_trace_queries_per_row",
+    f"Extra SQL statements per result row, fitted over traced requests; above {GROWTH_THRESHOLD} suggests N+1",
+    route_growth,
+    ("route",),
+))
+
+
+class QueryTraceMiddleware:
+    """Plain ASGI middleware that traces the requests asking for it, and a sample of the rest."""
+
+    def __init__(self, app: ASGIApp, header_enabled: bool = False, sample_rate: float = 0.0):
+        self.app = app
+        self.header_enabled = header_enabled
+        self.sample_rate = sample_rate
+
+    def wants_trace(self, scope: Scope) -> bool:
+        if self.header_enabled:
+            for name, value in scope["headers"]:
+                if name == _TRACE_HEADER_KEY:
+                    return value == b"1"
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.wants_trace(scope):
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace()
+        status = 500
+
+        async def timed_send(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", ()), (_SERVER_TIMING_KEY, server_timing(trace.queries).encode())]
+            await send(message)
+
+        token = _trace.set(trace)
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            _trace.reset(token)
+            route = metrics.route_label(scope)
+            slope = record_route(route, trace.queries)
+            repeated = repeated_statements(trace.queries)
+            logger.info(json.dumps({
+                "event": "query_trace",
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": route,
+                "status": status,
+                "duration_ms": round((time.perf_counter() - trace.started) * 1000, 3),
+                "query_count": len(trace.queries),
+                "db_ms": round(sum(q.duration for q in trace.queries) * 1000, 3),
+                "queries": [
+                    {"statement": q.statement, "params": q.params, "rows": q.rows, "offset_ms": round(q.offset * 1000, 3), "duration_ms": round(q.duration * 1000, 3)}
+                    for q in trace.queries
+                ],
+                "repeated_statements": repeated,
+                "queries_per_row": slope,
+                "n_plus_one": bool(repeated) or (slope is not None and slope >= GROWTH_THRESHOLD),
+            }))
@@ -0,0 +1,111 @@
+"""
+Per-request overhead of the API key check: no middleware, the previous
+@app.middleware("http") (BaseHTTPMiddleware) version, and APIKeyMiddleware.
+Requests are driven straight through the ASGI interface.
+
+    python -m benchmarks.auth_middleware --requests 5000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.auth import APIKeyMiddleware, configured_api_keys
+from app.config import settings
+from app.database import Base, get_db
+from app.main import HIDDEN_PATHS, health_check
+from app.models import Building, Organization
+from app.routers import organizations
+
+
+async def legacy_api_key_middleware(request: Request, call_next):
+    # The check as it was before APIKeyMiddleware
+    path = request.url.path.rstrip("/")
+    if path in HIDDEN_PATHS or request.url.path == "/openapi.json":
+        return await call_next(request)
+    api_key = request.headers.get("X-API-KEY")
+    if api_key != settings.STATIC_API_KEY:
+        return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"detail": "Invalid or missing API Key"})
+    return await call_next(request)
+
+
+def build_app(variant: str, make_session) -> FastAPI:
+    app = FastAPI()
+    app.include_router(organizations.router)
+    app.get("/health")(health_check)
+    if variant == "BaseHTTPMiddleware":
+        app.middleware("http")(legacy_api_key_middleware)
+    elif variant == "APIKeyMiddleware":
+        app.add_middleware(APIKeyMiddleware, keys=configured_api_keys(), public_paths=HIDDEN_PATHS)
+
+    async def override_get_db():
+        async with make_session() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    return app
+
+
+async def call(app, path: str) -> int:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"bench"), (b"x-api-key", settings.STATIC_API_KEY.encode())],
+        "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+    }
+    status_code = 0
+    body_sent = False
+
+    async def receive():
+        # Like a server: the (empty) body once, then nothing until the client goes away
+        nonlocal body_sent
+        if body_sent:
+            await asyncio.Event().wait()
+        body_sent = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status_code
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+
+    await app(scope, receive, send)
+    return status_code
+
+
+async def main(requests: int) -> None:
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Building), [{"id": 1, "address": "Bench", "latitude": 0, "longitude": 0}])
+        await conn.execute(insert(Organization), [{"id": 1, "name": "Bench Org", "building_id": 1}])
+    make_session = async_sessionmaker(engine, expire_on_commit=False)
+
+    print(f"{requests} sequential requests per case, median of 3 runs")
+    for path in ("/health", "/organizations/1"):
+        baseline = None
+        for variant in ("no auth", "BaseHTTPMiddleware", "APIKeyMiddleware"):
+            app = build_app(variant, make_session)
+            assert await call(app, path) == 200
+            runs = []
+            for _ in range(3):
+                start = time.perf_counter()
+                for _ in range(requests):
+                    await call(app, path)
+                runs.append((time.perf_counter() - start) / requests * 1e6)
+            per_request = statistics.median(runs)
+            baseline = baseline if baseline is not None else per_request
+            print(f"  {path:<18} {variant:<20} {per_request:8.1f} us/request  (+{per_request - baseline:6.1f} us)")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
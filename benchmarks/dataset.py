@@ -0,0 +1,193 @@
+"""
+Deterministic synthetic directory: buildings clustered around real city
+centres, a three-level activity tree (the most the depth triggers allow) and
+organizations with Zipf-distributed activity, phone and building popularity.
+The same seed and sizes always produce the same rows and ids.
+
+    python -m benchmarks.dataset --buildings 10000 --organizations 100000
+
+seeds DATABASE_URL, which must already have the schema (alembic upgrade head)
+and no organizations.
+"""
+import argparse
+import asyncio
+import bisect
+import itertools
+import math
+import random
+import time
+from typing import Dict, Iterator, List, NamedTuple, Sequence, Tuple
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Activity, Building, Organization, Phone, organization_activities
+
+INSERT_BATCH_SIZE = 5000
+
+# (name, latitude, longitude); earlier cities get more buildings
+CITIES = [
+    ("Moscow", 55.7558, 37.6173),
+    ("Saint Petersburg", 59.9343, 30.3351),
+    ("Novosibirsk", 55.0084, 82.9357),
+    ("Yekaterinburg", 56.8389, 60.6057),
+    ("Kazan", 55.7961, 49.1064),
+    ("Nizhny Novgorod", 56.2965, 43.9361),
+    ("Samara", 53.1959, 50.1002),
+    ("Rostov-on-Don", 47.2357, 39.7015),
+    ("Krasnoyarsk", 56.0153, 92.8932),
+    ("Vladivostok", 43.1155, 131.8855),
+]
+# Spread of buildings around a city centre, in km
+CITY_SPREAD_KM = 8.0
+
+STREETS = ["Lenina", "Tverskaya", "Nevsky", "Sadovaya", "Mira", "Gagarina", "Pushkina", "Sovetskaya", "Kirova", "Lesnaya", "Naberezhnaya", "Shkolnaya"]
+
+# Three levels: root -> child -> leaf
+ACTIVITY_TREE = {
+    "Food": ["Meat Products", "Dairy Products", "Bakery", "Beverages", "Confectionery"],
+    "Automotive": ["Spare Parts", "Car Service", "Car Wash", "Tires"],
+    "IT Services": ["Software Development", "Hosting", "Consulting", "Support"],
+    "Retail": ["Clothing", "Electronics", "Furniture", "Books", "Toys"],
+    "Health": ["Pharmacy", "Clinic", "Dentistry", "Optics"],
+    "Construction": ["Materials", "Tools", "Repair", "Design"],
+    "Education": ["Courses", "Tutoring", "Languages"],
+    "Hospitality": ["Restaurants", "Cafes", "Hotels", "Catering"],
+}
+LEAF_KINDS = ["Wholesale", "Retail", "Premium", "Budget"]
+
+NAME_PREFIXES = ["North", "South", "Grand", "Prime", "Metro", "Golden", "Silver", "Green", "Blue", "Red", "Royal", "City", "Star", "Nova", "Alfa", "Vector"]
+NAME_SUFFIXES = ["LLC", "Group", "Co", "Center", "House", "Market", "Lab", "Studio", "Works", "Point"]
+
+# Zipf exponents and maximum counts
+ACTIVITIES_PER_ORG = (1.6, 5)
+PHONES_PER_ORG = (1.3, 4)
+ACTIVITY_POPULARITY = 1.0
+BUILDING_POPULARITY = 0.5
+
+
+class Zipf:
+    """Ranks 1..n with P(k) proportional to 1 / k**s, sampled by binary search over the cumulative weights."""
+
+    def __init__(self, n: int, s: float):
+        self.cumulative = list(itertools.accumulate(1 / k ** s for k in range(1, n + 1)))
+
+    def sample(self, rng: random.Random) -> int:
+        return bisect.bisect_left(self.cumulative, rng.random() * self.cumulative[-1]) + 1
+
+
+class Dataset(NamedTuple):
+    seed: int
+    buildings: int
+    organizations: int
+    # Activity ids by level, roots first
+    activity_levels: Tuple[List[int], List[int], List[int]]
+    cities: Sequence[Tuple[str, float, float]]
+
+    def describe(self) -> Dict:
+        return {
+            "seed": self.seed,
+            "buildings": self.buildings,
+            "organizations": self.organizations,
+            "activities": sum(len(level) for level in self.activity_levels),
+        }
+
+
+def _batches(rows: Iterator[Dict], size: int = INSERT_BATCH_SIZE) -> Iterator[List[Dict]]:
+    while True:
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def building_rows(rng: random.Random, count: int) -> Iterator[Dict]:
+    city_rank = Zipf(len(CITIES), 1.0)
+    for building_id in range(1, count + 1):
+        city, lat, lon = CITIES[city_rank.sample(rng) - 1]
+        dlat = rng.gauss(0, CITY_SPREAD_KM / 111.2)
+        dlon = rng.gauss(0, CITY_SPREAD_KM / (111.2 * math.cos(math.radians(lat))))
+        yield {
+            "id": building_id,
+            "address": f"{city}, {rng.choice(STREETS)} {rng.randint(1, 200)}",
+            "latitude": round(lat + dlat, 6),
+            "longitude": round(lon + dlon, 6),
+        }
+
+
+def activity_rows() -> Tuple[List[Dict], Tuple[List[int], List[int], List[int]]]:
+    rows: List[Dict] = []
+    levels: Tuple[List[int], List[int], List[int]] = ([], [], [])
+    ids = itertools.count(1)
+
+    def add(name, parent_id, level):
+        activity_id = next(ids)
+        rows.append({"id": activity_id, "name": name, "parent_id": parent_id})
+        levels[level].append(activity_id)
+        return activity_id
+
+    for root, children in ACTIVITY_TREE.items():
+        root_id = add(root, None, 0)
+        for child in children:
+            child_id = add(child, root_id, 1)
+            for kind in LEAF_KINDS:
+                add(f"{child} ({kind})", child_id, 2)
+    return rows, levels
+
+
+async def generate(session: AsyncSession, buildings: int, organizations: int, seed: int = 0) -> Dataset:
+    """Insert the dataset into an empty schema and commit."""
+    rng = random.Random(seed)
+    for batch in _batches(building_rows(rng, buildings)):
+        await session.execute(insert(Building), batch)
+
+    activities, levels = activity_rows()
+    # Parents first, for the depth and closure triggers
+    for level in map(set, levels):
+        await session.execute(insert(Activity), [row for row in activities if row["id"] in level])
+    names = {row["id"]: row["name"] for row in activities}
+    # Leaves and their parents are what organizations get tagged with, most popular first
+    taggable = levels[2] + levels[1]
+    rng.shuffle(taggable)
+
+    activity_count, phone_count = Zipf(ACTIVITIES_PER_ORG[1], ACTIVITIES_PER_ORG[0]), Zipf(PHONES_PER_ORG[1], PHONES_PER_ORG[0])
+    activity_rank, building_rank = Zipf(len(taggable), ACTIVITY_POPULARITY), Zipf(buildings, BUILDING_POPULARITY)
+    # Popular buildings are scattered over the id range rather than the lowest ids
+    building_ids = list(range(1, buildings + 1))
+    rng.shuffle(building_ids)
+
+    def organization_rows():
+        for org_id in range(1, organizations + 1):
+            tags = {taggable[activity_rank.sample(rng) - 1] for _ in range(activity_count.sample(rng))}
+            main = names[min(tags)].split(" (")[0]
+            name = f"{rng.choice(NAME_PREFIXES)} {main} {rng.choice(NAME_SUFFIXES)}"
+            phones = [f"8-{rng.randint(800, 999)}-{rng.randint(100, 999)}-{rng.randint(10, 99)}-{rng.randint(10, 99)}" for _ in range(phone_count.sample(rng) - 1)]
+            yield {"id": org_id, "name": name, "building_id": building_ids[building_rank.sample(rng) - 1], "tags": sorted(tags), "phones": phones}
+
+    for batch in _batches(organization_rows()):
+        await session.execute(insert(Organization), [{"id": r["id"], "name": r["name"], "building_id": r["building_id"]} for r in batch])
+        await session.execute(insert(organization_activities), [{"organization_id": r["id"], "activity_id": a} for r in batch for a in r["tags"]])
+        phones = [{"organization_id": r["id"], "number": number} for r in batch for number in r["phones"]]
+        if phones:
+            await session.execute(insert(Phone), phones)
+    await session.commit()
+    return Dataset(seed, buildings, organizations, levels, CITIES)
+
+
+async def main(args) -> None:
+    from app.database import SessionLocal
+
+    async with SessionLocal() as session:
+        if await session.scalar(select(func.count(Organization.id))):
+            raise SystemExit("The database already has organizations")
+        start = time.perf_counter()
+        dataset = await generate(session, args.buildings, args.organizations, args.seed)
+    print(f"Generated {dataset.describe()} in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--buildings", type=int, default=10000)
+    parser.add_argument("--organizations", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,239 @@
+"""
+Latency and throughput of every read endpoint in app/routers/organizations.py
+against a synthetic directory (benchmarks/dataset.py), driven in-process
+through httpx.AsyncClient. Results are written as JSON, one file per commit,
+and can be compared with an earlier run.
+
+    python -m benchmarks.endpoints --organizations 100000 --requests 500
+    python -m benchmarks.endpoints --compare benchmarks/results/<older commit>.json
+
+The database is a SQLite file, generated on first use and reused while the
+sizes and seed stay the same. The response cache is disabled unless --cache is
+given, so requests reach the database (or the snapshot, with --snapshot).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, NamedTuple
+
+if "--cache" not in sys.argv:
+    os.environ.setdefault("CACHE_BACKEND", "none")
+
+from httpx import AsyncClient  # noqa: E402
+from sqlalchemy import func, select  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.database import Base, get_db, make_engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import Building, Organization  # noqa: E402
+from benchmarks.dataset import ACTIVITY_TREE, CITIES, NAME_PREFIXES, Dataset, activity_rows, generate  # noqa: E402
+
+HEADERS = {"X-API-KEY": settings.STATIC_API_KEY}
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+# Relative change in p50, p99 or throughput reported as a regression by --compare
+REGRESSION_THRESHOLD = 0.10
+
+
+class Endpoint(NamedTuple):
+    name: str
+    path: Callable[[random.Random, Dataset], str]
+
+
+def _near_city(rng: random.Random, dataset: Dataset):
+    _, lat, lon = rng.choice(dataset.cities)
+    return round(lat + rng.gauss(0, 0.05), 5), round(lon + rng.gauss(0, 0.08), 5)
+
+
+def _name_query(rng: random.Random) -> str:
+    words = NAME_PREFIXES + [child.split()[0] for children in ACTIVITY_TREE.values() for child in children]
+    word = rng.choice(words).lower()
+    return word[:rng.randint(3, len(word))] if len(word) > 3 else word
+
+
+def _radius(rng, dataset):
+    lat, lon = _near_city(rng, dataset)
+    return f"/organizations/building/radius?lat={lat}&lon={lon}&radius_km=1&limit=20"
+
+
+def _bbox(rng, dataset):
+    lat, lon = _near_city(rng, dataset)
+    return f"/organizations/building/bbox?min_lat={lat - 0.01}&min_lon={lon - 0.015}&max_lat={lat + 0.01}&max_lon={lon + 0.015}&limit=20"
+
+
+def _nearest(rng, dataset):
+    lat, lon = _near_city(rng, dataset)
+    return f"/organizations/building/nearest?lat={lat}&lon={lon}&k=10"
+
+
+def _compound(rng, dataset):
+    lat, lon = _near_city(rng, dataset)
+    return f"/organizations/search?q={_name_query(rng)}&activity_id={rng.choice(dataset.activity_levels[0])}&lat={lat}&lon={lon}&radius_km=5&sort=distance&limit=20"
+
+
+ENDPOINTS = [
+    Endpoint("get_by_id", lambda rng, d: f"/organizations/{rng.randint(1, d.organizations)}"),
+    Endpoint("batch_get", lambda rng, d: "/organizations?ids=" + ",".join(str(rng.randint(1, d.organizations)) for _ in range(20))),
+    Endpoint("search_name", lambda rng, d: f"/organizations/search/name?q={_name_query(rng)}&limit=20"),
+    Endpoint("compound_search", _compound),
+    Endpoint("radius", _radius),
+    Endpoint("bbox", _bbox),
+    Endpoint("nearest", _nearest),
+    Endpoint("building", lambda rng, d: f"/organizations/building/{rng.randint(1, d.buildings)}?limit=20"),
+    Endpoint("activity", lambda rng, d: f"/organizations/activity/{rng.choice(d.activity_levels[rng.randint(0, 2)])}?limit=20"),
+    Endpoint("buildings_list", lambda rng, d: "/organizations/buildings/list?limit=20"),
+]
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def measure(client: AsyncClient, paths: List[str], concurrency: int) -> Dict:
+    queue = iter(paths)
+    latencies: List[float] = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for path in queue:
+            start = time.perf_counter()
+            response = await client.get(path, headers=HEADERS)
+            latencies.append(time.perf_counter() - start)
+            errors += response.status_code != 200
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p90_ms": round(percentile(latencies, 0.90) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+    }
+
+
+def git_revision() -> Dict:
+    def git(*args):
+        return subprocess.run(["git", *args], capture_output=True, text=True, cwd=os.path.dirname(__file__)).stdout.strip()
+    return {"commit": git("rev-parse", "--short", "HEAD") or "unknown", "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def compare(baseline: Dict, current: Dict, threshold: float = REGRESSION_THRESHOLD) -> List[str]:
+    """Print the change per endpoint and return the regressed ones."""
+    regressed = []
+    print(f"\nAgainst {baseline['revision']['commit']} ({baseline['created']}):")
+    for name, now in current["endpoints"].items():
+        before = baseline["endpoints"].get(name)
+        if before is None:
+            continue
+        changes = {
+            "p50": now["p50_ms"] / before["p50_ms"] - 1,
+            "p99": now["p99_ms"] / before["p99_ms"] - 1,
+            # Lower throughput is the regression, so flip its sign
+            "throughput": before["throughput_rps"] / now["throughput_rps"] - 1,
+        }
+        worse = [metric for metric, change in changes.items() if change > threshold]
+        if worse:
+            regressed.append(name)
+        print(f"  {name:<16} p50 {changes['p50']:+7.1%}  p99 {changes['p99']:+7.1%}  throughput {now['throughput_rps'] / before['throughput_rps'] - 1:+7.1%}"
+              + (f"  REGRESSED ({', '.join(worse)})" if worse else ""))
+    return regressed
+
+
+async def prepare(args):
+    path = args.database or os.path.join(tempfile.gettempdir(), f"directory-bench-{args.buildings}-{args.organizations}-{args.seed}.db")
+    engine = make_engine(f"sqlite+aiosqlite:///{path}")
+    make_session = async_sessionmaker(engine, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with make_session() as session:
+        organizations = await session.scalar(select(func.count(Organization.id)))
+        if organizations:
+            buildings = await session.scalar(select(func.count(Building.id)))
+            dataset = Dataset(args.seed, buildings, organizations, activity_rows()[1], CITIES)
+        else:
+            start = time.perf_counter()
+            dataset = await generate(session, args.buildings, args.organizations, args.seed)
+            print(f"Generated {path} in {time.perf_counter() - start:.1f} s")
+    return engine, make_session, dataset
+
+
+async def main(args) -> None:
+    engine, make_session, dataset = await prepare(args)
+
+    async def override_get_db():
+        async with make_session() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    if args.snapshot:
+        from app.snapshot import refresh_snapshot
+        await refresh_snapshot(make_session)
+
+    selected = [e for e in ENDPOINTS if not args.endpoints or e.name in args.endpoints]
+    results: Dict[str, Dict] = {}
+    async with AsyncClient(app=app, base_url="http://bench") as client:
+        for endpoint in selected:
+            rng = random.Random(f"{args.seed}:{endpoint.name}")
+            await measure(client, [endpoint.path(rng, dataset) for _ in range(args.warmup)], 1)
+            results[endpoint.name] = await measure(client, [endpoint.path(rng, dataset) for _ in range(args.requests)], args.concurrency)
+            r = results[endpoint.name]
+            print(f"  {endpoint.name:<16} p50 {r['p50_ms']:8.2f} ms  p99 {r['p99_ms']:8.2f} ms  {r['throughput_rps']:8.1f} req/s  errors {r['errors']}")
+    app.dependency_overrides.clear()
+    await engine.dispose()
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "database": f"{engine.dialect.name}+{engine.dialect.driver}",
+        "dataset": dataset.describe(),
+        "options": {"requests": args.requests, "warmup": args.warmup, "concurrency": args.concurrency, "cache": args.cache, "snapshot": args.snapshot},
+        "endpoints": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['revision']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressed = compare(json.load(f), report, args.threshold)
+        if regressed and args.fail_on_regression:
+            raise SystemExit(f"Regressed: {', '.join(regressed)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--buildings", type=int, default=10000)
+    parser.add_argument("--organizations", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--database", default=None, help="SQLite file to generate or reuse; defaults to one per size and seed in the temp dir")
+    parser.add_argument("--requests", type=int, default=500, help="Measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--endpoints", type=lambda v: v.split(","), default=None, help=f"Subset of: {', '.join(e.name for e in ENDPOINTS)}")
+    parser.add_argument("--cache", action="store_true", help="Keep the response cache on")
+    parser.add_argument("--snapshot", action="store_true", help="Serve reads from the in-memory snapshot")
+    parser.add_argument("--output", default=None, help="Defaults to benchmarks/results/<commit>.json")
+    parser.add_argument("--compare", default=None, help="Earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    asyncio.run(main(parser.parse_args()))
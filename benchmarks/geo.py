@@ -0,0 +1,95 @@
+"""
+Radius and bounding box filtering over building coordinates: a Python
+haversine per building (the original radius endpoint), one NumPy pass over
+every building, and app.geo.PointIndex (latitude band, then NumPy).
+
+    python -m benchmarks.geo --buildings 10000,100000,1000000
+"""
+import argparse
+import math
+import random
+import statistics
+import time
+
+import numpy as np
+
+from app.geo import BoundingBox, PointIndex, haversine, haversine_many
+
+# Buildings are spread around these city centres
+CITIES = [(55.7558, 37.6173), (59.9343, 30.3351), (56.8389, 60.6057), (55.0084, 82.9357), (43.1155, 131.8855)]
+
+
+def generate(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    ids, latitudes, longitudes = [], [], []
+    for i in range(count):
+        lat, lon = CITIES[i % len(CITIES)]
+        ids.append(i + 1)
+        latitudes.append(lat + rng.gauss(0, 0.15))
+        longitudes.append(lon + rng.gauss(0, 0.25))
+    return ids, latitudes, longitudes
+
+
+def python_radius(points, lat, lon, radius_km):
+    return [i for i, a, b in points if haversine(lat, lon, a, b) <= radius_km]
+
+
+def python_bbox(points, box):
+    return [i for i, a, b in points if box.min_lat <= a <= box.max_lat and box.min_lon <= b <= box.max_lon]
+
+
+def numpy_radius(ids, latitudes, longitudes, lat, lon, radius_km):
+    return ids[haversine_many(lat, lon, latitudes, longitudes) <= radius_km]
+
+
+def numpy_bbox(ids, latitudes, longitudes, box):
+    return ids[(latitudes >= box.min_lat) & (latitudes <= box.max_lat) & (longitudes >= box.min_lon) & (longitudes <= box.max_lon)]
+
+
+def measure(fn, queries, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            fn(*query)
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def run(count: int, radius_km: float, repeat: int) -> None:
+    ids, latitudes, longitudes = generate(count)
+    start = time.perf_counter()
+    index = PointIndex(ids, latitudes, longitudes)
+    build = time.perf_counter() - start
+    points = list(zip(ids, latitudes, longitudes))
+    arrays = (np.asarray(ids), np.asarray(latitudes), np.asarray(longitudes))
+
+    rng = random.Random(2)
+    centres = [(lat + rng.gauss(0, 0.05), lon + rng.gauss(0, 0.05)) for lat, lon in CITIES]
+    dlat = radius_km / 111.2
+    boxes = [BoundingBox(lat - dlat, lon - dlat / math.cos(math.radians(lat)), lat + dlat, lon + dlat / math.cos(math.radians(lat))) for lat, lon in centres]
+    hits = statistics.mean(len(index.within(lat, lon, radius_km)[0]) for lat, lon in centres)
+    # The pure Python path is slow enough at a million rows to need fewer rounds
+    slow_repeat = max(1, repeat * 10000 // count)
+
+    print(f"{count} buildings, {radius_km:g} km radius (~{hits:.0f} hits), PointIndex built in {build * 1000:.0f} ms; median per query")
+    rows = [
+        ("radius: python haversine per row", python_radius, [(points, lat, lon, radius_km) for lat, lon in centres], slow_repeat),
+        ("radius: numpy, all buildings", numpy_radius, [(*arrays, lat, lon, radius_km) for lat, lon in centres], repeat),
+        ("radius: PointIndex.within", index.within, [(lat, lon, radius_km) for lat, lon in centres], repeat),
+        ("bbox:   python comparison per row", python_bbox, [(points, box) for box in boxes], slow_repeat),
+        ("bbox:   numpy, all buildings", numpy_bbox, [(*arrays, box) for box in boxes], repeat),
+        ("bbox:   PointIndex.in_boxes", index.in_boxes, [([box],) for box in boxes], repeat),
+    ]
+    for label, fn, queries, rounds in rows:
+        print(f"  {label:<36} {measure(fn, queries, rounds) * 1000:9.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--buildings", default="10000,100000,1000000", help="comma-separated sizes")
+    parser.add_argument("--radius-km", type=float, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    for count in (int(n) for n in args.buildings.split(",")):
+        run(count, args.radius_km, args.repeat)
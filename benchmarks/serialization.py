@@ -0,0 +1,100 @@
+"""
+Per-row cost of list responses: ORM + Pydantic validation (the previous path)
+versus row tuples + precompiled TypeAdapter (app/serialization.py), and the
+same with an id,name sparse fieldset.
+
+    python -m benchmarks.serialization --rows 5000
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import selectinload
+
+from app.database import Base
+from app.models import Activity, Building, Organization, Phone, organization_activities
+from app.schemas import Organization as OrganizationSchema
+from app.serialization import fetch_organization_rows, organization_list_adapter, organizations_adapter
+
+schema_adapter = TypeAdapter(List[OrganizationSchema])
+
+
+async def populate(session, rows: int) -> None:
+    await session.execute(insert(Building), [
+        {"id": i, "address": f"Street {i}", "latitude": 55 + i / 1e4, "longitude": 37 + i / 1e4} for i in range(1, rows // 10 + 2)
+    ])
+    await session.execute(insert(Activity), [{"id": i, "name": f"Activity {i}"} for i in range(1, 21)])
+    await session.execute(insert(Organization), [
+        {"id": i, "name": f"Organization {i}", "building_id": i // 10 + 1} for i in range(1, rows + 1)
+    ])
+    await session.execute(insert(organization_activities), [
+        {"organization_id": i, "activity_id": a} for i in range(1, rows + 1) for a in (i % 20 + 1, (i + 7) % 20 + 1)
+    ])
+    await session.execute(insert(Phone), [
+        {"organization_id": i, "number": f"8-800-{i:07d}-{n}"} for i in range(1, rows + 1) for n in range(2)
+    ])
+    await session.commit()
+
+
+async def orm_path(session) -> bytes:
+    query = select(Organization).options(
+        selectinload(Organization.building),
+        selectinload(Organization.activities),
+        selectinload(Organization.phones),
+    )
+    orgs = (await session.execute(query)).scalars().all()
+    # What FastAPI does for response_model=List[Organization]: validate, encode, json.dumps
+    validated = schema_adapter.validate_python(orgs, from_attributes=True)
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+
+async def row_path(session) -> bytes:
+    ids = (await session.execute(select(Organization.id))).scalars().all()
+    return organizations_adapter.dump_json(await fetch_organization_rows(session, ids))
+
+
+async def projected_path(session) -> bytes:
+    ids = (await session.execute(select(Organization.id))).scalars().all()
+    fields = ("id", "name")
+    return organization_list_adapter(fields).dump_json(await fetch_organization_rows(session, ids, fields=fields))
+
+
+async def measure(make_session, fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        async with make_session() as session:
+            start = time.perf_counter()
+            await fn(session)
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+async def main(rows: int, repeat: int) -> None:
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    make_session = async_sessionmaker(engine, expire_on_commit=False)
+    async with make_session() as session:
+        await populate(session, rows)
+
+    print(f"{rows} organizations (2 activities, 2 phones each), median of {repeat} runs")
+    paths = (("orm + pydantic validation", orm_path), ("row tuples + TypeAdapter", row_path), ("fields=id,name", projected_path))
+    for label, fn in paths:
+        elapsed = await measure(make_session, fn, repeat)
+        print(f"  {label:<28} {elapsed * 1000:8.1f} ms total  {elapsed / rows * 1e6:7.1f} us/row")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.repeat))
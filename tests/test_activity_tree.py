@@ -0,0 +1,77 @@
+from collections import namedtuple
+
+import pytest
+
+from app.activity_tree import ActivityTree
+from app.config import settings
+from app.routers.activities import ANCESTORS_HEADER
+
+HEADERS = {"X-API-KEY": settings.STATIC_API_KEY}
+
+Row = namedtuple("Row", "id name parent_id version")
+
+
+def test_tree_precomputes_depth_ancestors_and_descendants():
+    rows = [Row(1, "Food", None, 1), Row(2, "Meat", 1, 1), Row(3, "Milk", 1, 1), Row(4, "Cheese", 3, 2), Row(5, "Cars", None, 1)]
+    tree = ActivityTree(rows[::-1])
+    assert tree.fingerprint == (5, 6, 15)
+    assert tree.roots == [1, 5]
+    assert tree.depth == {1: 1, 5: 1, 2: 2, 3: 2, 4: 3}
+    assert tree.ancestors[4] == (1, 3)
+    assert tree.descendants == {1: (2, 3, 4), 2: (), 3: (4,), 4: (), 5: ()}
+    assert tree.content.startswith(b'[{"name":"Food","id":1,"parent_id":null,"children":[{"name":"Meat","id":2,"parent_id":1,"children":[]}')
+    content, etag = tree.subtree(3)
+    assert content == b'{"name":"Milk","id":3,"parent_id":1,"children":[{"name":"Cheese","id":4,"parent_id":3,"children":[]}]}'
+    assert tree.subtree(3) == (content, etag) and not etag.startswith("W/")
+
+
+@pytest.mark.asyncio
+async def test_tree_and_subtree_endpoints(client):
+    async def create(name, parent_id=None):
+        response = await client.post("/activities", json={"name": name, "parent_id": parent_id}, headers=HEADERS)
+        assert response.status_code == 201
+        return response.json()["id"]
+
+    root = await create("Tree Root")
+    child = await create("Tree Child", root)
+    leaf = await create("Tree Leaf", child)
+
+    response = await client.get("/activities/tree", headers=HEADERS)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    node = next(node for node in response.json() if node["id"] == root)
+    assert node == {"name": "Tree Root", "id": root, "parent_id": None, "children": [
+        {"name": "Tree Child", "id": child, "parent_id": root, "children": [{"name": "Tree Leaf", "id": leaf, "parent_id": child, "children": []}]},
+    ]}
+    assert (await client.get("/activities/tree", headers={**HEADERS, "If-None-Match": etag})).status_code == 304
+
+    response = await client.get(f"/activities/{child}/subtree", headers=HEADERS)
+    assert response.json() == node["children"][0]
+    assert response.headers[ANCESTORS_HEADER] == str(root)
+    assert (await client.get(f"/activities/{child}/subtree", headers={**HEADERS, "If-None-Match": response.headers["etag"]})).status_code == 304
+    assert (await client.get("/activities/999999/subtree", headers=HEADERS)).status_code == 404
+
+    # Any change to the activities moves the tree to a new version
+    assert (await client.put(f"/activities/{leaf}", json={"name": "Tree Leaf Renamed", "parent_id": child}, headers=HEADERS)).status_code == 200
+    response = await client.get("/activities/tree", headers={**HEADERS, "If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["etag"] != etag
+    assert "Tree Leaf Renamed" in response.text
+    assert (await client.delete(f"/activities/{leaf}", headers=HEADERS)).status_code == 204
+    response = await client.get(f"/activities/{child}/subtree", headers=HEADERS)
+    assert response.json()["children"] == []
+
+
+@pytest.mark.asyncio
+async def test_recreated_activity_does_not_reuse_a_deleted_id(client):
+    parent = (await client.post("/activities", json={"name": "Reuse Parent"}, headers=HEADERS)).json()["id"]
+    old = (await client.post("/activities", json={"name": "Reuse Old", "parent_id": parent}, headers=HEADERS)).json()["id"]
+    etag = (await client.get("/activities/tree", headers=HEADERS)).headers["etag"]
+
+    # The deleted row had the highest id; a new row with its id and version would leave the fingerprint unchanged
+    assert (await client.delete(f"/activities/{old}", headers=HEADERS)).status_code == 204
+    new = (await client.post("/activities", json={"name": "Reuse Brand New"}, headers=HEADERS)).json()["id"]
+    assert new != old
+
+    response = await client.get("/activities/tree", headers={**HEADERS, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert "Reuse Old" not in response.text and "Reuse Brand New" in response.text
@@ -26,3 +26,43 @@ async def test_protected_route_correct_key(client):
     # Should be 404 because route doesn't exist, NOT 401
     response = await client.get("/some-protected-route", headers={"X-API-KEY": settings.STATIC_API_KEY})
     assert response.status_code == 404
+
+def scoped_app():
+    from fastapi import FastAPI, Request
+    from app.auth import APIKeyMiddleware
+
+    scoped = FastAPI()
+    scoped.add_middleware(APIKeyMiddleware, keys={"reader": ["read"], "writer": ["read", "write"]}, public_paths={"/health"})
+
+    @scoped.get("/items")
+    async def read_items(request: Request):
+        return sorted(request.state.api_key_scopes)
+
+    @scoped.post("/items")
+    async def write_items():
+        return {"ok": True}
+
+    return scoped
+
+@pytest.mark.asyncio
+async def test_api_key_scopes():
+    async with AsyncClient(app=scoped_app(), base_url="http://test") as ac:
+        response = await ac.get("/items", headers={"X-API-KEY": "reader"})
+        assert response.status_code == 200
+        assert response.json() == ["read"]
+
+        response = await ac.post("/items", headers={"X-API-KEY": "reader"})
+        assert response.status_code == 403
+        assert response.json() == {"detail": "API key lacks the 'write' scope"}
+
+        response = await ac.post("/items", headers={"X-API-KEY": "writer"})
+        assert response.status_code == 200
+
+        response = await ac.get("/items", headers={"X-API-KEY": "reader-but-longer"})
+        assert response.status_code == 401
+
+@pytest.mark.asyncio
+async def test_public_paths_allow_trailing_slash(client):
+    response = await client.get("/health/")
+    # Reaches routing (redirect or 404) instead of being rejected
+    assert response.status_code != 401
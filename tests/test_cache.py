@@ -0,0 +1,79 @@
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.orm import selectinload
+from app import cache as cache_module
+from app.cache import TTLLRUCache, organization_key
+from app.config import settings
+from app.models import Organization, Building, Activity, Phone
+
+HEADERS = {"X-API-KEY": settings.STATIC_API_KEY}
+
+
+def test_ttl_lru_cache_expiry_and_eviction(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    c = TTLLRUCache(max_entries=2, ttl=10)
+
+    c.set("a", b"1")
+    c.set("b", b"2")
+    assert c.get("a") == b"1"  # "a" is now most recently used
+    c.set("c", b"3")
+    assert c.get("b") is None
+    assert c.get("a") == b"1"
+
+    now[0] += 11
+    assert c.get("a") is None
+    assert len(c) == 1
+
+    c.set("p:1", b"x")
+    c.set("q:1", b"y")
+    c.delete_prefix("p:")
+    assert c.get("p:1") is None and c.get("q:1") == b"y"
+    assert c.hits == 3 and c.misses == 3
+
+
+@pytest.mark.asyncio
+async def test_organization_cache_invalidation(client, db_session):
+    b = Building(address="Cached Addr", latitude=0, longitude=0)
+    act = Activity(name="Cached Activity")
+    db_session.add_all([b, act])
+    await db_session.commit()
+    org = Organization(name="Cached Org", building_id=b.id)
+    db_session.add(org)
+    await db_session.commit()
+    org_id, building_id = org.id, b.id
+
+    response = await client.get(f"/organizations/{org_id}", headers=HEADERS)
+    assert response.json()["phones"] == []
+    assert cache_module.cache.get(organization_key(org_id)) is not None
+
+    db_session.add(Phone(number="111", organization_id=org_id))
+    await db_session.commit()
+    assert cache_module.cache.get(organization_key(org_id)) is None
+    # The client shares this session; forget loaded collections like a fresh request would
+    db_session.expire_all()
+    response = await client.get(f"/organizations/{org_id}", headers=HEADERS)
+    assert [p["number"] for p in response.json()["phones"]] == ["111"]
+
+    b = await db_session.get(Building, building_id)
+    b.address = "Renamed Addr"
+    await db_session.commit()
+    assert cache_module.cache.get(organization_key(org_id)) is None
+    response = await client.get(f"/organizations/{org_id}", headers=HEADERS)
+    assert response.json()["building"]["address"] == "Renamed Addr"
+
+    loaded = (await db_session.execute(select(Organization).options(selectinload(Organization.activities)).where(Organization.id == org_id))).scalar_one()
+    loaded.activities.append(act)
+    await db_session.commit()
+    assert cache_module.cache.get(organization_key(org_id)) is None
+    db_session.expire_all()
+    response = await client.get(f"/organizations/{org_id}", headers=HEADERS)
+    assert [a["name"] for a in response.json()["activities"]] == ["Cached Activity"]
+
+    # Bulk statements drop every cached organization
+    await db_session.execute(update(Organization).where(Organization.id == org_id).values(name="Bulk Renamed"))
+    await db_session.commit()
+    assert cache_module.cache.get(organization_key(org_id)) is None
+    db_session.expire_all()
+    response = await client.get(f"/organizations/{org_id}", headers=HEADERS)
+    assert response.json()["name"] == "Bulk Renamed"
@@ -0,0 +1,128 @@
+import pytest
+from sqlalchemy import event, func, select
+from app import crud
+from app.config import settings
+from app.models import Activity
+
+HEADERS = {"X-API-KEY": settings.STATIC_API_KEY}
+
+
+async def make_building(client, address="CRUD Street"):
+    response = await client.post("/buildings", json={"address": address, "latitude": -33.1, "longitude": 151.2}, headers=HEADERS)
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+async def make_activity(client, name, parent_id=None):
+    response = await client.post("/activities", json={"name": name, "parent_id": parent_id}, headers=HEADERS)
+    assert response.status_code == 201, response.json()
+    return response.json()["id"]
+
+
+@pytest.mark.asyncio
+async def test_organization_crud(client):
+    building_id = await make_building(client)
+    other_building_id = await make_building(client, "CRUD Avenue")
+    activity_id = await make_activity(client, "CRUD Activity")
+
+    payload = {"name": "CRUD Org", "building_id": building_id, "activity_ids": [activity_id, activity_id], "phones": ["1-1", "1-2"]}
+    response = await client.post("/organizations", json=payload, headers=HEADERS)
+    assert response.status_code == 201
+    created = response.json()
+    org_id = created["id"]
+    assert [a["id"] for a in created["activities"]] == [activity_id]
+    assert [p["number"] for p in created["phones"]] == ["1-1", "1-2"]
+    etag = (await client.get(f"/organizations/{org_id}", headers=HEADERS)).headers["ETag"]
+
+    payload = {"name": "CRUD Org Renamed", "building_id": other_building_id, "activity_ids": [], "phones": ["2-1"]}
+    response = await client.put(f"/organizations/{org_id}", json=payload, headers=HEADERS)
+    assert response.json()["building"]["address"] == "CRUD Avenue"
+    response = await client.get(f"/organizations/{org_id}", headers=HEADERS)
+    assert response.headers["ETag"] != etag
+    body = response.json()
+    assert (body["name"], body["activities"], [p["number"] for p in body["phones"]]) == ("CRUD Org Renamed", [], ["2-1"])
+
+    response = await client.post("/organizations", json={**payload, "building_id": 999999}, headers=HEADERS)
+    assert (response.status_code, response.json()["detail"]) == (422, "Unknown building_id 999999")
+    assert (await client.put("/organizations/999999", json=payload, headers=HEADERS)).status_code == 404
+    assert (await client.delete(f"/buildings/{other_building_id}", headers=HEADERS)).status_code == 409
+
+    assert (await client.delete(f"/organizations/{org_id}", headers=HEADERS)).status_code == 204
+    assert (await client.get(f"/organizations/{org_id}", headers=HEADERS)).status_code == 404
+    assert (await client.delete(f"/buildings/{other_building_id}", headers=HEADERS)).status_code == 204
+
+
+@pytest.mark.asyncio
+async def test_organization_batch_uses_bulk_statements(client, async_engine):
+    building_id = await make_building(client, "Batch Street")
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    batch = {"create": [{"name": f"Batch Org {i}", "building_id": building_id, "phones": [f"3-{i}"]} for i in range(200)]}
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+    try:
+        response = await client.post("/organizations:batch", json=batch, headers=HEADERS)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+    created = response.json()["created"]
+    assert len(created) == 200
+    assert len(statements) < 10
+    phones = (await client.get(f"/organizations/{created[150]}", headers=HEADERS)).json()["phones"]
+    assert [p["number"] for p in phones] == ["3-150"]
+
+    # One bad item rejects the whole batch, every problem is reported
+    batch = {
+        "create": [{"name": "Batch Good", "building_id": building_id}, {"name": "Batch Bad", "building_id": 999999}],
+        "update": [{"id": 999999, "name": "Missing", "building_id": building_id}],
+        "delete": [created[0], 999998],
+    }
+    response = await client.post("/organizations:batch", json=batch, headers=HEADERS)
+    assert response.status_code == 422
+    assert [(e["operation"], e["index"], e["status_code"]) for e in response.json()["detail"]] == [
+        ("create", 1, 422), ("update", 0, 404), ("delete", 1, 404),
+    ]
+    assert (await client.get(f"/organizations/{created[0]}", headers=HEADERS)).status_code == 200
+
+    response = await client.post("/organizations:batch", json={"update": [{"id": created[1], "name": "Batch Updated", "building_id": building_id}], "delete": created[2:]}, headers=HEADERS)
+    assert response.json() == {"created": [], "updated": [created[1]], "deleted": created[2:]}
+    assert (await client.get(f"/organizations/{created[1]}", headers=HEADERS)).json()["name"] == "Batch Updated"
+    assert (await client.get(f"/organizations/{created[2]}", headers=HEADERS)).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_activity_writes_respect_tree_depth(client, db_session, monkeypatch):
+    root = await make_activity(client, "Depth Root")
+    level2 = await make_activity(client, "Depth L2", root)
+    level3 = await make_activity(client, "Depth L3", level2)
+    other_root = await make_activity(client, "Depth Other")
+    other_child = await make_activity(client, "Depth Other Child", other_root)
+
+    response = await client.post("/activities", json={"name": "Depth L4", "parent_id": level3}, headers=HEADERS)
+    assert (response.status_code, response.json()["detail"]) == (422, crud.DEPTH_EXCEEDED)
+    response = await client.put(f"/activities/{root}", json={"name": "Depth Root", "parent_id": level3}, headers=HEADERS)
+    assert response.json()["detail"] == "An activity cannot be moved under itself or its descendants"
+    # Moving a two-level subtree under a level-2 node would make it four levels deep
+    response = await client.put(f"/activities/{other_root}", json={"name": "Depth Other", "parent_id": level2}, headers=HEADERS)
+    assert response.json()["detail"] == crud.DEPTH_EXCEEDED
+    response = await client.put(f"/activities/{other_child}", json={"name": "Depth Moved", "parent_id": level2}, headers=HEADERS)
+    assert response.json() == {"name": "Depth Moved", "id": other_child, "parent_id": level2}
+    assert (await client.delete(f"/activities/{level2}", headers=HEADERS)).status_code == 409
+
+    # Errors raised by the check_depth_insert trigger map to items too
+    monkeypatch.setattr(crud, "_validate_activities", lambda db, batch: _no_errors())
+    batch = {"create": [{"name": "Trigger OK", "parent_id": root}, {"name": "Trigger L4", "parent_id": level3}]}
+    response = await client.post("/activities:batch", json=batch, headers=HEADERS)
+    assert response.status_code == 422
+    assert [(e["operation"], e["index"], e["detail"]) for e in response.json()["detail"]] == [("create", 1, crud.DEPTH_EXCEEDED)]
+    monkeypatch.undo()
+    assert await db_session.scalar(select(func.count()).where(Activity.name == "Trigger OK")) == 0
+
+    response = await client.post("/activities:batch", json={"delete": [level3, other_child, level2]}, headers=HEADERS)
+    assert response.status_code == 200
+    assert (await client.get(f"/activities/{level2}", headers=HEADERS)).status_code == 404
+
+
+async def _no_errors():
+    return []
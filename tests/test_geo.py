@@ -0,0 +1,65 @@
+import random
+
+import pytest
+from sqlalchemy import select, text
+from app.geo import BoundingBox, PointIndex, bounding_boxes, haversine, haversine_km, within_boxes
+from app.models import Building
+
+
+def test_haversine_known_distance():
+    # Moscow -> Saint Petersburg is roughly 634 km
+    assert haversine(55.7558, 37.6173, 59.9343, 30.3351) == pytest.approx(634, abs=5)
+    assert haversine(10, 20, 10, 20) == 0
+
+
+def test_bounding_box_contains_circle():
+    boxes = bounding_boxes(55.75, 37.61, 10)
+    assert len(boxes) == 1
+    box = boxes[0]
+    # Points exactly radius away along the axes must be inside the box
+    assert box.min_lat < 55.75 - 0.089 and box.max_lat > 55.75 + 0.089
+    assert haversine(55.75, 37.61, 55.75, box.max_lon) >= 10
+
+
+def test_bounding_box_splits_at_antimeridian():
+    boxes = bounding_boxes(0, 179.95, 20)
+    assert len(boxes) == 2
+    assert any(b.max_lon == 180.0 for b in boxes)
+    assert any(b.min_lon == -180.0 and b.max_lon < -179.0 for b in boxes)
+
+
+def test_bounding_box_near_pole_covers_all_longitudes():
+    boxes = bounding_boxes(89.9, 10, 50)
+    assert boxes == [boxes[0]._replace(min_lon=-180.0, max_lon=180.0)]
+
+
+def test_point_index_matches_brute_force():
+    rng = random.Random(7)
+    points = [(i, rng.uniform(-60, 60), rng.uniform(-180, 180)) for i in range(2000)]
+    points += [(2000, 0.0, 179.99), (2001, 0.0, -179.99)]
+    index = PointIndex(*zip(*points))
+
+    for lat, lon, radius in [(10, 20, 800), (0, 179.9, 50), (-30, -100, 2000)]:
+        ids, distances = index.within(lat, lon, radius)
+        expected = {i: haversine(lat, lon, a, b) for i, a, b in points if haversine(lat, lon, a, b) <= radius}
+        assert sorted(ids) == sorted(expected)
+        assert [d for _, d in sorted(zip(ids, distances))] == pytest.approx([expected[i] for i in sorted(expected)])
+    assert {2000, 2001} <= set(index.within(0, 179.9, 50)[0])
+
+    box = BoundingBox(-10, -30, 25, 45)
+    assert sorted(index.in_boxes([box])) == [i for i, a, b in points if -10 <= a <= 25 and -30 <= b <= 45]
+    assert PointIndex([], [], []).within(0, 0, 100) == ([], [])
+
+
+@pytest.mark.asyncio
+async def test_sql_haversine_matches_python(db_session):
+    value = await db_session.scalar(select(haversine_km(55.7558, 37.6173, 59.9343, 30.3351)))
+    assert value == pytest.approx(haversine(55.7558, 37.6173, 59.9343, 30.3351))
+
+
+@pytest.mark.asyncio
+async def test_radius_prefilter_uses_coordinates_index(db_session):
+    stmt = select(Building.id).where(within_boxes(Building.latitude, Building.longitude, bounding_boxes(55.75, 37.61, 5)))
+    compiled = stmt.compile(db_session.bind, compile_kwargs={"literal_binds": True})
+    plan = (await db_session.execute(text(f"EXPLAIN QUERY PLAN {compiled}"))).all()
+    assert any("ix_buildings_lat_lon" in row[-1] for row in plan)
@@ -0,0 +1,133 @@
+import io
+import json
+import sys
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from app import importer
+from app.config import settings
+from app.models import Activity, Building, Organization
+
+HEADERS = {"X-API-KEY": settings.STATIC_API_KEY}
+
+
+async def imported(db_session, prefix):
+    db_session.expire_all()
+    result = await db_session.execute(
+        select(Organization)
+        .options(selectinload(Organization.activities), selectinload(Organization.phones))
+        .where(Organization.name.startswith(prefix))
+        .order_by(Organization.id)
+    )
+    return [
+        (org.name, org.building_id, sorted(a.name for a in org.activities), sorted(p.number for p in org.phones))
+        for org in result.scalars().all()
+    ]
+
+
+@pytest.mark.asyncio
+async def test_csv_import_skips_bad_rows(client, db_session):
+    building = Building(address="Import Street 1", latitude=0, longitude=0)
+    bakery = Activity(name="Import Bakery")
+    dup1, dup2 = Activity(name="Import Dup"), Activity(name="Import Dup")
+    db_session.add_all([building, bakery, dup1, dup2])
+    await db_session.commit()
+    building_id, bakery_id = building.id, bakery.id
+
+    body = (
+        "name,building_id,building_address,activity_ids,activities,phones\r\n"
+        f"CSV Org A,{building_id},,{bakery_id},,111;222\r\n"
+        f'"CSV Org B, ""quoted""",,Import Street 1,,Import Bakery,"333"\r\n'
+        f",{building_id},,,,\r\n"
+        f"CSV Org C,999999,,,,\r\n"
+        f"CSV Org D,,Import Street 1,,Import Dup,\r\n"
+        f"CSV Org E,{building_id}\r\n"
+        f'"CSV Org F\nsecond line",{building_id},,,Import Bakery;Import Bakery,\r\n'
+        f"CSV Org A,{building_id},,,,999\r\n"
+    )
+    response = await client.post(
+        "/organizations/import?batch_size=4", content=body.encode(), headers={**HEADERS, "Content-Type": "text/csv; charset=utf-8"}
+    )
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["rows"], report["imported"], report["failed"]) == (8, 4, 4)
+    assert [(e["row"], e["error"]) for e in report["errors"]] == [
+        (3, "name is required"),
+        (4, "Unknown building_id 999999"),
+        (5, "Ambiguous activity 'Import Dup', use activity_ids"),
+        (6, "Expected 6 fields, got 2"),
+    ]
+    assert report["rows_per_second"] > 0
+
+    # Identical organization rows in one batch keep their own phones and activities
+    assert sorted(await imported(db_session, "CSV Org")) == [
+        ("CSV Org A", building_id, [], ["999"]),
+        ("CSV Org A", building_id, ["Import Bakery"], ["111", "222"]),
+        ('CSV Org B, "quoted"', building_id, ["Import Bakery"], ["333"]),
+        ("CSV Org F\nsecond line", building_id, ["Import Bakery"], []),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_ndjson_import_streamed(client, db_session):
+    building = Building(address="Import Street 2", latitude=0, longitude=0)
+    db_session.add(building)
+    await db_session.commit()
+    building_id = building.id
+
+    lines = [
+        {"name": "NDJSON Org Ü", "building_id": building_id, "phones": ["444"]},
+        {"name": "NDJSON Org 2", "building_address": "Import Street 2", "activity_ids": []},
+        {"name": "NDJSON Org 3", "building_id": building_id, "phones": [5]},
+    ]
+    payload = ("\n".join(json.dumps(line, ensure_ascii=False) for line in lines) + "\n\n{not json\n").encode()
+
+    async def chunks():
+        # Split mid-line and inside a multi-byte character
+        for i in range(0, len(payload), 7):
+            yield payload[i:i + 7]
+
+    response = await client.post("/organizations/import?batch_size=1", content=chunks(), headers={**HEADERS, "Content-Type": "application/x-ndjson"})
+    report = response.json()
+    assert (report["rows"], report["imported"], report["failed"]) == (4, 2, 2)
+    assert [e["row"] for e in report["errors"]] == [3, 4]
+    assert await imported(db_session, "NDJSON Org") == [
+        ("NDJSON Org Ü", building_id, [], ["444"]),
+        ("NDJSON Org 2", building_id, [], []),
+    ]
+
+    response = await client.post("/organizations/import", content=b"{}", headers={**HEADERS, "Content-Type": "application/json"})
+    assert response.status_code == 415
+
+
+@pytest.mark.asyncio
+async def test_reading_stdin_leaves_it_open(monkeypatch, tmp_path):
+    stdin = io.TextIOWrapper(io.BytesIO(b"name\nStdin Org\n"))
+    monkeypatch.setattr(sys, "stdin", stdin)
+    assert [chunk async for chunk in importer._file_chunks("-", size=4)] == [b"name", b"\nStd", b"in O", b"rg\n"]
+    assert not stdin.closed
+
+    path = tmp_path / "orgs.csv"
+    path.write_bytes(b"name\n")
+    assert [chunk async for chunk in importer._file_chunks(str(path))] == [b"name\n"]
+
+
+@pytest.mark.asyncio
+async def test_csv_stray_quote_does_not_swallow_later_rows(client, db_session):
+    building = Building(address="Import Street 3", latitude=0, longitude=0)
+    db_session.add(building)
+    await db_session.commit()
+
+    body = (
+        "name,building_id\n"
+        f"Stray Org A,{building.id}\n"
+        f'Stray "Quote Org,{building.id},extra\n'
+        f'Stray Org B,{building.id}\n'
+        f'"Stray Org ""C""",{building.id}\n'
+        f"Stray Org D,{building.id}\n"
+    )
+    response = await client.post("/organizations/import", content=body.encode(), headers={**HEADERS, "Content-Type": "text/csv"})
+    report = response.json()
+    assert (report["rows"], report["imported"], report["failed"]) == (5, 4, 1)
+    assert [(e["row"], e["error"]) for e in report["errors"]] == [(2, "Expected 2 fields, got 3")]
+    assert [name for name, *_ in await imported(db_session, "Stray")] == ["Stray Org A", "Stray Org B", 'Stray Org "C"', "Stray Org D"]
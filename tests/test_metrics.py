@@ -0,0 +1,72 @@
+import pytest
+
+from app import metrics
+from app.cache import cache
+from app.config import settings
+from app.models import Building, Organization
+
+HEADERS = {"X-API-KEY": settings.STATIC_API_KEY}
+
+
+def sample(text: str, name: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(name + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("test_seconds", "Test", (0.1, 1.0), ("route",))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(("/a",), value)
+    assert histogram.render().splitlines() == [
+        "# HELP test_seconds Test",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{route="/a",le="0.1"} 2',
+        'test_seconds_bucket{route="/a",le="1.0"} 3',
+        'test_seconds_bucket{route="/a",le="+Inf"} 4',
+        'test_seconds_sum{route="/a"} 3.65',
+        'test_seconds_count{route="/a"} 4',
+    ]
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(client, db_session, async_engine):
+    metrics.instrument_engine(async_engine)
+    building = Building(address="Metrics Street 1", latitude=-40.0, longitude=100.0)
+    db_session.add(building)
+    await db_session.commit()
+    org = Organization(name="Metrics Org", building_id=building.id)
+    db_session.add(org)
+    await db_session.commit()
+    cache.delete_prefix("")
+
+    route = 'method="GET",route="/organizations/{org_id}"'
+    before = (await client.get("/metrics")).text
+    assert (await client.get(f"/organizations/{org.id}", headers=HEADERS)).status_code == 200
+    assert (await client.get(f"/organizations/{org.id}", headers=HEADERS)).status_code == 200
+    assert (await client.get("/organizations/1", headers={"X-API-KEY": "wrong"})).status_code == 401
+
+    # Exempt from the API key check, like /health
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    after = response.text
+
+    def delta(name):
+        return sample(after, name) - sample(before, name)
+
+    assert delta(f'http_requests_total{{{route},status="200"}}') == 2
+    assert delta('http_requests_total{method="GET",route="unmatched",status="401"}') == 1
+    assert delta(f"http_request_duration_seconds_count{{{route}}}") == 2
+    assert delta(f"http_response_size_bytes_sum{{{route}}}") > 0
+    # The first request loads the organization and its relationships, the second is a cache hit
+    assert delta(f"http_request_db_queries_sum{{{route}}}") >= 3
+    assert delta(f'http_request_db_queries_bucket{{{route},le="0"}}') == 1
+    assert delta(f"http_request_db_seconds_count{{{route}}}") == 2
+    database = async_engine.url.render_as_string(hide_password=True)
+    assert delta(f'db_queries_total{{database="{database}"}}') >= 3
+    assert f'db_pool_checkout_seconds_count{{database="{database}"}}' in after
+    assert sample(after, "cache_hits_total") >= 1
+    assert 0 < sample(after, "cache_hit_ratio") <= 1
+    assert "# TYPE http_request_duration_seconds histogram" in after
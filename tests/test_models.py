@@ -1,6 +1,6 @@
 import pytest
 from sqlalchemy import select
-from app.models import Organization, Building, Activity, Phone
+from app.models import Organization, Building, Activity, Phone, activity_closure
 from app.schemas import BuildingCreate
 
 @pytest.mark.asyncio
@@ -95,3 +95,64 @@ async def test_organization_phones(db_session):
     result = await db_session.execute(stmt)
     phones = result.scalars().all()
     assert len(phones) == 2
+
+@pytest.mark.asyncio
+async def test_activity_closure_follows_tree_changes(db_session):
+    root = Activity(name="Closure Root")
+    other = Activity(name="Closure Other")
+    db_session.add_all([root, other])
+    await db_session.commit()
+    child = Activity(name="Closure Child", parent_id=root.id)
+    db_session.add(child)
+    await db_session.commit()
+    leaf = Activity(name="Closure Leaf", parent_id=child.id)
+    db_session.add(leaf)
+    await db_session.commit()
+
+    async def subtree(activity_id):
+        stmt = select(activity_closure.c.descendant_id, activity_closure.c.depth).where(activity_closure.c.ancestor_id == activity_id)
+        return set((await db_session.execute(stmt)).all())
+
+    assert await subtree(root.id) == {(root.id, 0), (child.id, 1), (leaf.id, 2)}
+
+    # Moving a subtree re-links all of its nodes
+    child.parent_id = other.id
+    await db_session.commit()
+    assert await subtree(root.id) == {(root.id, 0)}
+    assert await subtree(other.id) == {(other.id, 0), (child.id, 1), (leaf.id, 2)}
+
+    await db_session.delete(leaf)
+    await db_session.commit()
+    assert await subtree(other.id) == {(other.id, 0), (child.id, 1)}
+
+@pytest.mark.asyncio
+async def test_versions_follow_embedded_changes(db_session):
+    building = Building(address="Versioned", latitude=1, longitude=1)
+    activity = Activity(name="Versioned Activity")
+    db_session.add_all([building, activity])
+    await db_session.commit()
+    org = Organization(name="Versioned Org", building_id=building.id, activities=[activity])
+    db_session.add(org)
+    await db_session.commit()
+    assert (org.version, building.version, activity.version) == (1, 1, 1)
+
+    async def org_version():
+        return await db_session.scalar(select(Organization.version).where(Organization.id == org.id))
+
+    org.name = "Versioned Org 2"
+    await db_session.commit()
+    assert org.version == 2
+
+    db_session.add(Phone(number="555", organization_id=org.id))
+    await db_session.commit()
+    assert await org_version() == 3
+
+    building.address = "Versioned 2"
+    await db_session.commit()
+    assert building.version == 2
+    assert await org_version() == 4
+
+    activity.name = "Versioned Activity 2"
+    await db_session.commit()
+    assert activity.version == 2
+    assert await org_version() == 5
@@ -4,6 +4,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.main import app
 from app.models import Organization, Building, Activity, Phone
 from app.config import settings
+from app.pagination import encode_cursor
+from app.routers import organizations as organizations_router
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
 
@@ -26,6 +28,152 @@ async def test_get_organization_by_id(client, db_session):
     assert data["name"] == "Target Org"
     assert data["building"]["address"] == "Test Addr"
 
+@pytest.mark.asyncio
+async def test_get_organization_conditional(client, db_session):
+    from app.cache import cache, organization_key
+
+    b = Building(address="ETag Addr", latitude=0, longitude=0)
+    db_session.add(b)
+    await db_session.commit()
+    org = Organization(name="ETag Org", building_id=b.id)
+    db_session.add(org)
+    await db_session.commit()
+    org_id = org.id
+    headers = {"X-API-KEY": settings.STATIC_API_KEY}
+
+    response = await client.get(f"/organizations/{org_id}", headers=headers)
+    etag = response.headers["ETag"]
+    assert response.status_code == 200
+
+    response = await client.get(f"/organizations/{org_id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    # Without a cached payload the reloaded payload hashes to the same ETag
+    cache.delete(organization_key(org_id))
+    response = await client.get(f"/organizations/{org_id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+
+    db_session.add(Phone(number="8-000", organization_id=org_id))
+    await db_session.commit()
+    db_session.expire_all()
+    response = await client.get(f"/organizations/{org_id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+    response = await client.get("/organizations/999999", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 404
+
+@pytest.mark.asyncio
+async def test_recreated_organization_gets_a_new_etag(client, db_session):
+    headers = {"X-API-KEY": settings.STATIC_API_KEY}
+    b = Building(address="ETag Reuse Addr", latitude=0, longitude=0)
+    db_session.add(b)
+    await db_session.commit()
+    payload = {"name": "ETag Reuse Old", "building_id": b.id, "activity_ids": [], "phones": []}
+    org_id = (await client.post("/organizations", json=payload, headers=headers)).json()["id"]
+    etag = (await client.get(f"/organizations/{org_id}", headers=headers)).headers["ETag"]
+
+    # Deleting the max id must not hand it out again with the same version
+    assert (await client.delete(f"/organizations/{org_id}", headers=headers)).status_code == 204
+    new = await client.post("/organizations", json={**payload, "name": "ETag Reuse New"}, headers=headers)
+    assert new.json()["id"] != org_id
+    assert (await client.get(f"/organizations/{org_id}", headers={**headers, "If-None-Match": etag})).status_code == 404
+    response = await client.get(f"/organizations/{new.json()['id']}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["name"] == "ETag Reuse New"
+
+@pytest.mark.asyncio
+async def test_list_etags_change_when_the_newest_row_is_recreated(client, db_session):
+    headers = {"X-API-KEY": settings.STATIC_API_KEY}
+    b = Building(address="List Reuse Addr", latitude=0, longitude=0)
+    db_session.add(b)
+    await db_session.commit()
+    payload = {"name": "List Reuse Old", "building_id": b.id, "activity_ids": [], "phones": []}
+    org_id = (await client.post("/organizations", json=payload, headers=headers)).json()["id"]
+    orgs_etag = (await client.get(f"/organizations/building/{b.id}", headers=headers)).headers["ETag"]
+    assert (await client.delete(f"/organizations/{org_id}", headers=headers)).status_code == 204
+    assert (await client.post("/organizations", json={**payload, "name": "List Reuse New"}, headers=headers)).status_code == 201
+    response = await client.get(f"/organizations/building/{b.id}", headers={**headers, "If-None-Match": orgs_etag})
+    assert response.status_code == 200
+    assert [o["name"] for o in response.json()] == ["List Reuse New"]
+
+    building = {"address": "List Reuse Old Building", "latitude": 1, "longitude": 1}
+    building_id = (await client.post("/buildings", json=building, headers=headers)).json()["id"]
+    list_etag = (await client.get("/organizations/buildings/list", headers=headers)).headers["ETag"]
+    assert (await client.delete(f"/buildings/{building_id}", headers=headers)).status_code == 204
+    assert (await client.post("/buildings", json={**building, "address": "List Reuse New Building"}, headers=headers)).status_code == 201
+    response = await client.get("/organizations/buildings/list", headers={**headers, "If-None-Match": list_etag})
+    assert response.status_code == 200
+
+@pytest.mark.asyncio
+async def test_get_organizations_by_ids(client, db_session):
+    from app.cache import cache, organization_key
+
+    b = Building(address="Batch Get Addr", latitude=0, longitude=0)
+    db_session.add(b)
+    await db_session.commit()
+    orgs = [Organization(name=f"Batch Get {i}", building_id=b.id) for i in range(3)]
+    db_session.add_all(orgs)
+    await db_session.commit()
+    first, second, third = [org.id for org in orgs]
+    headers = {"X-API-KEY": settings.STATIC_API_KEY}
+
+    # One cached, two loaded together; input order kept, duplicates and missing ids handled
+    await client.get(f"/organizations/{second}", headers=headers)
+    cache.delete(organization_key(first), organization_key(third))
+    response = await client.get(f"/organizations?ids={third},987654,{first},{second},{third}", headers=headers)
+    assert response.status_code == 200
+    assert [org["id"] for org in response.json()] == [third, first, second]
+    assert response.json()[0]["name"] == "Batch Get 2"
+    assert response.headers["X-Missing-Ids"] == "987654"
+    assert cache.get(organization_key(first)) is not None
+
+    # Entries are shared with the single-organization endpoint
+    single = await client.get(f"/organizations/{first}", headers=headers)
+    assert single.json() == response.json()[1]
+
+    etag = response.headers["ETag"]
+    response = await client.get(f"/organizations?ids={third},987654,{first},{second}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+
+    db_session.add(Phone(number="8-batch", organization_id=second))
+    await db_session.commit()
+    db_session.expire_all()
+    response = await client.get(f"/organizations?ids={third},987654,{first},{second}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()[2]["phones"][0]["number"] == "8-batch"
+
+    for bad in ("1,x", ",", ",".join(map(str, range(501))), f"1,{10**30}", str(-2**63 - 1)):
+        assert (await client.get(f"/organizations?ids={bad}", headers=headers)).status_code == 422
+
+@pytest.mark.asyncio
+async def test_list_endpoints_conditional(client, db_session):
+    b = Building(address="ETag List", latitude=0, longitude=0)
+    db_session.add(b)
+    await db_session.commit()
+    building_id = b.id
+    db_session.add(Organization(name="ETag List Org", building_id=building_id))
+    await db_session.commit()
+    headers = {"X-API-KEY": settings.STATIC_API_KEY}
+
+    for path in (f"/organizations/building/{building_id}", "/organizations/buildings/list"):
+        response = await client.get(path, headers=headers)
+        etag = response.headers["ETag"]
+        response = await client.get(path, headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 304
+        # Another page is another representation
+        response = await client.get(path, params={"limit": 1}, headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 200
+
+    response = await client.get(f"/organizations/building/{building_id}", headers=headers)
+    etag = response.headers["ETag"]
+    db_session.add(Organization(name="ETag List Org 2", building_id=building_id))
+    await db_session.commit()
+    response = await client.get(f"/organizations/building/{building_id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
 @pytest.mark.asyncio
 async def test_get_organization_not_found(client):
     response = await client.get("/organizations/9999", headers={"X-API-KEY": settings.STATIC_API_KEY})
@@ -54,6 +202,59 @@ async def test_search_organization_by_name(client, db_session):
     assert "Alpha & Omega" in names
     assert "Beta Ltd" not in names
 
+@pytest.mark.asyncio
+async def test_name_search_ranking_and_typos(client, db_session):
+    b = Building(address="Search Addr", latitude=0, longitude=0)
+    db_session.add(b)
+    await db_session.commit()
+
+    db_session.add_all([
+        Organization(name="Grand Zephyrine Hall", building_id=b.id),
+        Organization(name="Zephyrine Bakery", building_id=b.id),
+        Organization(name="Quokka Logistics", building_id=b.id),
+    ])
+    await db_session.commit()
+    headers = {"X-API-KEY": settings.STATIC_API_KEY}
+
+    # Case-insensitive substring, prefix matches ranked first
+    response = await client.get("/organizations/search/name", params={"q": "zephyr"}, headers=headers)
+    assert response.status_code == 200
+    assert [o["name"] for o in response.json()] == ["Zephyrine Bakery", "Grand Zephyrine Hall"]
+
+    # Misspelling falls back to similar names
+    response = await client.get("/organizations/search/name", params={"q": "Quoka Logistic"}, headers=headers)
+    assert response.status_code == 200
+    assert [o["name"] for o in response.json()] == ["Quokka Logistics"]
+
+    response = await client.get("/organizations/search/name", params={"q": "Xylophonium"}, headers=headers)
+    assert response.json() == []
+
+    # Too short for trigrams, still a substring match
+    response = await client.get("/organizations/search/name", params={"q": "ok"}, headers=headers)
+    assert "Quokka Logistics" in [o["name"] for o in response.json()]
+
+    # Wildcards in the query are literal
+    response = await client.get("/organizations/search/name", params={"q": "%"}, headers=headers)
+    assert response.json() == []
+
+@pytest.mark.asyncio
+async def test_name_search_index_follows_renames(client, db_session):
+    b = Building(address="Rename Addr", latitude=0, longitude=0)
+    db_session.add(b)
+    await db_session.commit()
+    org = Organization(name="Obsolete Marmalade", building_id=b.id)
+    db_session.add(org)
+    await db_session.commit()
+
+    org.name = "Fresh Marmalade"
+    await db_session.commit()
+
+    headers = {"X-API-KEY": settings.STATIC_API_KEY}
+    response = await client.get("/organizations/search/name", params={"q": "Marmalade"}, headers=headers)
+    assert [o["name"] for o in response.json()] == ["Fresh Marmalade"]
+    response = await client.get("/organizations/search/name", params={"q": "Obsolete"}, headers=headers)
+    assert response.json() == []
+
 @pytest.mark.asyncio
 async def test_get_organizations_by_building_id(client, db_session):
     b1 = Building(address="B1", latitude=0, longitude=0)
@@ -209,6 +410,306 @@ async def test_geo_search(client, db_session):
     assert "Org2" in names
     assert "Org3" not in names
 
+@pytest.mark.asyncio
+async def test_radius_search_across_antimeridian(client, db_session):
+    west = Building(address="Date Line West", latitude=-16.5, longitude=179.99)
+    east = Building(address="Date Line East", latitude=-16.5, longitude=-179.99)
+    db_session.add_all([west, east])
+    await db_session.commit()
+
+    db_session.add_all([
+        Organization(name="West Side", building_id=west.id),
+        Organization(name="East Side", building_id=east.id),
+    ])
+    await db_session.commit()
+
+    # ~2km apart across the 180th meridian
+    response = await client.get("/organizations/building/radius", params={"lat": -16.5, "lon": 179.99, "radius_km": 5}, headers={"X-API-KEY": settings.STATIC_API_KEY})
+    assert response.status_code == 200
+    names = [o["name"] for o in response.json()]
+    assert "West Side" in names
+    assert "East Side" in names
+
+@pytest.mark.asyncio
+async def test_radius_must_be_positive(client):
+    response = await client.get("/organizations/building/radius", params={"lat": 0, "lon": 0, "radius_km": -1}, headers={"X-API-KEY": settings.STATIC_API_KEY})
+    assert response.status_code == 422
+
+@pytest.mark.asyncio
+async def test_radius_point_must_be_on_the_globe(client):
+    for lat, lon in [(91, 0), (-90.5, 0), (0, 180.5), (0, -181)]:
+        response = await client.get("/organizations/building/radius", params={"lat": lat, "lon": lon, "radius_km": 1}, headers={"X-API-KEY": settings.STATIC_API_KEY})
+        assert response.status_code == 422, (lat, lon)
+
+@pytest.mark.asyncio
+async def test_nearest_organizations(client, db_session):
+    # Remote spot so rows from other tests don't interfere
+    near = Building(address="Near", latitude=70.0, longitude=-150.0)
+    mid = Building(address="Mid", latitude=70.0, longitude=-149.9)
+    far = Building(address="Far", latitude=70.5, longitude=-150.0)
+    db_session.add_all([near, mid, far])
+    await db_session.commit()
+
+    tagged = Activity(name="Knn Tagged")
+    db_session.add(tagged)
+    await db_session.commit()
+    tagged_child = Activity(name="Knn Tagged Child", parent_id=tagged.id)
+    db_session.add(tagged_child)
+    await db_session.commit()
+
+    db_session.add_all([
+        Organization(name="Knn Near", building_id=near.id),
+        Organization(name="Knn Mid", building_id=mid.id, activities=[tagged_child]),
+        Organization(name="Knn Far", building_id=far.id, activities=[tagged]),
+    ])
+    await db_session.commit()
+
+    headers = {"X-API-KEY": settings.STATIC_API_KEY}
+    response = await client.get("/organizations/building/nearest", params={"lat": 70.0, "lon": -150.0, "k": 2}, headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert [o["name"] for o in data] == ["Knn Near", "Knn Mid"]
+    assert data[0]["distance_km"] == pytest.approx(0, abs=1e-6)
+    assert data[1]["distance_km"] == pytest.approx(3.8, abs=0.1)
+    assert data[1]["building"]["address"] == "Mid"
+
+    # Activity filter covers the subtree and still widens the ring until k are found
+    response = await client.get("/organizations/building/nearest", params={"lat": 70.0, "lon": -150.0, "k": 2, "activity_id": tagged.id}, headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert [o["name"] for o in data] == ["Knn Mid", "Knn Far"]
+    assert data[1]["distance_km"] == pytest.approx(55.6, abs=0.5)
+
+@pytest.mark.asyncio
+async def test_distances_follow_their_organization(client, db_session, monkeypatch):
+    near = Building(address="Knn Gone Near", latitude=71.0, longitude=-140.0)
+    far = Building(address="Knn Gone Far", latitude=71.5, longitude=-140.0)
+    db_session.add_all([near, far])
+    await db_session.commit()
+    db_session.add_all([Organization(name="Knn Gone", building_id=near.id), Organization(name="Knn Kept", building_id=far.id)])
+    await db_session.commit()
+
+    # The nearest organization is deleted between the distance query and the row fetch
+    fetch = organizations_router.fetch_organization_rows
+    monkeypatch.setattr(organizations_router, "fetch_organization_rows", lambda db, ids, fields: fetch(db, ids[1:], fields=fields))
+    headers = {"X-API-KEY": settings.STATIC_API_KEY}
+    for fields in ("id,name", "name"):
+        response = await client.get("/organizations/building/nearest", params={"lat": 71.0, "lon": -140.0, "k": 2, "fields": fields}, headers=headers)
+        assert [(o["name"], "id" in o) for o in response.json()] == [("Knn Kept", fields == "id,name")]
+        assert response.json()[0]["distance_km"] == pytest.approx(55.6, abs=0.5)
+        response = await client.get("/organizations/search", params={"q": "Knn", "lat": 71.0, "lon": -140.0, "radius_km": 100, "sort": "distance", "fields": fields}, headers=headers)
+        assert [o["name"] for o in response.json()] == ["Knn Kept"]
+        assert response.json()[0]["distance_km"] == pytest.approx(55.6, abs=0.5)
+
+@pytest.mark.asyncio
+async def test_compound_search(client, db_session):
+    # Remote spot so rows from other tests don't interfere
+    here = Building(address="Compound Here", latitude=-40.0, longitude=60.0)
+    east = Building(address="Compound East", latitude=-40.0, longitude=60.1)
+    south = Building(address="Compound South", latitude=-40.5, longitude=60.0)
+    db_session.add_all([here, east, south])
+    parent = Activity(name="Compound Parent")
+    db_session.add(parent)
+    await db_session.commit()
+    child = Activity(name="Compound Child", parent_id=parent.id)
+    db_session.add(child)
+    await db_session.commit()
+    db_session.add_all([
+        Organization(name="Compound Bakery", building_id=here.id, activities=[child]),
+        Organization(name="Compound Books", building_id=east.id, activities=[parent]),
+        Organization(name="Compound Bar", building_id=south.id),
+        Organization(name="Elsewhere Bakery", building_id=here.id, activities=[child]),
+    ])
+    await db_session.commit()
+    headers = {"X-API-KEY": settings.STATIC_API_KEY}
+
+    async def search(**params):
+        response = await client.get("/organizations/search", params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        return response
+
+    # Name, activity subtree and radius together, nearest first
+    response = await search(q="compound", activity_id=parent.id, lat=-40.0, lon=60.0, radius_km=20, sort="distance")
+    data = response.json()
+    assert [o["name"] for o in data] == ["Compound Bakery", "Compound Books"]
+    assert data[0]["distance_km"] == pytest.approx(0, abs=1e-6)
+    assert data[1]["distance_km"] == pytest.approx(8.5, abs=0.1)
+    assert response.headers["X-Search-Plan"] == "activity"
+
+    # Bounding box and name, by name, one per page
+    names, cursor = [], None
+    while True:
+        params = {"q": "Compound", "min_lat": -41, "min_lon": 59, "max_lat": -39, "max_lon": 61, "limit": 1}
+        response = await search(**params, **({"cursor": cursor} if cursor else {}))
+        names += [o["name"] for o in response.json()]
+        assert "distance_km" not in response.json()[0]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert names == ["Compound Bakery", "Compound Bar", "Compound Books"]
+
+    # Too short for the trigram index, so the building drives
+    response = await search(q="ry", building_id=here.id)
+    assert [o["name"] for o in response.json()] == ["Compound Bakery", "Elsewhere Bakery"]
+    assert response.headers["X-Search-Plan"] == "building"
+
+    response = await search(limit=1)
+    assert response.headers["X-Search-Plan"] == "order"
+
+    for params in ({"sort": "distance"}, {"min_lat": 1}, {"lat": 1}, {"lat": 1, "lon": 1, "sort": "rating"}):
+        response = await client.get("/organizations/search", params=params, headers=headers)
+        assert response.status_code == 422
+
+@pytest.mark.asyncio
+async def test_sparse_fieldsets(client, db_session, async_engine):
+    from sqlalchemy import event
+
+    b = Building(address="Sparse Addr", latitude=-20.0, longitude=-20.0)
+    act = Activity(name="Sparse Activity")
+    db_session.add_all([b, act])
+    await db_session.commit()
+    org = Organization(name="Sparse Org", building_id=b.id, activities=[act])
+    db_session.add(org)
+    await db_session.commit()
+    db_session.add(Phone(number="8-sparse", organization_id=org.id))
+    await db_session.commit()
+    org_id, building_id = org.id, b.id
+    headers = {"X-API-KEY": settings.STATIC_API_KEY}
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+    try:
+        full = await client.get(f"/organizations/building/{building_id}", headers=headers)
+        full_statements = len(statements)
+        statements.clear()
+        sparse = await client.get(f"/organizations/building/{building_id}", params={"fields": "name, id"}, headers=headers)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+    assert sparse.json() == [{"id": org_id, "name": "Sparse Org"}]
+    # Building, activities and phones are not queried
+    assert len(statements) == full_statements - 3
+    assert sparse.headers["ETag"] != full.headers["ETag"]
+
+    response = await client.get("/organizations/building/nearest", params={"lat": -20.0, "lon": -20.0, "k": 1, "fields": "phones"}, headers=headers)
+    assert response.json() == [{"phones": [{"number": "8-sparse", "id": response.json()[0]["phones"][0]["id"], "organization_id": org_id}], "distance_km": 0.0}]
+
+    response = await client.get(
+        "/organizations/building/bbox", params={"min_lat": -21, "min_lon": -21, "max_lat": -19, "max_lon": -19, "fields": "id,activities"},
+        headers={**headers, "Accept": "application/x-ndjson"},
+    )
+    assert response.text == f'{{"id":{org_id},"activities":[{{"name":"Sparse Activity","id":{act.id},"parent_id":null}}]}}\n'
+
+    for fields in ("id,rating", ","):
+        response = await client.get(f"/organizations/building/{building_id}", params={"fields": fields}, headers=headers)
+        assert response.status_code == 422
+
+@pytest.mark.asyncio
+async def test_nearest_returns_fewer_when_directory_is_small(client, db_session):
+    b = Building(address="Lonely", latitude=-60.0, longitude=100.0)
+    db_session.add(b)
+    await db_session.commit()
+    db_session.add(Organization(name="Lonely Org", building_id=b.id))
+    await db_session.commit()
+
+    response = await client.get("/organizations/building/nearest", params={"lat": -60.0, "lon": 100.0, "k": 100}, headers={"X-API-KEY": settings.STATIC_API_KEY})
+    assert response.status_code == 200
+    data = response.json()
+    assert data[0]["name"] == "Lonely Org"
+    distances = [o["distance_km"] for o in data]
+    assert distances == sorted(distances)
+
+@pytest.mark.asyncio
+async def test_keyset_pagination_walks_all_pages(client, db_session):
+    b = Building(address="Paged", latitude=0, longitude=0)
+    db_session.add(b)
+    await db_session.commit()
+    db_session.add_all([Organization(name=f"Paged Org {i}", building_id=b.id) for i in range(5)])
+    await db_session.commit()
+
+    headers = {"X-API-KEY": settings.STATIC_API_KEY}
+    names, cursor, pages = [], None, 0
+    while True:
+        params = {"q": "Paged Org", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = await client.get("/organizations/search/name", params=params, headers=headers)
+        assert response.status_code == 200
+        names += [o["name"] for o in response.json()]
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert pages == 3
+    assert names == [f"Paged Org {i}" for i in range(5)]
+
+    # Building listing pages by id
+    response = await client.get(f"/organizations/building/{b.id}", params={"limit": 4}, headers=headers)
+    assert len(response.json()) == 4
+    response = await client.get(f"/organizations/building/{b.id}", params={"limit": 4, "cursor": response.headers["X-Next-Cursor"]}, headers=headers)
+    assert [o["name"] for o in response.json()] == ["Paged Org 4"]
+    assert "X-Next-Cursor" not in response.headers
+
+@pytest.mark.asyncio
+async def test_pagination_rejects_bad_input(client):
+    headers = {"X-API-KEY": settings.STATIC_API_KEY}
+    response = await client.get("/organizations/buildings/list", params={"cursor": "not-a-cursor"}, headers=headers)
+    assert response.status_code == 400
+    response = await client.get("/organizations/buildings/list", params={"limit": 100000}, headers=headers)
+    assert response.status_code == 422
+    # Right length, wrong element types
+    crafted = [
+        ("/organizations/buildings/list", {}, ["x"]),
+        ("/organizations/search/name", {"q": "org"}, ["x", {}, 1]),
+        ("/organizations/search/name", {"q": "org"}, [0, 3, 1.5]),
+        ("/organizations/search/name", {"q": "o"}, [1, 2]),
+        ("/organizations/search", {"lat": 0, "lon": 0, "sort": "distance"}, ["Org", 1]),
+        ("/organizations/search", {"q": "org"}, [True, None]),
+        ("/organizations/buildings/list", {}, [10**30]),
+        ("/organizations/building/1", {}, [-(10**30)]),
+        ("/organizations/building/bbox", {"min_lat": 0, "min_lon": 0, "max_lat": 1, "max_lon": 1}, [2**63]),
+        ("/organizations/search", {"lat": 0, "lon": 0, "sort": "distance"}, [10**400, 1]),
+    ]
+    for url, params, values in crafted:
+        response = await client.get(url, params={**params, "cursor": encode_cursor(values)}, headers=headers)
+        assert response.status_code == 400, (url, values)
+
+@pytest.mark.asyncio
+async def test_ndjson_streaming(client, db_session, monkeypatch):
+    import json
+    from app import serialization
+    monkeypatch.setattr(serialization, "STREAM_CHUNK_SIZE", 2)
+
+    b = Building(address="Stream", latitude=-45.0, longitude=-120.0)
+    db_session.add(b)
+    await db_session.commit()
+    orgs = [Organization(name=f"Streamed {i}", building_id=b.id) for i in range(5)]
+    db_session.add_all(orgs)
+    await db_session.commit()
+    ids = [org.id for org in orgs]
+
+    headers = {"X-API-KEY": settings.STATIC_API_KEY, "Accept": "application/x-ndjson"}
+    params = {"min_lat": -45.5, "min_lon": -120.5, "max_lat": -44.5, "max_lon": -119.5, "limit": 1}
+    response = await client.get("/organizations/building/bbox", params=params, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    # The page size does not apply to streams
+    assert [o["id"] for o in lines] == ids
+    assert lines[0]["building"]["address"] == "Stream"
+
+    # A cursor resumes the stream
+    page = await client.get("/organizations/building/bbox", params=params, headers={"X-API-KEY": settings.STATIC_API_KEY})
+    response = await client.get("/organizations/building/bbox", params={**params, "cursor": page.headers["X-Next-Cursor"]}, headers=headers)
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == ids[1:]
+
+    response = await client.get("/organizations/building/radius", params={"lat": -45.0, "lon": -120.0, "radius_km": 1}, headers=headers)
+    assert len(response.text.splitlines()) == 5
+
 @pytest.mark.asyncio
 async def test_get_buildings_list(client: AsyncClient, db_session: AsyncSession):
     # Ensure buildings exist
@@ -0,0 +1,235 @@
+import asyncio
+import time
+import pytest
+import pytest_asyncio
+from fastapi import Response
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from app import cache as cache_module
+from app import replicas as replicas_module
+from app import serialization as serialization_module
+from app.cache import invalidate_organizations, organization_key, read_through
+from app.config import settings
+from app.database import Base, RESPONSE_INFO_KEY, make_engine
+from app.models import Building, Organization
+from app.replicas import CONSISTENCY_HEADER, LEAST_LOADED, READ_PRIMARY_COOKIE, ReplicaSet
+
+HEADERS = {"X-API-KEY": settings.STATIC_API_KEY}
+REPLICA_BUILDING_ID = 987654
+
+
+async def create_replica(path) -> str:
+    url = f"sqlite+aiosqlite:///{path}"
+    engine = make_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Building), [{"id": REPLICA_BUILDING_ID, "address": "Replica Addr", "latitude": 0, "longitude": 0}])
+        await conn.execute(insert(Organization), [{"name": "Replica Org", "building_id": REPLICA_BUILDING_ID}])
+    await engine.dispose()
+    return url
+
+
+@pytest_asyncio.fixture
+async def replica_urls(tmp_path):
+    return [await create_replica(tmp_path / "replica1.db"), await create_replica(tmp_path / "replica2.db")]
+
+
+@pytest.mark.asyncio
+async def test_replica_selection_and_health(replica_urls, tmp_path):
+    down = f"sqlite+aiosqlite:///{tmp_path / 'missing' / 'replica.db'}"
+
+    round_robin = ReplicaSet(replica_urls)
+    assert [(await round_robin.choose()).url for _ in range(4)] == replica_urls * 2
+
+    least_loaded = ReplicaSet(replica_urls, strategy=LEAST_LOADED)
+    least_loaded.replicas[0].in_flight = 3
+    assert {(await least_loaded.choose()).url for _ in range(4)} == {replica_urls[1]}
+
+    with_down = ReplicaSet([down, replica_urls[0]])
+    assert [(await with_down.choose()).url for _ in range(3)] == [replica_urls[0]] * 3
+    assert with_down.replicas[0].healthy is False
+
+    assert await ReplicaSet([down]).choose() is None
+    for replica_set in (round_robin, least_loaded, with_down):
+        await replica_set.dispose()
+
+
+@pytest.mark.asyncio
+async def test_health_check_times_out_while_connecting(replica_urls, monkeypatch):
+    class UnreachableEngine:
+        # connect() hangs like a TCP connect to a dead host
+        def connect(self):
+            return self
+
+        async def __aenter__(self):
+            await asyncio.sleep(60)
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def dispose(self):
+            pass
+
+    monkeypatch.setattr(replicas_module, "HEALTH_CHECK_TIMEOUT_SECONDS", 0.05)
+    replica_set = ReplicaSet(replica_urls[:1])
+    replica_set.replicas[0].engine = UnreachableEngine()
+    started = time.monotonic()
+    assert await replica_set.choose() is None
+    assert time.monotonic() - started < 1
+    assert replica_set.replicas[0].healthy is False
+    await replica_set.dispose()
+
+
+@pytest.mark.asyncio
+async def test_streamed_reads_keep_their_replica_accounted(client, replica_urls, monkeypatch):
+    replica_set = ReplicaSet(replica_urls[:1])
+    replica = replica_set.replicas[0]
+    monkeypatch.setattr(replicas_module, "replicas", replica_set)
+    fetch = serialization_module.fetch_organization_rows
+    in_flight = []
+
+    async def counting_fetch(db, ids, fields):
+        in_flight.append(replica.in_flight)
+        return await fetch(db, ids, fields=fields)
+
+    monkeypatch.setattr(serialization_module, "fetch_organization_rows", counting_fetch)
+    params = {"lat": 0, "lon": 0, "radius_km": 1, "fields": "name"}
+    ndjson = {**HEADERS, "Accept": "application/x-ndjson"}
+    response = await client.get("/organizations/building/radius", params=params, headers=ndjson)
+    assert response.text == '{"name":"Replica Org"}\n'
+    # Still counted while the body was being sent, released once it was done
+    assert in_flight == [1] and replica.in_flight == 0
+
+    async def failing_fetch(db, ids, fields):
+        raise OperationalError("SELECT", {}, Exception("replica went away"))
+
+    monkeypatch.setattr(serialization_module, "fetch_organization_rows", failing_fetch)
+    # Raised mid-stream, so it surfaces wrapped by the server's task group
+    with pytest.raises(Exception):
+        await client.get("/organizations/building/radius", params=params, headers=ndjson)
+    assert replica.healthy is False and replica.in_flight == 0
+    await replica_set.dispose()
+
+
+@pytest.mark.asyncio
+async def test_reads_routed_to_replica(client, replica_urls, tmp_path, monkeypatch):
+    replica_set = ReplicaSet(replica_urls)
+    monkeypatch.setattr(replicas_module, "replicas", replica_set)
+    path = f"/organizations/building/{REPLICA_BUILDING_ID}"
+
+    response = await client.get(path, headers=HEADERS)
+    assert [org["name"] for org in response.json()] == ["Replica Org"]
+
+    # Read-your-writes: the primary (the test database) does not have the replica's rows
+    response = await client.get(path, headers={**HEADERS, CONSISTENCY_HEADER: "primary"})
+    assert response.json() == []
+    client.cookies.set(READ_PRIMARY_COOKIE, str(time.time() + 60))
+    response = await client.get(path, headers=HEADERS)
+    assert response.json() == []
+    client.cookies.clear()
+
+    # No healthy replica: served by the primary
+    monkeypatch.setattr(replicas_module, "replicas", ReplicaSet([f"sqlite+aiosqlite:///{tmp_path / 'missing' / 'r.db'}"]))
+    response = await client.get(path, headers=HEADERS)
+    assert response.status_code == 200 and response.json() == []
+    await replica_set.dispose()
+
+
+@pytest.mark.asyncio
+async def test_write_sets_read_primary_cookie(db_session, replica_urls, monkeypatch):
+    replica_set = ReplicaSet(replica_urls[:1])
+    monkeypatch.setattr(replicas_module, "replicas", replica_set)
+    response = Response()
+    db_session.info[RESPONSE_INFO_KEY] = response
+    try:
+        await db_session.commit()
+        assert "set-cookie" not in response.headers
+
+        db_session.add(Building(address="RYW Addr", latitude=0, longitude=0))
+        await db_session.commit()
+        assert response.headers["set-cookie"].startswith(f"{READ_PRIMARY_COOKIE}=")
+    finally:
+        db_session.info.pop(RESPONSE_INFO_KEY)
+        await replica_set.dispose()
+
+
+@pytest.mark.asyncio
+async def test_replica_loads_do_not_refill_invalidated_entries():
+    key = organization_key(555001)
+
+    async def load():
+        return b"stale"
+
+    invalidate_organizations([555001])
+    assert await read_through(key, load, from_replica=True) == b"stale"
+    assert cache_module.cache.get(key) is None
+    await read_through(key, load)
+    assert cache_module.cache.get(key) == b"stale"
+    cache_module.cache.delete(key)
+
+
+@pytest_asyncio.fixture
+async def writing_client(client, db_session, replica_urls, monkeypatch):
+    """Client whose session gets the request's response, as get_db does, with a replica configured."""
+    from app.database import get_db
+    from app.main import app
+
+    async def override_get_db(response: Response):
+        db_session.info[RESPONSE_INFO_KEY] = response
+        yield db_session
+        db_session.info.pop(RESPONSE_INFO_KEY, None)
+
+    replica_set = ReplicaSet(replica_urls[:1])
+    monkeypatch.setattr(replicas_module, "replicas", replica_set)
+    app.dependency_overrides[get_db] = override_get_db
+    yield client
+    await replica_set.dispose()
+
+
+async def _create_building(client):
+    response = await client.post("/buildings", json={"address": "Cookie Street 1", "latitude": -43.0, "longitude": 103.0}, headers=HEADERS)
+    return response.json()["id"]
+
+
+async def _create_organization(client):
+    payload = {"name": "Cookie Org", "building_id": await _create_building(client), "activity_ids": [], "phones": []}
+    response = await client.post("/organizations", json=payload, headers=HEADERS)
+    return payload, response.json()["id"]
+
+
+async def _post_organization(client):
+    payload, _ = await _create_organization(client)
+    return await client.post("/organizations", json=payload, headers=HEADERS)
+
+
+async def _put_organization(client):
+    payload, org_id = await _create_organization(client)
+    return await client.put(f"/organizations/{org_id}", json={**payload, "name": "Cookie Org Renamed"}, headers=HEADERS)
+
+
+async def _delete_organization(client):
+    _, org_id = await _create_organization(client)
+    return await client.delete(f"/organizations/{org_id}", headers=HEADERS)
+
+
+async def _delete_building(client):
+    return await client.delete(f"/buildings/{await _create_building(client)}", headers=HEADERS)
+
+
+async def _delete_activity(client):
+    activity_id = (await client.post("/activities", json={"name": "Cookie Activity"}, headers=HEADERS)).json()["id"]
+    return await client.delete(f"/activities/{activity_id}", headers=HEADERS)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("write, status", [
+    (_post_organization, 201),
+    (_put_organization, 200),
+    (_delete_organization, 204),
+    (_delete_building, 204),
+    (_delete_activity, 204),
+])
+async def test_write_routes_keep_read_primary_cookie(writing_client, write, status):
+    response = await write(writing_client)
+    assert response.status_code == status
+    assert response.headers["set-cookie"].startswith(f"{READ_PRIMARY_COOKIE}=")
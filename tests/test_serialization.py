@@ -0,0 +1,42 @@
+import pytest
+from typing import List
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from app.models import Organization, Building, Activity, Phone
+from app.schemas import Organization as OrganizationSchema, Building as BuildingSchema
+from app.serialization import building_row, buildings_adapter, fetch_organization_rows, organizations_adapter
+
+
+@pytest.mark.asyncio
+async def test_row_serialization_matches_schema_output(db_session):
+    b = Building(address="Serialized", latitude=12.5, longitude=-3.25)
+    parent = Activity(name="Serialized Parent")
+    db_session.add_all([b, parent])
+    await db_session.commit()
+    child = Activity(name="Serialized Child", parent_id=parent.id)
+    db_session.add(child)
+    await db_session.commit()
+
+    with_all = Organization(name="Serialized Full", building_id=b.id, activities=[child])
+    bare = Organization(name="Serialized Bare", building_id=b.id)
+    db_session.add_all([with_all, bare])
+    await db_session.commit()
+    db_session.add_all([Phone(number="1", organization_id=with_all.id), Phone(number="2", organization_id=with_all.id)])
+    await db_session.commit()
+    ids = [bare.id, with_all.id]
+    db_session.expire_all()
+
+    orgs = (await db_session.execute(
+        select(Organization)
+        .options(selectinload(Organization.building), selectinload(Organization.activities), selectinload(Organization.phones))
+        .where(Organization.id.in_(ids))
+    )).scalars().all()
+    by_id = {org.id: org for org in orgs}
+    expected = TypeAdapter(List[OrganizationSchema]).dump_json([OrganizationSchema.model_validate(by_id[i]) for i in ids])
+
+    rows = await fetch_organization_rows(db_session, ids + [987654])
+    assert organizations_adapter.dump_json(rows) == expected
+
+    expected = TypeAdapter(List[BuildingSchema]).dump_json([BuildingSchema.model_validate(by_id[ids[0]].building)])
+    assert buildings_adapter.dump_json([building_row(by_id[ids[0]].building)]) == expected
@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from app import singleflight
+from app.cache import NullCache
+from app.config import settings
+from app.models import Building, Organization
+from app.singleflight import FLIGHTS, coalesce
+
+HEADERS = {"X-API-KEY": settings.STATIC_API_KEY}
+
+
+def outcomes(read):
+    return {outcome: FLIGHTS.values.get((read, outcome), 0) for outcome in ("leader", "coalesced", "timeout", "abandoned")}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_load():
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return b"payload"
+
+    results = await asyncio.gather(*(coalesce("test_share", 1, load) for _ in range(10)), coalesce("test_share", 2, load))
+    assert results == [b"payload"] * 11
+    assert calls == 2
+    assert outcomes("test_share") == {"leader": 2, "coalesced": 9, "timeout": 0, "abandoned": 0}
+    assert singleflight.in_flight() == 0
+    # Nothing is kept once the flight lands
+    await coalesce("test_share", 1, load)
+    assert calls == 3
+
+
+@pytest.mark.asyncio
+async def test_leader_error_reaches_every_follower():
+    async def load():
+        await asyncio.sleep(0.01)
+        raise LookupError("gone")
+
+    results = await asyncio.gather(*(coalesce("test_error", 1, load) for _ in range(3)), return_exceptions=True)
+    assert [type(result) for result in results] == [LookupError] * 3
+    assert outcomes("test_error")["coalesced"] == 2
+
+
+@pytest.mark.asyncio
+async def test_followers_run_their_own_load_after_timeout_or_cancelled_leader():
+    release = asyncio.Event()
+
+    async def slow():
+        await release.wait()
+        return "leader"
+
+    async def fast():
+        return "own"
+
+    leader = asyncio.create_task(coalesce("test_timeout", 1, slow))
+    await asyncio.sleep(0)
+    assert await coalesce("test_timeout", 1, fast, timeout=0.01) == "own"
+    follower = asyncio.create_task(coalesce("test_timeout", 1, fast))
+    await asyncio.sleep(0)
+    leader.cancel()
+    assert await follower == "own"
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    assert outcomes("test_timeout") == {"leader": 1, "coalesced": 0, "timeout": 1, "abandoned": 1}
+    assert singleflight.in_flight() == 0
+
+
+@pytest.mark.asyncio
+async def test_identical_requests_are_coalesced(client, db_session, monkeypatch):
+    monkeypatch.setattr("app.cache.cache", NullCache())
+    building = Building(address="Single Flight Avenue 1", latitude=-42.0, longitude=102.0)
+    db_session.add(building)
+    await db_session.commit()
+    orgs = [Organization(name=f"Single Flight Org {i}", building_id=building.id) for i in range(3)]
+    db_session.add_all(orgs)
+    await db_session.commit()
+
+    before = outcomes("organization"), outcomes("building_page")
+    responses = await asyncio.gather(
+        *(client.get(f"/organizations/{orgs[0].id}", headers=HEADERS) for _ in range(5)),
+        *(client.get(f"/organizations/building/{building.id}?limit=2", headers=HEADERS) for _ in range(5)),
+    )
+    assert [r.status_code for r in responses] == [200] * 10
+    assert len({r.content for r in responses[:5]}) == 1
+    assert responses[0].json()["name"] == "Single Flight Org 0"
+    pages = responses[5:]
+    assert len({(r.content, r.headers["etag"], r.headers["x-next-cursor"]) for r in pages}) == 1
+    assert [org["name"] for org in pages[0].json()] == ["Single Flight Org 0", "Single Flight Org 1"]
+
+    after = outcomes("organization"), outcomes("building_page")
+    for read_before, read_after in zip(before, after):
+        assert read_after["leader"] - read_before["leader"] == 1
+        assert read_after["coalesced"] - read_before["coalesced"] == 4
+
+    # A write moves the cache generation, so later requests start a new flight
+    orgs[0].name = "Single Flight Org Renamed"
+    await db_session.commit()
+    response = await client.get(f"/organizations/{orgs[0].id}", headers=HEADERS)
+    assert response.json()["name"] == "Single Flight Org Renamed"
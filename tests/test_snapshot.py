@@ -0,0 +1,231 @@
+import time
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app import snapshot as snapshot_module
+from app.config import settings
+from app.models import Activity, Building, Organization, Phone, change_log
+from app.pagination import encode_cursor
+from app.replicas import CONSISTENCY_HEADER, READ_PRIMARY_COOKIE
+
+HEADERS = {"X-API-KEY": settings.STATIC_API_KEY}
+PRIMARY = {**HEADERS, CONSISTENCY_HEADER: "primary"}
+
+
+@pytest_asyncio.fixture
+async def refresh(async_engine, monkeypatch):
+    """Loads the process-wide snapshot from the test database; call again to refresh it."""
+    monkeypatch.setattr(snapshot_module, "_snapshot", None)
+    monkeypatch.setattr(snapshot_module, "_pruned_at", 0)
+    sessionmaker = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    async def run():
+        return await snapshot_module.refresh_snapshot(sessionmaker)
+
+    return run
+
+
+async def populate(db_session):
+    # Remote spot so rows from other tests don't interfere
+    here = Building(address="Snapshot Here", latitude=35.0, longitude=-120.0)
+    near = Building(address="Snapshot Near", latitude=35.05, longitude=-120.0)
+    far = Building(address="Snapshot Far", latitude=35.6, longitude=-120.0)
+    parent = Activity(name="Snapshot Parent")
+    db_session.add_all([here, near, far, parent])
+    await db_session.commit()
+    child = Activity(name="Snapshot Child", parent_id=parent.id)
+    db_session.add(child)
+    await db_session.commit()
+    orgs = [
+        Organization(name="Snapshot Bakery", building_id=here.id, activities=[child]),
+        Organization(name="Snapshot Books", building_id=here.id, activities=[parent, child]),
+        Organization(name="Snapshot Dairy", building_id=near.id, activities=[parent]),
+        Organization(name="Snapshot Far Bar", building_id=far.id),
+    ]
+    db_session.add_all(orgs)
+    await db_session.commit()
+    db_session.add_all([Phone(number="8-snap-1", organization_id=orgs[1].id), Phone(number="8-snap-2", organization_id=orgs[1].id)])
+    await db_session.commit()
+    return here.id, parent.id, [org.id for org in orgs]
+
+
+@pytest.mark.asyncio
+async def test_snapshot_answers_like_the_database(client, db_session, refresh):
+    building_id, activity_id, org_ids = await populate(db_session)
+    await refresh()
+
+    urls = [
+        f"/organizations/{org_ids[1]}",
+        f"/organizations?ids={org_ids[2]},987654,{org_ids[1]}",
+        f"/organizations/building/{building_id}?limit=1",
+        f"/organizations/building/{building_id}?fields=id,phones",
+        f"/organizations/activity/{activity_id}",
+        f"/organizations/activity/{activity_id}?limit=2&fields=name",
+        "/organizations/building/radius?lat=35&lon=-120&radius_km=10",
+        "/organizations/building/bbox?min_lat=34.9&min_lon=-120.1&max_lat=35.7&max_lon=-119.9&limit=3",
+        f"/organizations/building/nearest?lat=35&lon=-120&k=3&activity_id={activity_id}",
+        "/organizations/building/nearest?lat=35.5&lon=-120&k=2",
+        "/organizations/search/name?q=snapshot d",
+        "/organizations/search/name?q=Sn&limit=2",
+        "/organizations/search/name?q=Snapshot Dairx",
+        f"/organizations/search?q=snapshot&activity_id={activity_id}&lat=35&lon=-120&radius_km=50&sort=distance",
+        "/organizations/search?min_lat=34.9&min_lon=-120.1&max_lat=35.7&max_lon=-119.9&limit=2",
+        "/organizations/buildings/list?limit=2",
+    ]
+    for url in urls:
+        from_db = await client.get(url, headers=PRIMARY)
+        from_memory = await client.get(url, headers=HEADERS)
+        assert from_db.status_code == from_memory.status_code == 200, url
+        assert from_memory.content == from_db.content, url
+        for header in ("ETag", "X-Next-Cursor", "X-Missing-Ids"):
+            assert from_memory.headers.get(header) == from_db.headers.get(header), (url, header)
+
+    # Following a snapshot cursor
+    first = await client.get("/organizations/search?q=snapshot&limit=2", headers=HEADERS)
+    assert first.headers["X-Search-Plan"] == snapshot_module.SNAPSHOT_PLAN
+    second = await client.get(f"/organizations/search?q=snapshot&limit=2&cursor={first.headers['X-Next-Cursor']}", headers=HEADERS)
+    names = [o["name"] for o in first.json() + second.json()]
+    assert names == ["Snapshot Bakery", "Snapshot Books", "Snapshot Dairy", "Snapshot Far Bar"]
+
+    response = await client.get(
+        f"/organizations/activity/{activity_id}", params={"fields": "id"}, headers={**HEADERS, "Accept": "application/x-ndjson"}
+    )
+    assert response.text == "".join(f'{{"id":{org_id}}}\n' for org_id in org_ids[:3])
+
+
+@pytest.mark.asyncio
+async def test_snapshot_folds_case_like_the_database(client, db_session, refresh):
+    building = Building(address="Snapshot Unicode", latitude=-35.0, longitude=150.0)
+    db_session.add(building)
+    await db_session.commit()
+    names = ["Снапшот Молоко", "МОЛОКО Снапшот", "молочный Снапшот", "Über Snapshot Café", "über snapshot café"]
+    db_session.add_all([Organization(name=name, building_id=building.id) for name in names])
+    await db_session.commit()
+    await refresh()
+
+    # Only ASCII letters fold, as in SQLite's LIKE
+    expected = {
+        "мо": ["молочный Снапшот"],
+        "мол": ["молочный Снапшот"],
+        "Снапшот": ["Снапшот Молоко", "МОЛОКО Снапшот", "молочный Снапшот"],
+        "ÜBER": ["Über Snapshot Café"],
+        "über snap": ["über snapshot café"],
+    }
+    for q, found in expected.items():
+        for url in (f"/organizations/search/name?q={q}", f"/organizations/search?q={q}&building_id={building.id}"):
+            from_db = await client.get(url, headers=PRIMARY)
+            from_memory = await client.get(url, headers=HEADERS)
+            assert from_memory.content == from_db.content, url
+            assert sorted(o["name"] for o in from_db.json()) == sorted(found), url
+        assert [o["name"] for o in from_db.json()] == sorted(found)
+
+
+@pytest.mark.asyncio
+async def test_snapshot_refreshes_incrementally(client, db_session, refresh):
+    building_id, activity_id, org_ids = await populate(db_session)
+    snapshot = await refresh()
+    seq = snapshot.seq
+
+    created = await client.post("/organizations", json={"name": "Snapshot New", "building_id": building_id, "activity_ids": [activity_id]}, headers=HEADERS)
+    assert created.status_code == 201
+    new_id = created.json()["id"]
+    await client.put(f"/buildings/{building_id}", json={"address": "Snapshot Moved", "latitude": 36.0, "longitude": -120.0}, headers=HEADERS)
+    await client.delete(f"/organizations/{org_ids[3]}", headers=HEADERS)
+
+    assert (await client.get(f"/organizations/{new_id}", headers=HEADERS)).status_code == 404
+    # The cookie set after a write sends the client to the database until the snapshot catches up
+    client.cookies.set(READ_PRIMARY_COOKIE, str(time.time() + 60))
+    assert (await client.get(f"/organizations/{new_id}", headers=HEADERS)).status_code == 200
+    client.cookies.clear()
+    assert await refresh() is snapshot
+    assert snapshot.seq > seq
+
+    response = await client.get(f"/organizations/{new_id}", headers=HEADERS)
+    assert response.json()["building"]["address"] == "Snapshot Moved"
+    assert response.content == (await client.get(f"/organizations/{new_id}", headers=PRIMARY)).content
+    assert new_id in [o["id"] for o in (await client.get(f"/organizations/activity/{activity_id}", headers=HEADERS)).json()]
+    assert (await client.get(f"/organizations/{org_ids[3]}", headers=HEADERS)).status_code == 404
+    nearby = await client.get("/organizations/building/radius?lat=36&lon=-120&radius_km=1", headers=HEADERS)
+    assert {o["id"] for o in nearby.json()} == {org_ids[0], org_ids[1], new_id}
+
+    # A snapshot that fell behind the pruned log starts over
+    db_session.add(Phone(number="8-snap-3", organization_id=new_id))
+    await db_session.commit()
+    await db_session.execute(delete(change_log).where(change_log.c.seq <= snapshot.seq + 1))
+    await db_session.commit()
+    reloaded = await refresh()
+    assert reloaded is not snapshot
+    assert reloaded.seq == await db_session.scalar(select(func.max(change_log.c.seq)))
+    assert [p["number"] for p in (await client.get(f"/organizations/{new_id}", headers=HEADERS)).json()["phones"]] == ["8-snap-3"]
+
+
+@pytest.mark.asyncio
+async def test_refresh_loads_buildings_created_after_they_were_read(client, db_session, refresh):
+    _, _, org_ids = await populate(db_session)
+    await refresh()
+    building = Building(address="Snapshot Late Building", latitude=37.0, longitude=-121.0)
+    db_session.add(building)
+    await db_session.commit()
+    org = await db_session.get(Organization, org_ids[0])
+    org.building_id = building.id
+    await db_session.commit()
+    # As if the building was created between reading the buildings and the organizations:
+    # its log entries name the organization instead (removing them would force a full reload)
+    await db_session.execute(
+        update(change_log).where(change_log.c.entity == "building", change_log.c.entity_id == building.id).values(entity="organization", entity_id=org.id)
+    )
+    await db_session.commit()
+
+    await refresh()
+    response = await client.get(f"/organizations/{org_ids[0]}", headers=HEADERS)
+    assert response.status_code == 200
+    assert response.json()["building"]["address"] == "Snapshot Late Building"
+
+
+@pytest.mark.asyncio
+async def test_name_search_cursors_carry_over_between_database_and_snapshot(client, db_session, refresh):
+    building = Building(address="Snapshot Rank Building", latitude=36.0, longitude=-122.0)
+    db_session.add(building)
+    await db_session.commit()
+    # bm25 would put the name repeating the term first; both paths rank by length instead
+    names = ["Rankmix", "The Rankmix Rankmix Rankmix Rankmix", "The Rankmix", "Big Rankmix Store"]
+    db_session.add_all([Organization(name=name, building_id=building.id) for name in names])
+    await db_session.commit()
+    await refresh()
+
+    expected = ["Rankmix", "The Rankmix", "Big Rankmix Store", "The Rankmix Rankmix Rankmix Rankmix"]
+    for first, then in ((PRIMARY, HEADERS), (HEADERS, PRIMARY)):
+        seen, cursor = [], None
+        for headers in (first, then, first, then):
+            url = "/organizations/search/name?q=rankmix&limit=1" + (f"&cursor={cursor}" if cursor else "")
+            response = await client.get(url, headers=headers)
+            seen += [org["name"] for org in response.json()]
+            cursor = response.headers.get("X-Next-Cursor")
+        assert seen == expected
+
+
+@pytest.mark.asyncio
+async def test_snapshot_rejects_cursors_of_the_wrong_types(client, db_session, refresh):
+    await populate(db_session)
+    await refresh()
+    for url, values in [
+        ("/organizations/search?lat=35&lon=-120&sort=distance", ["Snapshot Bakery", 1]),
+        ("/organizations/search/name?q=snapshot", [0, "x", 1]),
+        ("/organizations/buildings/list", [1.5]),
+    ]:
+        response = await client.get(url, params={"cursor": encode_cursor(values)}, headers=HEADERS)
+        assert response.status_code == 400, url
+
+
+@pytest.mark.asyncio
+async def test_change_log_is_pruned_without_a_snapshot(db_session, monkeypatch):
+    db_session.add_all(Building(address=f"Log Street {i}", latitude=-44.0, longitude=104.0) for i in range(5))
+    await db_session.commit()
+    newest = await db_session.scalar(select(func.max(change_log.c.seq)))
+
+    monkeypatch.setattr(settings, "CHANGE_LOG_RETENTION", 3)
+    await snapshot_module.prune_change_log(db_session)
+    assert (await db_session.execute(select(change_log.c.seq).order_by(change_log.c.seq))).scalars().all() == [newest - 2, newest - 1, newest]
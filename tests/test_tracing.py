@@ -0,0 +1,70 @@
+import json
+import logging
+
+import pytest
+from httpx import AsyncClient
+
+from app import tracing
+from app.config import settings
+from app.main import app
+from app.models import Building, Organization, Phone
+from app.tracing import QueryTrace, QueryTraceMiddleware
+
+HEADERS = {"X-API-KEY": settings.STATIC_API_KEY}
+
+
+def query(statement: str, rows: int) -> QueryTrace:
+    return QueryTrace(statement, "(int)", rows, 0.0, 0.001)
+
+
+def test_params_shape_hides_values():
+    assert tracing.params_shape((1, 2, "x"), False) == "(int x2, str)"
+    assert tracing.params_shape({"id": 5}, False) == "{id: int}"
+    assert tracing.params_shape([(1, "a"), (2, "b")], True) == "2 x (int, str)"
+
+
+def test_route_whose_queries_grow_with_results_is_flagged(monkeypatch):
+    monkeypatch.setattr(tracing, "_route_samples", {})
+    for size in (1, 5, 20):
+        # One query for the page, then one per row
+        n_plus_one = [query("SELECT id FROM organizations", size)] + [query("SELECT * FROM phones WHERE organization_id = ?", 1)] * size
+        slope = tracing.record_route("/n-plus-one", n_plus_one)
+        tracing.record_route("/batched", [query("SELECT id FROM organizations", size), query("SELECT * FROM phones WHERE organization_id IN (?)", size * 2)])
+    assert slope == pytest.approx(1.0)
+    assert dict(tracing.route_growth()) == {("/n-plus-one",): pytest.approx(1.0), ("/batched",): 0.0}
+    assert tracing.repeated_statements(n_plus_one) == {"SELECT * FROM phones WHERE organization_id = ?": 20}
+
+
+@pytest.mark.asyncio
+async def test_traced_request(client, db_session, async_engine, caplog):
+    tracing.trace_engine(async_engine)
+    building = Building(address="Tracing Street 1", latitude=-41.0, longitude=101.0)
+    db_session.add(building)
+    await db_session.commit()
+    orgs = [Organization(name=f"Tracing Org {i}", building_id=building.id) for i in range(3)]
+    db_session.add_all(orgs)
+    await db_session.commit()
+    db_session.add(Phone(number="8-trace", organization_id=orgs[0].id))
+    await db_session.commit()
+
+    traced = QueryTraceMiddleware(app, header_enabled=True)
+    async with AsyncClient(app=traced, base_url="http://test") as traced_client:
+        untraced = await traced_client.get(f"/organizations/building/{building.id}", headers=HEADERS)
+        assert "server-timing" not in untraced.headers
+        with caplog.at_level(logging.INFO, logger="app.tracing"):
+            response = await traced_client.get(f"/organizations/building/{building.id}", headers={**HEADERS, tracing.TRACE_HEADER: "1"})
+
+    assert response.status_code == 200
+    timing = response.headers["server-timing"].split(", ")
+    # ETag aggregate, page of ids, organizations, then buildings, activities and phones
+    assert timing[0].startswith("db;dur=") and timing[0].endswith('desc="6 queries"')
+    assert 'desc="SELECT organizations 3 rows"' in timing[2]
+    assert 'desc="SELECT phones 1 rows"' in timing[6]
+
+    entry = json.loads(caplog.records[-1].getMessage())
+    assert entry["route"] == "/organizations/building/{building_id}"
+    assert entry["status"] == 200
+    assert entry["query_count"] == 6
+    assert entry["queries"][1]["params"] == "(int x3)"
+    assert entry["queries"][1]["rows"] == 3
+    assert entry["n_plus_one"] is False